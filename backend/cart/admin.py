@@ -1,4 +1,40 @@
+from functools import partial
+
 from django.contrib import admin
-from .models import Cart, CartItem
-admin.site.register(Cart)
-admin.site.register(CartItem)
\ No newline at end of file
+from django.db import transaction
+from .models import Cart, CartItem, IdempotencyKey
+from .summary import forget_summary
+
+
+class SummaryResetAdmin(admin.ModelAdmin):
+    """Правка корзины в админке сбрасывает закэшированную сводку (cart/summary.py)"""
+
+    @staticmethod
+    def forget(user_id):
+        # Формы админки выполняются в транзакции — сбрасываем после коммита
+        transaction.on_commit(partial(forget_summary, user_id))
+
+    @staticmethod
+    def user_id(obj):
+        return obj.user_id if isinstance(obj, Cart) else obj.cart.user_id
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.forget(self.user_id(obj))
+
+    def delete_model(self, request, obj):
+        user_id = self.user_id(obj)
+        super().delete_model(request, obj)
+        self.forget(user_id)
+
+    def delete_queryset(self, request, queryset):
+        field = 'user_id' if queryset.model is Cart else 'cart__user_id'
+        user_ids = set(queryset.values_list(field, flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in user_ids:
+            self.forget(user_id)
+
+
+admin.site.register(Cart, SummaryResetAdmin)
+admin.site.register(CartItem, SummaryResetAdmin)
+admin.site.register(IdempotencyKey)
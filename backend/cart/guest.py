@@ -0,0 +1,139 @@
+"""
+Корзины гостей в кэше (django.core.cache, любой бэкенд).
+
+Гостевая корзина не создаёт строк в БД: это словарь
+{product_id: (количество, название, цена, картинка)} под ключом cart:guest:<токен>,
+который живёт GUEST_CART_TTL секунд с последнего изменения. Токен выдаётся при первом
+добавлении товара и передаётся клиентом в заголовке X-Cart-Token.
+
+Название, цена и картинка запоминаются при добавлении, поэтому просмотр корзины
+и изменение количества не трогают таблицы товаров и корзин (но с DatabaseCache сам кэш
+лежит в основной БД — в продакшене нужен Redis, см. paintstore/checks.py). После входа корзина переносится в Cart/CartItem
+одним upsert (merge_guest_cart), итог считается уже по актуальным ценам.
+
+Кэш должен быть общим для всех процессов (CACHES в settings). Изменения корзины —
+чтение, правка и запись под блокировкой cart:guest:<токен>:lock (cache.add атомарен
+во всех бэкендах): два параллельных добавления не затирают друг друга.
+"""
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from products.models import Product
+from .models import Cart, CartItem
+from .summary import forget_summary
+
+GUEST_CART_HEADER = 'X-Cart-Token'
+GUEST_CART_TTL = 60 * 60 * 24 * 14
+# Блокировка корзины истекает сама, если процесс упал, не сняв её
+LOCK_TIMEOUT = 5
+LOCK_POLL_INTERVAL = 0.01
+_TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+def _ttl():
+    return getattr(settings, 'GUEST_CART_TTL', GUEST_CART_TTL)
+
+
+def request_token(request):
+    """Токен гостевой корзины из заголовка (None, если его нет или он некорректен)."""
+    token = request.headers.get(GUEST_CART_HEADER, '').strip()
+    return token if _TOKEN_RE.match(token) else None
+
+
+class GuestCart:
+    def __init__(self, token=None):
+        self.token = token
+        self.lines = (cache.get(self.key) or {}) if token else {}
+
+    @property
+    def key(self):
+        return f'cart:guest:{self.token}'
+
+    @contextmanager
+    def locked(self):
+        """Перечитывает корзину под блокировкой; изменения внутри блока сохраняются при выходе."""
+        if self.token is None:
+            self.token = secrets.token_urlsafe(24)
+        lock = f'{self.key}:lock'
+        # Ждём не дольше LOCK_TIMEOUT: к этому времени чужая блокировка истечёт
+        while not cache.add(lock, 1, LOCK_TIMEOUT):
+            time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            self.lines = cache.get(self.key) or {}
+            yield self
+        finally:
+            cache.delete(lock)
+
+    def add(self, product, quantity):
+        with self.locked():
+            current = self.lines.get(product.id, (0,))[0]
+            self.lines[product.id] = (current + quantity, product.name, str(product.price), product.image_url)
+            self.save()
+
+    def set_quantity(self, product_id, quantity):
+        with self.locked():
+            if product_id not in self.lines:
+                return False
+            self.lines[product_id] = (quantity, *self.lines[product_id][1:])
+            self.save()
+        return True
+
+    def remove(self, product_id):
+        with self.locked():
+            if self.lines.pop(product_id, None) is None:
+                return False
+            self.save()
+        return True
+
+    def save(self):
+        cache.set(self.key, self.lines, _ttl())
+
+    def delete(self):
+        if self.token:
+            cache.delete(self.key)
+        self.lines = {}
+
+    def quantities(self):
+        return {product_id: line[0] for product_id, line in self.lines.items()}
+
+    def as_data(self):
+        """То же, что CartSerializer; id позиции гостя — id товара."""
+        items, total = [], Decimal('0')
+        for product_id, (quantity, name, price, image_url) in self.lines.items():
+            line_total = Decimal(price) * quantity
+            total += line_total
+            items.append({
+                'id': product_id,
+                'product': product_id,
+                'product_name': name,
+                'product_image': image_url,
+                'product_price': price,
+                'quantity': quantity,
+                'total_price': f'{line_total:.2f}',
+            })
+        return {'id': None, 'user': None, 'items': items, 'total_price': f'{total:.2f}', 'token': self.token}
+
+
+def merge_guest_cart(user, token):
+    """Переносит гостевую корзину в корзину пользователя (количества складываются) и удаляет её."""
+    guest = GuestCart(token)
+    if not guest.lines:
+        return False
+    # Под блокировкой: добавление, пришедшее во время переноса, не потеряется и не перенесётся дважды
+    with guest.locked():
+        quantities = guest.quantities()
+        # Товары, удалённые из каталога, пока корзина лежала в кэше, пропускаем
+        existing = Product.objects.filter(id__in=quantities.keys()).values_list('id', flat=True)
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=user)
+            CartItem.objects.add_quantities(cart.id, {product_id: quantities[product_id] for product_id in existing})
+        guest.delete()
+    forget_summary(user.id)
+    return bool(quantities)
@@ -0,0 +1,153 @@
+"""
+Идемпотентные POST-запросы к корзине по заголовку Idempotency-Key.
+
+Мобильный клиент, не дождавшись ответа, повторяет запрос с тем же ключом. Первый
+запрос с ключом занимает строку IdempotencyKey (INSERT, уникальность по владельцу
+и ключу), выполняется и сохраняет свой ответ; повторы получают сохранённый ответ
+с заголовком Idempotent-Replayed: true, обработчик второй раз не вызывается.
+Повтор, пришедший, пока первый запрос ещё выполняется, ждёт его ответа до WAIT_TIMEOUT.
+
+Ответы 5xx и исключения не сохраняются — строка удаляется, и повтор выполнится заново.
+Тот же ключ с другим телом запроса — 422. Ключи живут IDEMPOTENCY_KEY_TTL секунд,
+просроченные удаляет manage.py clear_idempotency_keys. Запросы без заголовка
+обрабатываются как обычно.
+
+Гость без токена корзины (первый запрос) ключом не защищён: у таких запросов нет
+владельца, и сохранённый ответ с новым X-Cart-Token достался бы любому, кто пришлёт
+тот же ключ с тем же телом, — вместе с чужой корзиной.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .guest import GUEST_CART_HEADER, request_token
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+MAX_KEY_LENGTH = 255
+# Сколько повтор ждёт ответа первого запроса; дольше выполняющийся запрос считаем оборванным
+WAIT_TIMEOUT = 10
+ABANDONED_AFTER = timedelta(minutes=1)
+POLL_INTERVAL = 0.05
+# Заголовки ответа, которые нужно вернуть и при повторе
+STORED_HEADERS = (GUEST_CART_HEADER,)
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', IDEMPOTENCY_KEY_TTL))
+
+
+def request_scope(request):
+    """Владелец ключа; None — владельца нет, запрос выполняется без идемпотентности."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.id}'
+    token = request_token(request)
+    return f'guest:{token}' if token else None
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def claim(scope, key, fingerprint):
+    """(запись, True) — ключ занят этим запросом; (запись, False) — ключ уже был."""
+    now = timezone.now()
+    while True:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    scope=scope, key=key, fingerprint=fingerprint, expires_at=now + _ttl(),
+                ), True
+        except IntegrityError:
+            pass
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is None:
+            continue  # запись только что удалили — пробуем занять снова
+        stale = record.expires_at <= now or (
+            record.status_code is None and record.created_at <= now - ABANDONED_AFTER
+        )
+        if not stale:
+            return record, False
+        # Удаляем по pk только ту запись, которую видели: параллельный запрос мог успеть её заменить
+        IdempotencyKey.objects.filter(pk=record.pk).delete()
+
+
+def wait_for_response(record):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while record is not None and record.status_code is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def replay(record):
+    response = Response(record.response, status=record.status_code, headers=record.headers)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Декоратор для POST-обработчиков ViewSet:
+
+        @action(detail=False, methods=['post'])
+        @idempotent
+        def checkout(self, request): ...
+    """
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        scope = request_scope(request)
+        if not key or scope is None:
+            return view(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH or not key.isprintable():
+            return Response({'error': f'{IDEMPOTENCY_HEADER}: до {MAX_KEY_LENGTH} печатных символов'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        while True:
+            record, created = claim(scope, key, fingerprint)
+            if created:
+                break
+            if record.fingerprint != fingerprint:
+                return Response({'error': f'{IDEMPOTENCY_HEADER} уже использован для другого запроса'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            record = wait_for_response(record)
+            if record is None:
+                continue  # первый запрос упал и освободил ключ — выполняем сами
+            if record.status_code is None:
+                return Response({'error': 'Запрос с этим ключом ещё выполняется'},
+                                status=status.HTTP_409_CONFLICT)
+            return replay(record)
+
+        try:
+            response = view(self, request, *args, **kwargs)
+        except BaseException:
+            record.delete()
+            raise
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            record.delete()
+            return response
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status_code=response.status_code,
+            response=response.data,
+            headers={name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+        )
+        return response
+    return wrapper
+
+
+def clear_expired(now=None):
+    """Удаляет просроченные ключи; возвращает, сколько удалено."""
+    return IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()[0]
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from cart.idempotency import clear_expired
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные ключи идемпотентности (ответы на повторяемые POST к корзине)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Удалено ключей: {clear_expired()}")
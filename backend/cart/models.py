@@ -1,11 +1,39 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value, When
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from products.models import Product
 
+def line_total(prefix=''):
+    """Стоимость позиции в БД: количество × цена товара"""
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}product__price'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_items(self):
+        """
+        Корзина вместе с позициями и их товарами — два запроса при любом числе позиций.
+        Суммы считает БД: items_total у корзины и line_total у каждой позиции.
+        """
+        return self.annotate(items_total=Sum(line_total('items__'))).prefetch_related(
+            Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related('product').annotate(line_total=line_total()).order_by('id'),
+            )
+        )
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="Пользователь")
     created_at = models.DateTimeField("Создана", auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Корзина"
         verbose_name_plural = "Корзины"
@@ -15,13 +43,67 @@ class Cart(models.Model):
 
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        # Посчитано в with_items(); иначе — один агрегирующий запрос
+        if hasattr(self, 'items_total'):
+            return self.items_total or Decimal('0')
+        return self.items.aggregate(total=Sum(line_total()))['total'] or Decimal('0')
+
+class CartItemQuerySet(models.QuerySet):
+    def add_quantity(self, cart_id, product_id, quantity):
+        """
+        Добавляет quantity штук товара в корзину одним атомарным запросом
+        (INSERT ... ON CONFLICT DO UPDATE), без чтения текущего количества:
+        параллельные добавления (двойной клик, две вкладки) не теряются.
+        """
+        self.add_quantities(cart_id, {product_id: quantity})
+
+    def add_quantities(self, cart_id, quantities):
+        """То же для нескольких товаров сразу: {product_id: quantity} — один запрос."""
+        if not quantities:
+            return
+        if connection.vendor in ('postgresql', 'sqlite'):
+            table = self.model._meta.db_table
+            rows = ', '.join(['(%s, %s, %s)'] * len(quantities))
+            params = [value for product_id, quantity in quantities.items() for value in (cart_id, product_id, quantity)]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (cart_id, product_id, quantity) VALUES {rows} '
+                    f'ON CONFLICT (cart_id, product_id) '
+                    f'DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity',
+                    params,
+                )
+            return
+        # Остальные БД: сначала UPDATE с F(), при отсутствии позиции — INSERT,
+        # а если её успел вставить параллельный запрос — снова UPDATE
+        with transaction.atomic():
+            for product_id, quantity in quantities.items():
+                items = self.filter(cart_id=cart_id, product_id=product_id)
+                if items.update(quantity=F('quantity') + quantity):
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+                except IntegrityError:
+                    items.update(quantity=F('quantity') + quantity)
+
+    def set_quantities(self, quantities):
+        """Новые количества позиций {item_id: quantity} одним UPDATE ... CASE."""
+        if not quantities:
+            return 0
+        return self.filter(id__in=quantities.keys()).update(quantity=Case(
+            *[When(id=item_id, then=Value(quantity)) for item_id, quantity in quantities.items()],
+            default=F('quantity'),
+            output_field=models.PositiveIntegerField(),
+        ))
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items", verbose_name="Корзина")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="cart_items", verbose_name="Товар")
     quantity = models.PositiveIntegerField("Количество", default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Элемент корзины"
         verbose_name_plural = "Элементы корзины"
@@ -32,4 +114,36 @@ class CartItem(models.Model):
 
     @property
     def total_price(self):
-        return self.product.price * self.quantity
\ No newline at end of file
+        if hasattr(self, 'line_total'):
+            return self.line_total
+        return self.product.price * self.quantity
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ответ на POST к корзине с заголовком Idempotency-Key (см. cart/idempotency.py).
+    status_code пуст, пока первый запрос ещё выполняется.
+    """
+    # Чей ключ: user:<id> или guest:<токен корзины>
+    scope = models.CharField("Владелец", max_length=80)
+    key = models.CharField("Ключ", max_length=255)
+    # sha256 метода, адреса и тела запроса: тот же ключ с другим запросом — ошибка клиента
+    fingerprint = models.CharField("Отпечаток запроса", max_length=64)
+    status_code = models.PositiveSmallIntegerField("Код ответа", null=True, blank=True)
+    response = models.JSONField("Ответ", null=True, blank=True, encoder=DjangoJSONEncoder)
+    headers = models.JSONField("Заголовки ответа", default=dict, blank=True)
+    created_at = models.DateTimeField("Создан", auto_now_add=True)
+    expires_at = models.DateTimeField("Истекает")
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}: {self.key}"
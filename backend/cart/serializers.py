@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
+from orders.models import Order
 from products.models import Product
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -20,4 +21,35 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ['id', 'user', 'items', 'total_price']
-        read_only_fields = ['id', 'user', 'total_price']
\ No newline at end of file
+        read_only_fields = ['id', 'user', 'total_price']
+
+class CartOperationSerializer(serializers.Serializer):
+    """Одна операция пакета: add (product_id, quantity), update (item_id, quantity), remove (item_id)"""
+    OPERATIONS = ('add', 'update', 'remove')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField(required=False)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        required = {'add': ['product_id'], 'update': ['item_id', 'quantity'], 'remove': ['item_id']}[attrs['op']]
+        missing = [name for name in required if name not in attrs]
+        if missing:
+            raise serializers.ValidationError({name: 'Обязательное поле' for name in missing})
+        if attrs['op'] == 'add':
+            attrs.setdefault('quantity', 1)
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=200)
+
+
+class CheckoutSerializer(serializers.ModelSerializer):
+    """Контакты для заказа; пустые поля view заполняет из профиля покупателя"""
+
+    class Meta:
+        model = Order
+        fields = ['name', 'email', 'phone']
+        extra_kwargs = {name: {'required': False, 'allow_blank': True} for name in fields}
@@ -0,0 +1,56 @@
+"""
+Сводка корзины для значка в шапке: число позиций, число штук и сумма.
+
+Сводка пользователя лежит в кэше; если её там нет, её считает один агрегирующий запрос.
+Всё, что меняет корзину (обработчики корзины, оформление заказа, слияние гостевой корзины,
+админка), после коммита удаляет сводку — forget_summary(), а не записывает новую: из двух
+одновременных запросов последней могла бы записаться сводка более старого.
+Запрос, посчитавший сводку до чужого изменения, всё же может положить её в кэш после
+удаления — поэтому срок жизни короткий. Ключ включает версию каталога: после изменения
+цен старая сумма не отдаётся.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from paintstore.versions import get_version
+from products.signals import CATALOG
+from .models import CartItem, line_total
+
+SUMMARY_CACHE_TIMEOUT = 60 * 5
+
+
+def _key(user_id):
+    return f'cart:summary:{user_id}:{get_version(CATALOG)}'
+
+
+def _summary(count, quantity, total):
+    return {'count': count, 'quantity': quantity, 'total_price': f'{total or Decimal("0"):.2f}'}
+
+
+def cart_summary(user_id):
+    """Сводка корзины пользователя: из кэша или одним запросом."""
+    key = _key(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        totals = CartItem.objects.filter(cart__user_id=user_id).aggregate(
+            lines=Count('id'), pieces=Sum('quantity'), total=Sum(line_total()),
+        )
+        summary = _summary(totals['lines'], totals['pieces'] or 0, totals['total'])
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def forget_summary(user_id):
+    """Корзину изменили — сводку посчитаем заново при следующем запросе."""
+    cache.delete(_key(user_id))
+
+
+def guest_summary(guest):
+    lines = guest.lines.values()
+    return _summary(
+        len(guest.lines),
+        sum(line[0] for line in lines),
+        sum((Decimal(line[2]) * line[0] for line in lines), Decimal('0')),
+    )
@@ -1,3 +1,423 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth.models import User
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from orders.models import Order, OutboxMessage
+from paintstore.query_budget import QueryBudgetTestMixin
+from products.models import Product
+from .guest import GuestCart
+from .idempotency import clear_expired, idempotent
+from .models import Cart, CartItem, IdempotencyKey
+
+
+class CartQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="buyer")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def seed(self, count):
+        for i in range(count):
+            product = Product.objects.create(name=f"Товар {i}", description="", price=100 + i)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def test_list(self):
+        response = self.assertBudget(2, '/api/cart/')
+        self.assertEqual(len(response.json()['items']), self.cart.items.count())
+
+    def test_large_cart_totals(self):
+        # Корзина на 200 позиций — те же два запроса, суммы считает БД
+        products = Product.objects.bulk_create(
+            [Product(name=f"Товар {i}", description="", price=Decimal('0.10') + i) for i in range(200)]
+        )
+        CartItem.objects.bulk_create([CartItem(cart=self.cart, product=p, quantity=3) for p in products])
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/cart/').json()
+        self.assertEqual(len(data['items']), 200)
+        self.assertEqual(data['items'][1]['total_price'], '3.30')
+        self.assertEqual(Decimal(data['total_price']), sum((Decimal('0.10') + i) * 3 for i in range(200)))
+
+    def test_update_item(self):
+        self.seed(10)
+        item = self.cart.items.first()
+        # атомарный UPDATE, корзина, позиции с товарами
+        with self.assertNumQueries(3):
+            response = self.client.patch(f'/api/cart/{item.id}/update_item/', {'quantity': 5})
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_item(self):
+        product = Product.objects.create(name="Краска", description="", price=100)
+        for expected in (2, 4):
+            response = self.client.post('/api/cart/add_item/', {'product_id': product.id, 'quantity': 2})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()['items'][0]['quantity'], expected)
+        self.assertEqual(self.client.post('/api/cart/add_item/', {'product_id': product.id, 'quantity': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/cart/add_item/', {'product_id': 999999}).status_code, 404)
+
+
+class CartBatchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="buyer")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = Product.objects.bulk_create(
+            [Product(name=f"Товар {i}", description="", price=100) for i in range(40)]
+        )
+
+    def batch(self, operations):
+        return self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+
+    def test_mixed_operations(self):
+        kept, changed, removed = [
+            CartItem.objects.create(cart=self.cart, product=product) for product in self.products[:3]
+        ]
+        response = self.batch([
+            {'op': 'update', 'item_id': changed.id, 'quantity': 5},
+            {'op': 'remove', 'item_id': removed.id},
+            {'op': 'add', 'product_id': kept.product_id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.products[3].id},
+            {'op': 'add', 'product_id': self.products[3].id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        quantities = {item['product']: item['quantity'] for item in response.json()['items']}
+        self.assertEqual(quantities, {kept.product_id: 3, changed.product_id: 5, self.products[3].id: 2})
+
+    def test_flat_query_count(self):
+        items = [CartItem.objects.create(cart=self.cart, product=product) for product in self.products[:20]]
+
+        def operations(count):
+            return ([{'op': 'update', 'item_id': item.id, 'quantity': 2} for item in items[:count]]
+                    + [{'op': 'add', 'product_id': product.id} for product in self.products[20:20 + count]])
+
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.batch(operations(1)).status_code, 200)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.batch(operations(20)).status_code, 200)
+        self.assertEqual(len(small), len(large))
+
+    def test_all_or_nothing(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.products[0])
+        other = CartItem.objects.create(cart=Cart.objects.create(user=User.objects.create(username="other")),
+                                        product=self.products[0])
+        response = self.batch([
+            {'op': 'update', 'item_id': item.id, 'quantity': 7},
+            {'op': 'remove', 'item_id': other.id},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['item_ids'], [other.id])
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1)
+        self.assertEqual(self.batch([{'op': 'update', 'item_id': item.id}]).status_code, 400)
+
+
+class GuestCartTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.paint = Product.objects.create(name="Краска", description="", price=Decimal('250.50'))
+        self.primer = Product.objects.create(name="Грунт", description="", price=100)
+
+    def add(self, product, quantity=1, **headers):
+        return self.client.post('/api/cart/add_item/', {'product_id': product.id, 'quantity': quantity}, **headers)
+
+    def test_guest_cart_lives_in_cache(self):
+        response = self.add(self.paint, 2)
+        self.assertEqual(response.status_code, 201)
+        token = response['X-Cart-Token']
+        self.assertEqual(response.json()['token'], token)
+        headers = {'HTTP_X_CART_TOKEN': token}
+        self.add(self.primer, **headers)
+
+        with self.assertNumQueries(0):
+            data = self.client.get('/api/cart/', **headers).json()
+            self.client.patch(f'/api/cart/{self.primer.id}/update_item/', {'quantity': 3}, **headers)
+            self.client.delete(f'/api/cart/{self.paint.id}/remove_item/', **headers)
+        self.assertEqual(data['total_price'], '601.00')
+        self.assertEqual(data['items'][0]['total_price'], '501.00')
+        self.assertEqual(self.client.get('/api/cart/', **headers).json()['items'][0]['quantity'], 3)
+        self.assertFalse(Cart.objects.exists())
+        # Чужой/просроченный токен — пустая корзина
+        self.assertEqual(self.client.get('/api/cart/', HTTP_X_CART_TOKEN='x' * 32).json()['items'], [])
+
+    def test_concurrent_adds_are_not_lost(self):
+        token = self.add(self.paint)['X-Cart-Token']
+
+        def add_many():
+            for _ in range(25):
+                GuestCart(token).add(self.paint, 1)
+
+        threads = [threading.Thread(target=add_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(GuestCart(token).quantities(), {self.paint.id: 201})
+
+    def test_merge_on_login(self):
+        token = self.add(self.paint, 2)['X-Cart-Token']
+        self.add(self.primer, 1, HTTP_X_CART_TOKEN=token)
+        user = User.objects.create(username="buyer")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.paint, quantity=1)
+
+        self.client.force_authenticate(user)
+        data = self.client.get('/api/cart/', HTTP_X_CART_TOKEN=token).json()
+        self.assertEqual({item['product']: item['quantity'] for item in data['items']},
+                         {self.paint.id: 3, self.primer.id: 1})
+        # Гостевая корзина удалена: повторный запрос с токеном ничего не добавляет
+        data = self.client.get('/api/cart/', HTTP_X_CART_TOKEN=token).json()
+        self.assertEqual(sum(item['quantity'] for item in data['items']), 4)
+
+    def test_viewing_does_not_create_cart(self):
+        self.client.force_authenticate(User.objects.create(username="viewer"))
+        self.assertEqual(self.client.get('/api/cart/').json()['items'], [])
+        self.assertFalse(Cart.objects.exists())
+
+
+class CartConcurrencyTest(TransactionTestCase):
+    """Параллельные добавления одного товара не теряются"""
+    THREADS = 8
+    ADDS_PER_THREAD = 25
+
+    def test_concurrent_add_item(self):
+        user = User.objects.create(username="buyer")
+        product = Product.objects.create(name="Краска", description="", price=100)
+        cart = Cart.objects.create(user=user)
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def add_one():
+            # Общий кэш SQLite в памяти блокирует таблицу без ожидания — повторяем.
+            # Повтор безопасен: упавший запрос ничего не изменил
+            while True:
+                try:
+                    return CartItem.objects.add_quantity(cart.id, product.id, 1)
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.001)
+
+        def hammer():
+            try:
+                start.wait()
+                for _ in range(self.ADDS_PER_THREAD):
+                    add_one()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=hammer) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(CartItem.objects.get(cart=cart, product=product).quantity,
+                         self.THREADS * self.ADDS_PER_THREAD)
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="buyer")
+        self.product = Product.objects.create(name="Краска", description="", price=100, stock=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, key, quantity=1, client=None):
+        return (client or self.client).post('/api/cart/add_item/', {'product_id': self.product.id, 'quantity': quantity},
+                                            format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_add_item_applied_once(self):
+        first = self.add('k-1')
+        again = self.add('k-1')
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+        # Новый ключ — новое действие
+        self.add('k-2')
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_retried_checkout_places_one_order(self):
+        self.add('k-1')
+        first = self.client.post('/api/cart/checkout/', {'name': "Иван"}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        again = self.client.post('/api/cart/checkout/', {'name': "Иван"}, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.json()['order_id'], first.json()['order_id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        self.add('k-1')
+        self.assertEqual(self.add('k-1', quantity=5).status_code, 422)
+
+    def test_keys_are_per_user(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username="other"))
+        self.add('k-1')
+        self.add('k-1', client=other)
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_guest_without_token_is_not_replayed(self):
+        # Ответ с токеном корзины не должен достаться другому гостю с тем же ключом
+        first = self.add('k-1', client=APIClient())
+        other = self.add('k-1', client=APIClient())
+        self.assertNotEqual(other['X-Cart-Token'], first['X-Cart-Token'])
+        self.assertFalse(other.has_header('Idempotent-Replayed'))
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_guest_with_token_is_replayed(self):
+        guest = APIClient()
+        guest.credentials(HTTP_X_CART_TOKEN=self.add('k-1', client=guest)['X-Cart-Token'])
+        first = self.add('k-2', client=guest)
+        again = self.add('k-2', client=guest)
+        self.assertTrue(again.has_header('Idempotent-Replayed'))
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(again.json()['items'][0]['quantity'], 2)
+
+    def test_expired_keys(self):
+        self.add('k-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        # Просроченный ключ не мешает выполнить запрос заново
+        self.assertFalse(self.add('k-1').has_header('Idempotent-Replayed'))
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.assertEqual(clear_expired(), 1)
+
+
+class IdempotencyConcurrencyTest(TransactionTestCase):
+    """Одновременные запросы с одним ключом: обработчик выполняется один раз"""
+
+    def test_concurrent_requests_coalesced(self):
+        entered, release = threading.Event(), threading.Event()
+        calls, responses = [], []
+
+        class SlowView:
+            @idempotent
+            def create(self, request):
+                calls.append(request)
+                entered.set()
+                release.wait(5)
+                return Response({'call': len(calls)}, status=201)
+
+        def send(retry_locked):
+            try:
+                while True:
+                    request = APIRequestFactory().post('/api/slow/', {'a': 1}, format='json',
+                                                       HTTP_IDEMPOTENCY_KEY='same',
+                                                       HTTP_X_CART_TOKEN='guest-token-0123456789')
+                    try:
+                        responses.append(SlowView().create(Request(request, parsers=[JSONParser()])))
+                        return
+                    except OperationalError as e:
+                        # Общий кэш SQLite в памяти блокирует таблицу без ожидания. Повтор
+                        # безопасен только для запросов, которые сами обработчик не вызывают
+                        if not retry_locked or 'locked' not in str(e):
+                            raise
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=send, args=(False,))
+        first.start()
+        self.assertTrue(entered.wait(5))
+        # Повторы приходят, пока первый запрос ещё выполняется
+        retries = [threading.Thread(target=send, args=(True,)) for _ in range(2)]
+        for thread in retries:
+            thread.start()
+        time.sleep(0.3)
+        release.set()
+        for thread in [first, *retries]:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.data for response in responses], [{'call': 1}] * 3)
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 2)
+
+
+class CartSummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="buyer")
+        self.paint = Product.objects.create(name="Краска", description="", price=Decimal('100.50'), stock=10)
+        self.primer = Product.objects.create(name="Грунт", description="", price=50, stock=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summary(self, client=None):
+        return (client or self.client).get('/api/cart/summary/').json()
+
+    def test_empty(self):
+        self.assertEqual(self.summary(), {'count': 0, 'quantity': 0, 'total_price': '0.00'})
+        self.assertFalse(Cart.objects.exists())
+
+    def mutate(self, method, url, data=None):
+        # Сводка сбрасывается после коммита, а TestCase не коммитит
+        with self.captureOnCommitCallbacks(execute=True):
+            getattr(self.client, method)(url, data, format='json')
+
+    def test_kept_current_by_mutations(self):
+        self.mutate('post', '/api/cart/add_item/', {'product_id': self.paint.id, 'quantity': 2})
+        self.assertEqual(self.summary()['count'], 1)
+        self.mutate('post', '/api/cart/add_item/', {'product_id': self.primer.id})
+        # Обработчик сбросил сводку — она считается заново и дальше берётся из кэша
+        with self.assertNumQueries(1):
+            self.assertEqual(self.summary(), {'count': 2, 'quantity': 3, 'total_price': '251.00'})
+        with self.assertNumQueries(0):
+            self.summary()
+
+        item = CartItem.objects.get(product=self.paint)
+        self.mutate('patch', f'/api/cart/{item.id}/update_item/', {'quantity': 1})
+        self.assertEqual(self.summary()['total_price'], '150.50')
+        self.mutate('delete', f'/api/cart/{item.id}/remove_item/')
+        self.assertEqual(self.summary(), {'count': 1, 'quantity': 1, 'total_price': '50.00'})
+
+        self.mutate('post', '/api/cart/checkout/', {'name': "Иван"})
+        self.assertEqual(self.summary()['count'], 0)
+
+    def test_admin_edit_resets_summary(self):
+        cart = Cart.objects.create(user=self.user)
+        item = CartItem.objects.create(cart=cart, product=self.paint, quantity=1)
+        self.assertEqual(self.summary()['quantity'], 1)
+        admin_user = User.objects.create_superuser(username="admin", password="secret")
+        browser = Client()
+        browser.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            browser.post(f'/admin/cart/cartitem/{item.id}/change/',
+                         {'cart': cart.id, 'product': self.paint.id, 'quantity': 4})
+        self.assertEqual(self.summary()['quantity'], 4)
+
+    def test_one_query_without_cache(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.paint, quantity=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.summary()['total_price'], '301.50')
+        # Цена изменилась — версия каталога другая, сумма пересчитывается
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paint.price = 10
+            self.paint.save()
+        self.assertEqual(self.summary()['total_price'], '30.00')
+
+    def test_guest(self):
+        guest = APIClient()
+        token = guest.post('/api/cart/add_item/', {'product_id': self.paint.id, 'quantity': 2},
+                           format='json')['X-Cart-Token']
+        guest.credentials(HTTP_X_CART_TOKEN=token)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summary(guest), {'count': 1, 'quantity': 2, 'total_price': '201.00'})
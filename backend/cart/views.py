@@ -1,180 +1,241 @@
+from functools import partial
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from .models import Cart, CartItem
+from .guest import GUEST_CART_HEADER, GuestCart, merge_guest_cart, request_token
+from .idempotency import idempotent
+from .summary import cart_summary, forget_summary, guest_summary
 from products.models import Product
-from .serializers import CartSerializer, CartItemSerializer
-from django.core.mail import send_mail
-from django.conf import settings
-from contacts.models import ContactInfo
-from django.utils import timezone
-from telegram import Bot
-from telegram.error import TelegramError
-import asyncio
+from .serializers import CartSerializer, CartItemSerializer, CartBatchSerializer, CheckoutSerializer
+from orders.models import Order
+from orders.services import place_order
+from orders.stock import OutOfStock
+
+def _positive_int(value, minimum=1):
+    """int(value) или None, если это не целое число (или меньше minimum)"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    if minimum is not None and value < minimum:
+        return None
+    return value
+
 
 class CartViewSet(viewsets.ViewSet):
-    permission_classes = [IsAuthenticated]
+    """
+    Корзина. Гости тоже могут смотреть и менять корзину: она хранится в кэше
+    (cart/guest.py) по токену из заголовка X-Cart-Token. Если с этим заголовком
+    приходит уже вошедший пользователь, гостевая корзина вливается в его корзину.
+    POST-запросы можно безопасно повторять с заголовком Idempotency-Key (cart/idempotency.py).
+    """
+
+    def get_permissions(self):
+        if self.action in ['checkout', 'batch']:
+            return [IsAuthenticated()]
+        return [AllowAny()]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        token = request_token(request)
+        if token and request.user.is_authenticated:
+            merge_guest_cart(request.user, token)
+
+    def _guest_cart(self, request):
+        return GuestCart(request_token(request))
+
+    def _guest_response(self, guest, status_code=status.HTTP_200_OK):
+        response = Response(guest.as_data(), status=status_code)
+        if guest.token:
+            response[GUEST_CART_HEADER] = guest.token
+        return response
+
+    def _get_cart(self, user):
+        """
+        Корзина пользователя с позициями и товарами (без N+1 при сериализации).
+        Вызывается после изменений — заодно сбрасывает сводку для шапки.
+        """
+        transaction.on_commit(partial(forget_summary, user.id))
+        cart, _ = Cart.objects.with_items().get_or_create(user=user)
+        return cart
 
     def list(self, request):
-        """GET /api/cart/ — получить корзину пользователя"""
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        """GET /api/cart/ — получить корзину пользователя (или гостя)"""
+        if not request.user.is_authenticated:
+            return self._guest_response(self._guest_cart(request))
+        # Просмотр не создаёт пустую корзину в БД
+        cart = Cart.objects.with_items().filter(user=request.user).first()
+        if cart is None:
+            return Response({'id': None, 'user': request.user.id, 'items': [], 'total_price': '0.00'})
         serializer = CartSerializer(cart)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """GET /api/cart/summary/ — число позиций, штук и сумма (для значка корзины)"""
+        if not request.user.is_authenticated:
+            return Response(guest_summary(self._guest_cart(request)))
+        return Response(cart_summary(request.user.id))
+
     @action(detail=False, methods=['post'])
+    @idempotent
     def add_item(self, request):
         """POST /api/cart/add_item/ — добавить товар в корзину"""
-        cart, _ = Cart.objects.get_or_create(user=request.user)
         product_id = request.data.get('product_id')
-        quantity = int(request.data.get('quantity', 1))
-
         if not product_id:
             return Response({'error': 'product_id обязателен'}, status=status.HTTP_400_BAD_REQUEST)
+        product_id = _positive_int(product_id)
+        quantity = _positive_int(request.data.get('quantity', 1))
+        if product_id is None or quantity is None:
+            return Response({'error': 'product_id и quantity должны быть целыми числами больше нуля'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not request.user.is_authenticated:
+            product = Product.objects.filter(id=product_id).only('id', 'name', 'price', 'image_url').first()
+            if product is None:
+                return Response({'error': 'Товар не найден'}, status=status.HTTP_404_NOT_FOUND)
+            guest = self._guest_cart(request)
+            guest.add(product, quantity)
+            return self._guest_response(guest, status.HTTP_201_CREATED)
+
+        if not Product.objects.filter(id=product_id).exists():
+            return Response({'error': 'Товар не найден'}, status=status.HTTP_404_NOT_FOUND)
 
-        product = get_object_or_404(Product, id=product_id)
-
-        # Получаем или создаём элемент
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        if not created:
-            item.quantity += quantity
-            item.save()
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        # Один атомарный upsert вместо get_or_create + quantity += ... + save()
+        CartItem.objects.add_quantity(cart.id, product_id, quantity)
 
-        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+        return Response(CartSerializer(self._get_cart(request.user)).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['patch'])
     def update_item(self, request, pk=None):
         """PATCH /api/cart/items/{id}/ — изменить количество"""
-        item = get_object_or_404(CartItem, id=pk, cart__user=request.user)
         quantity = request.data.get('quantity')
         if quantity is not None:
-            item.quantity = max(1, int(quantity))  # минимум 1
-            item.save()
-        return Response(CartSerializer(item.cart).data)
+            quantity = _positive_int(quantity, minimum=None)
+            if quantity is None:
+                return Response({'error': 'quantity должно быть целым числом'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not request.user.is_authenticated:
+            # У гостя id позиции — это id товара
+            guest = self._guest_cart(request)
+            product_id = _positive_int(pk)
+            found = (product_id in guest.lines if quantity is None
+                     else guest.set_quantity(product_id, max(1, quantity)))
+            if not found:
+                return Response({'error': 'Позиция не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            return self._guest_response(guest)
+
+        if quantity is not None:
+            # Один UPDATE: и проверка владельца, и новое значение (минимум 1)
+            updated = CartItem.objects.filter(id=pk, cart__user=request.user).update(quantity=max(1, quantity))
+            if not updated:
+                return Response({'error': 'Позиция не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            get_object_or_404(CartItem, id=pk, cart__user=request.user)
+        return Response(CartSerializer(self._get_cart(request.user)).data)
 
     @action(detail=True, methods=['delete'])
     def remove_item(self, request, pk=None):
         """DELETE /api/cart/items/{id}/ — удалить элемент"""
+        if not request.user.is_authenticated:
+            guest = self._guest_cart(request)
+            if not guest.remove(_positive_int(pk)):
+                return Response({'error': 'Позиция не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            return self._guest_response(guest)
+
         item = get_object_or_404(CartItem, id=pk, cart__user=request.user)
-        cart = item.cart
         item.delete()
-        return Response(CartSerializer(cart).data)
+        return Response(CartSerializer(self._get_cart(request.user)).data)
 
-    # --- ИЗМЕНЕНО: Добавлен async ---
     @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """
+        POST /api/cart/batch/ — несколько изменений корзины одним запросом:
+        {"operations": [{"op": "add", "product_id": 1, "quantity": 2},
+                        {"op": "update", "item_id": 5, "quantity": 3},
+                        {"op": "remove", "item_id": 7}]}
+        Всё применяется в одной транзакции (или ничего при ошибке), в ответе — итоговая корзина.
+        Для одной позиции действует последняя операция; update/remove выполняются раньше add.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        adds, updates, removes = {}, {}, set()
+        for operation in operations:
+            if operation['op'] == 'add':
+                adds[operation['product_id']] = adds.get(operation['product_id'], 0) + operation['quantity']
+            elif operation['op'] == 'update':
+                updates[operation['item_id']] = operation['quantity']
+                removes.discard(operation['item_id'])
+            else:
+                removes.add(operation['item_id'])
+                updates.pop(operation['item_id'], None)
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=request.user)
+            # Проверяем всё двумя запросами, а не по одному на операцию
+            item_ids = updates.keys() | removes
+            if item_ids:
+                missing = item_ids - set(CartItem.objects.filter(cart=cart, id__in=item_ids).values_list('id', flat=True))
+                if missing:
+                    return Response({'error': 'Позиции не найдены в корзине', 'item_ids': sorted(missing)},
+                                    status=status.HTTP_404_NOT_FOUND)
+            if adds:
+                missing = adds.keys() - set(Product.objects.filter(id__in=adds.keys()).values_list('id', flat=True))
+                if missing:
+                    return Response({'error': 'Товары не найдены', 'product_ids': sorted(missing)},
+                                    status=status.HTTP_404_NOT_FOUND)
+
+            CartItem.objects.filter(cart=cart).set_quantities(updates)
+            if removes:
+                CartItem.objects.filter(cart=cart, id__in=removes).delete()
+            CartItem.objects.add_quantities(cart.id, adds)
+
+        return Response(CartSerializer(self._get_cart(request.user)).data)
+
+    @action(detail=False, methods=['post'])
+    @idempotent
     def checkout(self, request):
         """
         POST /api/cart/checkout/
         Требует: контактные данные + подтверждение
-        Отправляет: уведомление админу в Telegram и/или Email
+        Сохраняет заказ; уведомление админу (Telegram/Email) отправит manage.py run_outbox
         """
-        # --- ИЗМЕНЕНО: Создаём асинхронную внутреннюю функцию для отправки ---
-        async def send_telegram_message(bot_token, chat_id, text):
-            bot = Bot(token=bot_token)
-            try:
-                await bot.send_message(chat_id=chat_id, text=text)
-                return True, None
-            except TelegramError as e:
-                return False, str(e)
-            except Exception as e:
-                return False, str(e)
-
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        if not cart.items.exists():
-            return Response({'error': 'Корзина пуста'}, status=400)
+        # Длина и формат проверяются до транзакции: иначе PostgreSQL ответит DataError (500)
+        contacts = CheckoutSerializer(data=request.data)
+        contacts.is_valid(raise_exception=True)
+        cart = Cart.objects.filter(user=request.user).first()
 
         # Получаем данные
-        email = request.data.get('email') or request.user.email
-        name = request.data.get('name') or f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
-        phone = request.data.get('phone') or getattr(request.user.profile, 'phone', '')
-
-        # Формируем содержимое сообщения (для Telegram и Email)
-        items = []
-        total = 0
-        for item in cart.items.all():
-            price = item.product.price * item.quantity
-            total += price
-            items.append(f"- {item.product.name} ×{item.quantity} — {price} ₽")
-
-        message_text = f"""
-Заказ от {name}
-
-Контакты:
-- Email: {email}
-- Телефон: {phone or 'не указан'}
-
-Товары:
-{'\n'.join(items)}
-
-Итого: {total} ₽
-
-Дата: {timezone.now().strftime('%d.%m.%Y %H:%M')}
-        """.strip()
-
-        # Попытаемся отправить в Telegram
-        telegram_success = False
-        telegram_error = None
-        if hasattr(settings, 'TELEGRAM_BOT_TOKEN') and hasattr(settings, 'TELEGRAM_CHAT_ID'):
-            chat_id = settings.TELEGRAM_CHAT_ID
-
-            if chat_id:
-                # Вызываем асинхронную функцию внутри asyncio.run()
-                # Это создаст новый event loop для этого вызова
-                # ВАЖНО: asyncio.run() завершает loop после выполнения.
-                # Это может быть неэффективно, если checkout вызывается часто.
-                # Для продакшена лучше использовать один общий event loop (например, через celery или daphne).
-                # Но для MVP подходит.
-                try:
-                    telegram_success, telegram_error = asyncio.run(send_telegram_message(settings.TELEGRAM_BOT_TOKEN, chat_id, message_text))
-                    if telegram_success:
-                        print("Сообщение в Telegram отправлено успешно") # Лог для отладки
-                    else:
-                        print(f"Ошибка отправки в Telegram: {telegram_error}") # Лог для отладки
-                except Exception as e:
-                    telegram_error = f"Ошибка выполнения асинхронной функции: {str(e)}"
-                    print(telegram_error) # Лог для отладки
-            else:
-                telegram_error = "Telegram Chat ID не указан в настройках"
-                print(telegram_error) # Лог для отладки
-        else:
-            telegram_error = "Токен или Chat ID Telegram не настроен в settings"
-            print(telegram_error) # Лог для отладки
-
-        # Попытаемся отправить на Email
-        email_success = False
-        email_error = None
+        user = request.user
+        email = contacts.validated_data.get('email') or user.email
+        name = contacts.validated_data.get('name') or f"{user.first_name} {user.last_name}".strip() or user.username
+        # Имя и фамилия из профиля вместе могут не уместиться в поле заказа
+        name = name[:Order._meta.get_field('name').max_length]
+        phone = contacts.validated_data.get('phone') or getattr(user.profile, 'phone', '')
+
+        # Заказ, позиции и уведомления — одна локальная транзакция, без обращений к сети
         try:
-            # Получаем email из контактов
-            contact = ContactInfo.load()
-            admin_email = contact.email or settings.DEFAULT_FROM_EMAIL  # fallback
-
-            send_mail(
-                subject=f'Новый заказ от {name}',
-                message=message_text, # Используем то же сообщение
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[admin_email],
-                fail_silently=False, # Лучше обрабатывать исключение
-            )
-            email_success = True
-            print("Email отправлен успешно") # Лог для отладки
-        except Exception as e:
-            email_error = str(e)
-            print(f"Ошибка отправки Email: {email_error}") # Лог для отладки
-
-        # Очищаем корзину (после попыток отправки)
-        cart.items.all().delete()
-
-        # Сформируем ответ пользователю
-        response_message = "Заказ успешно оформлен!"
-        if not telegram_success:
-            response_message += f" (Уведомление в Telegram не отправлено: {telegram_error or 'не настроено'})."
-        if not email_success:
-            response_message += f" (Уведомление на Email не отправлено: {email_error or 'не настроено'})."
-
-        # Возвращаем 200 OK, так как заказ принят и обработан (очищен)
-        return Response({"message": response_message}, status=status.HTTP_200_OK)
+            order = place_order(cart, name=name, email=email, phone=phone) if cart else None
+        except OutOfStock as e:
+            return Response({
+                'error': 'Недостаточно товара на складе',
+                'products': [{'id': product_id, 'available': available}
+                             for product_id, available in e.shortages.items()],
+            }, status=status.HTTP_409_CONFLICT)
+        if order is None:
+            return Response({'error': 'Корзина пуста'}, status=400)
+
+        return Response({
+            "message": f"Заказ №{order.id} успешно оформлен!",
+            "order_id": order.id,
+            "total": str(order.total),
+        }, status=status.HTTP_200_OK)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ContactsConfig(AppConfig):
     name = 'contacts'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (версии для условных GET)
+        from . import signals  # noqa: F401
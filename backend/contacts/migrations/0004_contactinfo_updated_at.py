@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_rename_background_blur_contactinfo_bg_blur_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactinfo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
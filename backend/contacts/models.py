@@ -12,6 +12,7 @@ class ContactInfo(models.Model):
     bg_image_url = models.URLField("Фон", blank=True)
     bg_blur = models.PositiveSmallIntegerField("Размытие", default=4)
     bg_opacity = models.FloatField("Прозрачность", default=0.2)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
     
     class Meta:
         verbose_name = "Контактная информация"
@@ -0,0 +1,18 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from paintstore.versions import bump_version
+from .models import ContactInfo
+
+# Версия контактов: по ней отвечаем 304 на /api/contacts/
+CONTACTS = 'contacts'
+
+
+@receiver(post_save, sender=ContactInfo)
+@receiver(post_delete, sender=ContactInfo)
+def contacts_changed(sender, **kwargs):
+    # После коммита: иначе параллельный запрос закэширует данные под новой версией до коммита
+    transaction.on_commit(partial(bump_version, CONTACTS))
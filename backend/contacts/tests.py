@@ -1,3 +1,27 @@
+from django.core.cache import cache
 from django.test import TestCase
+from .models import ContactInfo
 
-# Create your tests here.
+
+class ContactInfoConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        ContactInfo.objects.create(address="Москва", latitude=55.75, longitude=37.61,
+                                   phone="+7 900 000-00-00", email="shop@example.com")
+
+    def test_not_modified_until_saved(self):
+        etag = self.client.get('/api/contacts/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/contacts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        contact = ContactInfo.load()
+        contact.phone = "+7 900 111-11-11"
+        with self.captureOnCommitCallbacks(execute=True):
+            contact.save()
+            # Версия меняется только после коммита — до него отдаём прежний ответ
+            response = self.client.get('/api/contacts/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/contacts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['phone'], "+7 900 111-11-11")
@@ -7,9 +7,12 @@ from django.http import Http404
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import IsModerator
 from rest_framework.permissions import AllowAny
+from paintstore.conditional import conditional_get
+from .signals import CONTACTS
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional_get(CONTACTS)
 def contact_info_view(request):
     obj = ContactInfo.load()
     serializer = ContactInfoSerializer(obj)
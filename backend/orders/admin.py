@@ -0,0 +1,6 @@
+from django.contrib import admin
+from .models import Order, OrderItem, OutboxMessage, StockReservation
+admin.site.register(Order)
+admin.site.register(OrderItem)
+admin.site.register(StockReservation)
+admin.site.register(OutboxMessage)
@@ -0,0 +1,143 @@
+"""
+Локальные заглушки Telegram Bot API и SMTP-сервера: для тестов транспортов
+и офлайн-замера пропускной способности (manage.py benchmark_notifications).
+
+Обе заглушки считают соединения и принятые сообщения, latency — искусственная
+задержка ответа сервера, в секундах.
+"""
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _FakeServer:
+    def __init__(self, server):
+        self.server = server
+        self.server.fake = self
+        self.connections = 0
+        self.messages = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return host, port
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def received(self, message):
+        with self._lock:
+            self.messages.append(message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _TelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело пишутся отдельно: без этого Nagle + delayed ACK дают ~40 мс на ответ
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.fake.connected()
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if fake.latency:
+            threading.Event().wait(fake.latency)
+        if fake.fail:
+            status, data = 500, {'ok': False, 'description': 'Internal Server Error'}
+        elif not self.path.endswith('/sendMessage'):
+            status, data = 404, {'ok': False, 'description': 'Not Found'}
+        else:
+            message = json.loads(body)
+            fake.received(message)
+            status, data = 200, {'ok': True, 'result': {'message_id': len(fake.messages), 'text': message['text']}}
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTelegramServer(_FakeServer):
+    """Отвечает на POST /bot<token>/sendMessage как Bot API. fail=True — отвечать ошибкой."""
+
+    def __init__(self, latency=0, fail=False):
+        super().__init__(ThreadingHTTPServer(('127.0.0.1', 0), _TelegramHandler))
+        self.server.daemon_threads = True
+        self.latency = latency
+        self.fail = fail
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f'http://{host}:{port}'
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        fake = self.server.fake
+        fake.connected()
+        self.reply('220 fake ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().split(' ', 1)[0].upper()
+            if command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line)
+                if fake.latency:
+                    threading.Event().wait(fake.latency)
+                fake.received(b''.join(data))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command in ('EHLO', 'HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+
+class FakeSMTPServer(_FakeServer):
+    """Минимальный SMTP без TLS и авторизации; письма копятся в messages как байты."""
+
+    def __init__(self, latency=0):
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+        server.daemon_threads = True
+        super().__init__(server)
+        self.latency = latency
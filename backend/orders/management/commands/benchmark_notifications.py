@@ -0,0 +1,71 @@
+import time
+
+import httpx
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from orders.fakes import FakeSMTPServer, FakeTelegramServer
+from orders.transports import EmailTransport, TelegramTransport
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер пропускной способности уведомлений на локальных заглушках Telegram и SMTP: "
+        "соединение на каждое сообщение против долгоживущих транспортов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=50, help="Как --batch-size у run_outbox")
+        parser.add_argument('--latency', type=float, default=0.005, help="Задержка ответа заглушек, секунд")
+
+    def handle(self, *args, **options):
+        payloads = [
+            {'subject': f'Новый заказ №{i}', 'text': f'Заказ №{i}\n\nИтого: {i * 100} ₽'}
+            for i in range(options['messages'])
+        ]
+        batches = [payloads[i:i + options['batch_size']] for i in range(0, len(payloads), options['batch_size'])]
+
+        with FakeTelegramServer(latency=options['latency']) as server:
+            self.report("Telegram, по одному", payloads, server, lambda: self.telegram_one_by_one(server, payloads))
+        for coalesce in (False, True):
+            with FakeTelegramServer(latency=options['latency']) as server:
+                transport = TelegramTransport('token', 1, base_url=server.url, coalesce=coalesce)
+                title = "Telegram, транспорт" + (" со склейкой" if coalesce else "")
+                self.report(title, payloads, server, lambda: [transport.send_many(batch) for batch in batches])
+                transport.close()
+
+        with FakeSMTPServer(latency=options['latency']) as server:
+            self.report("Email, по одному", payloads, server, lambda: self.email_one_by_one(server, payloads))
+        with FakeSMTPServer(latency=options['latency']) as server:
+            host, port = server.address
+            transport = EmailTransport(
+                recipient=lambda: 'admin@example.com', from_email='shop@example.com',
+                backend=SMTP_BACKEND, host=host, port=port, use_tls=False, use_ssl=False,
+            )
+            self.report("Email, транспорт", payloads, server, lambda: [transport.send_many(batch) for batch in batches])
+            transport.close()
+
+    def report(self, title, payloads, server, run):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{title}: {len(payloads) / elapsed:.0f} сообщений/с "
+            f"(запросов к серверу: {len(server.messages)}, соединений: {server.connections}, {elapsed:.2f} с)"
+        )
+
+    def telegram_one_by_one(self, server, payloads):
+        # Как было: новый клиент, а значит и новое соединение, на каждое сообщение
+        for payload in payloads:
+            with httpx.Client(base_url=server.url) as client:
+                client.post('/bottoken/sendMessage', json={'chat_id': 1, 'text': payload['text']})
+
+    def email_one_by_one(self, server, payloads):
+        host, port = server.address
+        for payload in payloads:
+            connection = get_connection(SMTP_BACKEND, host=host, port=port, use_tls=False, use_ssl=False)
+            EmailMessage(payload['subject'], payload['text'], 'shop@example.com', ['admin@example.com'],
+                         connection=connection).send()
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.stock import DEFAULT_RELEASE_BATCH_SIZE, release_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Разбирает резервы товара: просроченные заказы отменяет, товар отменённых "
+        "возвращает на склад, резерв подтверждённых закрывает"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Один проход и выход (для cron)")
+        parser.add_argument('--interval', type=float, default=60.0, help="Пауза между проходами, секунд")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_RELEASE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            stats = release_reservations(batch_size=options['batch_size'])
+            if any(stats.values()):
+                self.stdout.write(
+                    f"Отменено по сроку: {stats['expired']}, возвращено на склад: {stats['restocked']}, "
+                    f"закрыто резервов: {stats['closed']}"
+                )
+            if options['once']:
+                break
+            if max(stats.values()) < options['batch_size']:
+                time.sleep(options['interval'])
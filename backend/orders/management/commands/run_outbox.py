@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import DEFAULT_BATCH_SIZE, close_transports, process_outbox
+
+
+class Command(BaseCommand):
+    help = "Отправляет уведомления о заказах из outbox (Telegram, email) с повторами при ошибках"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Один проход по очереди и выход")
+        parser.add_argument('--interval', type=float, default=2.0, help="Пауза между проходами, секунд")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            self.run(options)
+        finally:
+            close_transports()
+
+    def run(self, options):
+        while True:
+            stats = process_outbox(batch_size=options['batch_size'])
+            if any(stats.values()):
+                self.stdout.write(
+                    f"Отправлено: {stats['sent']}, повтор позже: {stats['retry']}, не доставлено: {stats['failed']}"
+                )
+            if options['once']:
+                break
+            # Полная пачка — возможно, очередь не пуста: берём следующую сразу
+            if sum(stats.values()) < options['batch_size']:
+                time.sleep(options['interval'])
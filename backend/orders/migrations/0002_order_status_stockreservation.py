@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 09:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('products', '0010_productrelation'),
+    ]
+
+    operations = [
+        # Заказы, оформленные до учёта остатков, резерва не имеют — считаем их подтверждёнными
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('reserved', 'Товар зарезервирован'), ('confirmed', 'Подтверждён'), ('cancelled', 'Отменён')], default='confirmed', max_length=10, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('reserved', 'Товар зарезервирован'), ('confirmed', 'Подтверждён'), ('cancelled', 'Отменён')], default='reserved', max_length=10, verbose_name='Статус'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('expires_at', models.DateTimeField(verbose_name='Резерв до')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='orders.order', verbose_name='Заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Резерв товара',
+                'verbose_name_plural': 'Резервы товаров',
+                'indexes': [models.Index(fields=['expires_at'], name='reservation_expires_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,105 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
+from products.models import Product
+
+
+class Order(models.Model):
+    # Товар списывается со склада при оформлении и держится резервом (StockReservation);
+    # подтверждённый заказ резерв закрывает, отменённый или просроченный — возвращает на склад
+    RESERVED = 'reserved'
+    CONFIRMED = 'confirmed'
+    CANCELLED = 'cancelled'
+    STATUSES = [(RESERVED, 'Товар зарезервирован'), (CONFIRMED, 'Подтверждён'), (CANCELLED, 'Отменён')]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='orders', verbose_name="Покупатель")
+    name = models.CharField("Имя", max_length=200)
+    email = models.EmailField("Email", blank=True)
+    phone = models.CharField("Телефон", max_length=20, blank=True)
+    total = models.DecimalField("Сумма", max_digits=12, decimal_places=2)
+    status = models.CharField("Статус", max_length=10, choices=STATUSES, default=RESERVED)
+    created_at = models.DateTimeField("Дата оформления", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Заказ"
+        verbose_name_plural = "Заказы"
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f"Заказ №{self.id} — {self.name} ({self.total} ₽)"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name="Заказ")
+    # Название и цена копируются: заказ не должен меняться вместе с каталогом
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name="Товар")
+    product_name = models.CharField("Название товара", max_length=200)
+    price = models.DecimalField("Цена", max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField("Количество")
+
+    class Meta:
+        verbose_name = "Позиция заказа"
+        verbose_name_plural = "Позиции заказа"
+
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+    @property
+    def total_price(self):
+        return self.price * self.quantity
+
+
+class StockReservation(models.Model):
+    """Сколько товара списано со склада под заказ и до какого момента держится резерв."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations', verbose_name="Заказ")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Товар")
+    quantity = models.PositiveIntegerField("Количество")
+    expires_at = models.DateTimeField("Резерв до")
+
+    class Meta:
+        verbose_name = "Резерв товара"
+        verbose_name_plural = "Резервы товаров"
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Заказ №{self.order_id}: товар {self.product_id} x {self.quantity}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Уведомление, которое нужно доставить (transactional outbox): пишется в той же
+    транзакции, что и заказ, а отправляет его отдельный процесс manage.py run_outbox.
+    """
+    TELEGRAM = 'telegram'
+    EMAIL = 'email'
+    CHANNELS = [(TELEGRAM, 'Telegram'), (EMAIL, 'Email')]
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Ожидает отправки'), (SENT, 'Отправлено'), (FAILED, 'Не доставлено')]
+
+    channel = models.CharField("Канал", max_length=20, choices=CHANNELS)
+    payload = models.JSONField("Содержимое")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='notifications', verbose_name="Заказ")
+    status = models.CharField("Статус", max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    # Когда можно пробовать снова (для взятых в работу — до какого момента они заняты)
+    next_attempt_at = models.DateTimeField("Следующая попытка", default=timezone.now)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+    sent_at = models.DateTimeField("Отправлено", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Исходящее уведомление"
+        verbose_name_plural = "Исходящие уведомления"
+        indexes = [
+            # Очередь: только неотправленные, по времени следующей попытки
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} #{self.id} ({self.get_status_display()})"
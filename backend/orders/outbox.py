@@ -0,0 +1,153 @@
+"""
+Доставка уведомлений из outbox (manage.py run_outbox).
+
+Воркер берёт пачку готовых к отправке сообщений и «арендует» их — сдвигает
+next_attempt_at на LEASE вперёд, чтобы параллельный воркер их не взял. Отправка идёт
+вне транзакции: сообщения одного канала уходят одним вызовом долгоживущего
+транспорта (orders/transports.py), результат записывается по каждому сообщению. Если воркер упал
+посреди пачки, аренда истечёт и сообщения заберёт следующий проход.
+
+Ошибки повторяются с экспоненциальной задержкой (BACKOFF_BASE, 2×, 4×, ... до BACKOFF_MAX);
+после MAX_ATTEMPTS неудач сообщение получает статус FAILED.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from contacts.models import ContactInfo
+from .models import OutboxMessage
+from .transports import (
+    DEFAULT_TELEGRAM_CONCURRENCY, DEFAULT_TIMEOUT, TELEGRAM_API_URL, EmailTransport, TelegramTransport,
+)
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+LEASE = timedelta(minutes=5)
+DEFAULT_BATCH_SIZE = 50
+
+
+def backoff(attempts):
+    """Задержка перед следующей попыткой после attempts неудач."""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def admin_email():
+    """Куда слать уведомления: email из контактов сайта, иначе DEFAULT_FROM_EMAIL."""
+    email = ContactInfo.objects.filter(pk=1).values_list('email', flat=True).first()
+    return email or settings.DEFAULT_FROM_EMAIL
+
+
+def build_transports():
+    """Транспорты по каналам; Telegram — только если заданы токен и чат."""
+    transports = {
+        OutboxMessage.EMAIL: EmailTransport(
+            recipient=admin_email, timeout=getattr(settings, 'NOTIFY_EMAIL_TIMEOUT', DEFAULT_TIMEOUT),
+        ),
+    }
+    token, chat_id = getattr(settings, 'TELEGRAM_BOT_TOKEN', None), getattr(settings, 'TELEGRAM_CHAT_ID', None)
+    if token and chat_id:
+        transports[OutboxMessage.TELEGRAM] = TelegramTransport(
+            token, chat_id,
+            base_url=getattr(settings, 'TELEGRAM_API_URL', TELEGRAM_API_URL),
+            timeout=getattr(settings, 'NOTIFY_TELEGRAM_TIMEOUT', DEFAULT_TIMEOUT),
+            concurrency=getattr(settings, 'NOTIFY_TELEGRAM_CONCURRENCY', DEFAULT_TELEGRAM_CONCURRENCY),
+        )
+    return transports
+
+
+# Транспорты этого процесса: создаются при первом проходе и живут до close_transports()
+_transports = None
+
+
+def get_transports():
+    global _transports
+    if _transports is None:
+        _transports = build_transports()
+    return _transports
+
+
+def close_transports():
+    global _transports
+    transports, _transports = _transports, None
+    for transport in (transports or {}).values():
+        transport.close()
+
+
+def send_many(transport, payloads):
+    """Отправляет пачку через транспорт; обычная функция payload -> None тоже подходит."""
+    if hasattr(transport, 'send_many'):
+        return transport.send_many(payloads)
+    errors = []
+    for payload in payloads:
+        try:
+            transport(payload)
+        except Exception as e:
+            errors.append(e)
+        else:
+            errors.append(None)
+    return errors
+
+
+def claim(batch_size, now):
+    """Берёт в работу пачку сообщений, которые пора отправлять."""
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if messages:
+            OutboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+                next_attempt_at=now + LEASE
+            )
+    return messages
+
+
+def record_failure(message, error):
+    """Записывает неудачную попытку. True — попытки исчерпаны (FAILED)."""
+    message.attempts += 1
+    message.last_error = f'{type(error).__name__}: {error}'
+    if message.attempts >= MAX_ATTEMPTS:
+        message.status = OutboxMessage.FAILED
+    else:
+        message.next_attempt_at = timezone.now() + backoff(message.attempts)
+    message.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+    return message.status == OutboxMessage.FAILED
+
+
+def process_outbox(batch_size=DEFAULT_BATCH_SIZE, transports=None):
+    """
+    Один проход по очереди. Сообщения пачки группируются по каналу и уходят
+    одним вызовом транспорта. Возвращает {'sent': n, 'retry': n, 'failed': n}.
+    """
+    transports = transports or get_transports()
+    stats = {'sent': 0, 'retry': 0, 'failed': 0}
+    by_channel = {}
+    for message in claim(batch_size, timezone.now()):
+        by_channel.setdefault(message.channel, []).append(message)
+
+    sent = []
+    for channel, messages in by_channel.items():
+        transport = transports.get(channel)
+        if transport is None:
+            errors = [LookupError(f'канал {channel} не настроен')] * len(messages)
+        else:
+            errors = send_many(transport, [message.payload for message in messages])
+        for message, error in zip(messages, errors):
+            if error is None:
+                sent.append(message.id)
+            elif record_failure(message, error):
+                stats['failed'] += 1
+            else:
+                stats['retry'] += 1
+
+    if sent:
+        OutboxMessage.objects.filter(id__in=sent).update(
+            status=OutboxMessage.SENT, sent_at=timezone.now(), last_error='', attempts=F('attempts') + 1,
+        )
+        stats['sent'] = len(sent)
+    return stats
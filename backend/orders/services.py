@@ -0,0 +1,74 @@
+"""
+Оформление заказа: резерв остатков, заказ, его позиции и уведомления (outbox) пишутся
+одной транзакцией, сеть в запросе не участвует — уведомления отправляет manage.py run_outbox.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from cart.models import CartItem
+from cart.summary import forget_summary
+from .models import Order, OrderItem, OutboxMessage, StockReservation
+from .stock import reservation_ttl, reserve_stock
+
+
+def order_message(order, items):
+    lines = '\n'.join(f"- {item.product_name} ×{item.quantity} — {item.total_price} ₽" for item in items)
+    return (
+        f"Заказ №{order.id} от {order.name}\n\n"
+        f"Контакты:\n"
+        f"- Email: {order.email}\n"
+        f"- Телефон: {order.phone or 'не указан'}\n\n"
+        f"Товары:\n{lines}\n\n"
+        f"Итого: {order.total} ₽\n\n"
+        f"Дата: {timezone.localtime(order.created_at).strftime('%d.%m.%Y %H:%M')}"
+    )
+
+
+def notification_channels():
+    """Каналы, в которые уходит уведомление о заказе (Telegram — если настроен)."""
+    channels = []
+    if getattr(settings, 'TELEGRAM_BOT_TOKEN', None) and getattr(settings, 'TELEGRAM_CHAT_ID', None):
+        channels.append(OutboxMessage.TELEGRAM)
+    channels.append(OutboxMessage.EMAIL)
+    return channels
+
+
+@transaction.atomic
+def place_order(cart, name, email='', phone=''):
+    """
+    Превращает корзину в заказ. Возвращает Order или None, если корзина пуста.
+    Товар списывается со склада в резерв; если чего-то не хватает — OutOfStock,
+    и ничего не меняется. Позиции копируют название и цену товара; корзина очищается.
+    """
+    cart_items = list(CartItem.objects.filter(cart=cart).select_related('product').order_by('id'))
+    if not cart_items:
+        return None
+    reserve_stock({item.product_id: item.quantity for item in cart_items})
+
+    order = Order.objects.create(
+        user_id=cart.user_id, name=name, email=email, phone=phone,
+        total=sum(item.product.price * item.quantity for item in cart_items),
+    )
+    items = OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=item.product, product_name=item.product.name,
+                  price=item.product.price, quantity=item.quantity)
+        for item in cart_items
+    ])
+    expires_at = timezone.now() + reservation_ttl()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=item.product_id, quantity=item.quantity, expires_at=expires_at)
+        for item in cart_items
+    ])
+
+    text = order_message(order, items)
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(channel=channel, order=order,
+                      payload={'subject': f'Новый заказ №{order.id} от {name}', 'text': text})
+        for channel in notification_channels()
+    ])
+    CartItem.objects.filter(cart=cart).delete()
+    transaction.on_commit(partial(forget_summary, cart.user_id))
+    return order
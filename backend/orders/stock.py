@@ -0,0 +1,133 @@
+"""
+Резерв остатков при оформлении заказа.
+
+reserve_stock() списывает со склада все позиции заказа одним условным UPDATE:
+
+    UPDATE product SET stock = stock - CASE id WHEN .. THEN q END
+    WHERE id IN (..) AND stock >= CASE id WHEN .. THEN q END
+
+Если обновилось меньше строк, чем позиций, какого-то товара не хватило — транзакция
+оформления откатывается целиком (OutOfStock), частичного списания не бывает. На PostgreSQL
+строки товаров перед этим блокируются SELECT ... FOR UPDATE в порядке id: два оформления
+с одними и теми же товарами ждут друг друга, а не попадают во взаимную блокировку.
+SQLite пишет в базу по одному, ему блокировка строк не нужна.
+
+Списанное держится резервом (StockReservation) STOCK_RESERVATION_TTL секунд. Резервы разбирает
+manage.py release_reservations: у подтверждённых заказов резерв закрывается (товар продан),
+у отменённых и просроченных товар возвращается на склад.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from paintstore.versions import bump_version
+from products.models import Product
+from products.signals import CATALOG
+from .models import Order, StockReservation
+
+STOCK_RESERVATION_TTL = 60 * 60 * 24
+DEFAULT_RELEASE_BATCH_SIZE = 500
+
+
+class OutOfStock(Exception):
+    """Не хватает товара; shortages — {product_id: сколько есть на складе}."""
+
+    def __init__(self, shortages):
+        super().__init__(f"Недостаточно товара на складе: {sorted(shortages)}")
+        self.shortages = shortages
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', STOCK_RESERVATION_TTL))
+
+
+def _by_product(quantities):
+    return Case(
+        *(When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()),
+        output_field=IntegerField(),
+    )
+
+
+def _stock_changed():
+    # Остаток есть в ответах каталога — снимки и ETag должны устареть
+    transaction.on_commit(partial(bump_version, CATALOG))
+
+
+def reserve_stock(quantities):
+    """
+    Списывает {product_id: количество} со склада. Вызывается внутри транзакции
+    оформления; при нехватке бросает OutOfStock и ничего не списывает.
+    """
+    product_ids = sorted(quantities)
+    if connection.features.has_select_for_update:
+        list(Product.objects.select_for_update().filter(id__in=product_ids).order_by('id').values_list('id'))
+    needed = _by_product(quantities)
+    try:
+        # Точка сохранения: при нехватке откатываем уже списанные строки и читаем настоящие остатки
+        with transaction.atomic():
+            updated = Product.objects.filter(id__in=product_ids, stock__gte=needed).update(stock=F('stock') - needed)
+            if updated != len(product_ids):
+                raise OutOfStock({})
+    except OutOfStock:
+        available = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'stock'))
+        raise OutOfStock({
+            product_id: available.get(product_id, 0)
+            for product_id in product_ids
+            if available.get(product_id, 0) < quantities[product_id]
+        })
+    _stock_changed()
+
+
+def return_stock(quantities):
+    """Возвращает {product_id: количество} на склад одним UPDATE."""
+    if quantities:
+        returned = _by_product(quantities)
+        Product.objects.filter(id__in=sorted(quantities)).update(stock=F('stock') + returned)
+        _stock_changed()
+
+
+def _release(order_ids, restock):
+    reservations = StockReservation.objects.filter(order_id__in=order_ids)
+    if restock:
+        return_stock(dict(reservations.values('product_id').annotate(total=Sum('quantity'))
+                          .values_list('product_id', 'total')))
+    reservations.delete()
+
+
+def release_reservations(now=None, batch_size=DEFAULT_RELEASE_BATCH_SIZE):
+    """
+    Один проход уборщика резервов. Возвращает {'expired': заказов отменено по сроку,
+    'restocked': заказов, чей товар вернулся на склад, 'closed': заказов, чей резерв закрыт}.
+    """
+    now = now or timezone.now()
+    stats = {'expired': 0, 'restocked': 0, 'closed': 0}
+    with transaction.atomic():
+        reserved = StockReservation.objects.values('order_id')
+        expired = list(
+            Order.objects.select_for_update()
+            .filter(status=Order.RESERVED, id__in=reserved.filter(expires_at__lte=now))
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        Order.objects.filter(id__in=expired).update(status=Order.CANCELLED)
+        stats['expired'] = len(expired)
+
+        # Отменённые вручную (в админке) — тоже возвращаем товар
+        cancelled = list(
+            Order.objects.select_for_update()
+            .filter(status=Order.CANCELLED, id__in=reserved)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        _release(cancelled, restock=True)
+        stats['restocked'] = len(cancelled)
+
+        confirmed = list(
+            Order.objects.filter(status=Order.CONFIRMED, id__in=reserved)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        _release(confirmed, restock=False)
+        stats['closed'] = len(confirmed)
+    return stats
@@ -0,0 +1,298 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from products.models import Product
+from .fakes import FakeSMTPServer, FakeTelegramServer
+from .models import Order, OutboxMessage, StockReservation
+from .outbox import MAX_ATTEMPTS, process_outbox
+from .services import place_order
+from .stock import OutOfStock, release_reservations
+from .transports import EmailTransport, TelegramTransport, coalesce
+
+
+class CheckoutTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="buyer", email="buyer@example.com")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill(self, count):
+        for i in range(count):
+            product = Product.objects.create(name=f"Товар {i}", description="", price=Decimal('99.90'), stock=10)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def checkout(self):
+        return self.client.post('/api/cart/checkout/', {'name': "Иван", 'phone': "+7 900 000-00-00"}, format='json')
+
+    def test_order_and_outbox_written_together(self):
+        self.fill(3)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual(response.json()['order_id'], order.id)
+        self.assertEqual(order.total, Decimal('599.40'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertFalse(self.cart.items.exists())
+        # Сеть в запросе не участвует: письмо только поставлено в очередь
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.channel, message.status), (OutboxMessage.EMAIL, OutboxMessage.PENDING))
+        self.assertIn("Итого: 599.40 ₽", message.payload['text'])
+
+        call_command('run_outbox', once=True, stdout=open('/dev/null', 'w'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, f"Новый заказ №{order.id} от Иван")
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.SENT)
+
+    def test_query_count_does_not_depend_on_items(self):
+        self.fill(1)
+        with CaptureQueriesContext(connection) as small:
+            self.checkout()
+        self.fill(20)
+        with CaptureQueriesContext(connection) as large:
+            self.checkout()
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_contacts(self):
+        self.fill(1)
+        for contacts in ({'phone': "8" * 21}, {'email': "не почта"}, {'name': "И" * 201}):
+            response = self.client.post('/api/cart/checkout/', contacts, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(contacts)), response.json())
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(self.cart.items.exists())
+
+    def test_empty_cart(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OutboxRetryTest(TestCase):
+    def setUp(self):
+        self.message = OutboxMessage.objects.create(channel=OutboxMessage.EMAIL, payload={'subject': 's', 'text': 't'})
+
+    def test_backoff_then_failed(self):
+        def broken(payload):
+            raise ConnectionError("SMTP недоступен")
+
+        stats = process_outbox(transports={OutboxMessage.EMAIL: broken})
+        self.assertEqual(stats, {'sent': 0, 'retry': 1, 'failed': 0})
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.attempts, 1)
+        self.assertIn("SMTP недоступен", self.message.last_error)
+        self.assertGreater(self.message.next_attempt_at, timezone.now())
+        # До следующей попытки сообщение не берётся
+        self.assertEqual(process_outbox(transports={OutboxMessage.EMAIL: broken}), {'sent': 0, 'retry': 0, 'failed': 0})
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            OutboxMessage.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            process_outbox(transports={OutboxMessage.EMAIL: broken})
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.attempts), (OutboxMessage.FAILED, MAX_ATTEMPTS))
+
+    def test_recovers_after_error(self):
+        calls = []
+
+        def flaky(payload):
+            calls.append(payload)
+            if len(calls) == 1:
+                raise TimeoutError("timeout")
+
+        process_outbox(transports={OutboxMessage.EMAIL: flaky})
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_outbox(transports={OutboxMessage.EMAIL: flaky})['sent'], 1)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.status, self.message.last_error), (OutboxMessage.SENT, ''))
+
+
+class TransportTest(TestCase):
+    def payloads(self, count):
+        return [{'subject': f"Заказ №{i}", 'text': f"Заказ №{i}, итого {i}00 ₽"} for i in range(count)]
+
+    def test_email_reuses_connection(self):
+        with FakeSMTPServer() as server:
+            host, port = server.address
+            transport = EmailTransport(
+                recipient=lambda: "admin@example.com", from_email="shop@example.com",
+                backend='django.core.mail.backends.smtp.EmailBackend', host=host, port=port,
+                use_tls=False, use_ssl=False,
+            )
+            self.assertEqual(transport.send_many(self.payloads(10)), [None] * 10)
+            self.assertEqual(transport.send_many(self.payloads(5)), [None] * 5)
+            self.assertEqual((len(server.messages), server.connections), (15, 1))
+            # Сервер закрыл соединение за время простоя — транспорт переподключается
+            transport._connection.connection.quit()
+            self.assertEqual(transport.send_many(self.payloads(1)), [None])
+            self.assertEqual((len(server.messages), server.connections), (16, 2))
+            transport.close()
+
+    def test_telegram_pool_and_concurrency(self):
+        with FakeTelegramServer() as server:
+            transport = TelegramTransport("token", 42, base_url=server.url, concurrency=2, coalesce=False)
+            self.assertEqual(transport.send_many(self.payloads(10)), [None] * 10)
+            self.assertEqual(transport.send_many(self.payloads(10)), [None] * 10)
+            transport.close()
+        self.assertEqual(len(server.messages), 20)
+        self.assertEqual(server.messages[0]['chat_id'], 42)
+        self.assertLessEqual(server.connections, 2)
+
+    def test_telegram_coalesces_burst(self):
+        with FakeTelegramServer() as server:
+            transport = TelegramTransport("token", 42, base_url=server.url)
+            self.assertEqual(transport.send_many(self.payloads(30)), [None] * 30)
+            transport.close()
+        self.assertEqual(len(server.messages), 1)
+        self.assertIn("Заказ №29", server.messages[0]['text'])
+
+    def test_telegram_error_marks_whole_group(self):
+        with FakeTelegramServer(fail=True) as server:
+            transport = TelegramTransport("token", 42, base_url=server.url)
+            errors = transport.send_many(self.payloads(3))
+            transport.close()
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all("Internal Server Error" in str(error) for error in errors))
+
+    def test_coalesce_respects_limit(self):
+        groups = coalesce(["a" * 60, "b" * 60, "c" * 200], limit=150, separator="|")
+        self.assertEqual([indexes for _, indexes in groups], [[0, 1], [2]])
+        self.assertEqual(len(groups[1][0]), 150)
+
+    def test_outbox_batches_per_channel(self):
+        OutboxMessage.objects.bulk_create(
+            OutboxMessage(channel=OutboxMessage.TELEGRAM, payload=payload) for payload in self.payloads(5)
+        )
+        with FakeTelegramServer() as server:
+            transport = TelegramTransport("token", 42, base_url=server.url)
+            # claim (в транзакции) и один UPDATE на все доставленные
+            with self.assertNumQueries(5):
+                stats = process_outbox(transports={OutboxMessage.TELEGRAM: transport})
+            transport.close()
+        self.assertEqual(stats, {'sent': 5, 'retry': 0, 'failed': 0})
+        self.assertEqual(len(server.messages), 1)
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.SENT).exists())
+        self.assertEqual(set(OutboxMessage.objects.values_list('attempts', flat=True)), {1})
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="buyer")
+        self.cart = Cart.objects.create(user=self.user)
+        self.paint = Product.objects.create(name="Краска", description="", price=100, stock=5)
+        self.primer = Product.objects.create(name="Грунт", description="", price=50, stock=1)
+
+    def order(self, **quantities):
+        for product_id, quantity in quantities.items():
+            CartItem.objects.add_quantity(self.cart.id, int(product_id.lstrip('p')), quantity)
+        return place_order(self.cart, name="Иван")
+
+    def stock(self):
+        return list(Product.objects.order_by('id').values_list('stock', flat=True))
+
+    def test_reserves_all_lines(self):
+        order = self.order(**{f'p{self.paint.id}': 3, f'p{self.primer.id}': 1})
+        self.assertEqual(self.stock(), [2, 0])
+        self.assertEqual(order.status, Order.RESERVED)
+        self.assertEqual(sorted(order.reservations.values_list('product_id', 'quantity')),
+                         [(self.paint.id, 3), (self.primer.id, 1)])
+
+    def test_shortage_changes_nothing(self):
+        with self.assertRaises(OutOfStock) as caught:
+            self.order(**{f'p{self.paint.id}': 3, f'p{self.primer.id}': 2})
+        self.assertEqual(caught.exception.shortages, {self.primer.id: 1})
+        self.assertEqual(self.stock(), [5, 1])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_checkout_conflict(self):
+        CartItem.objects.add_quantity(self.cart.id, self.primer.id, 4)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/cart/checkout/', {'name': "Иван"}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['products'], [{'id': self.primer.id, 'available': 1}])
+
+    def test_sweeper(self):
+        expired = self.order(**{f'p{self.paint.id}': 2})
+        confirmed = self.order(**{f'p{self.paint.id}': 1})
+        cancelled = self.order(**{f'p{self.primer.id}': 1})
+        waiting = self.order(**{f'p{self.paint.id}': 1})
+        self.assertEqual(self.stock(), [1, 0])
+        StockReservation.objects.filter(order=expired).update(expires_at=timezone.now() - timedelta(minutes=1))
+        Order.objects.filter(id=confirmed.id).update(status=Order.CONFIRMED)
+        Order.objects.filter(id=cancelled.id).update(status=Order.CANCELLED)
+
+        self.assertEqual(release_reservations(), {'expired': 1, 'restocked': 2, 'closed': 1})
+        # Вернулись 2 краски просроченного заказа и грунт отменённого; продано 1 + 1 в резерве
+        self.assertEqual(self.stock(), [3, 1])
+        self.assertEqual(Order.objects.get(id=expired.id).status, Order.CANCELLED)
+        self.assertEqual(list(StockReservation.objects.values_list('order_id', flat=True)), [waiting.id])
+        self.assertEqual(release_reservations(), {'expired': 0, 'restocked': 0, 'closed': 0})
+
+
+class StockStressTest(TransactionTestCase):
+    """Параллельные оформления не продают больше, чем есть на складе"""
+    THREADS = 8
+    STOCK = 60
+
+    def test_no_oversell(self):
+        products = [Product.objects.create(name=f"Товар {i}", description="", price=100, stock=self.STOCK)
+                    for i in range(2)]
+        carts = [Cart.objects.create(user=User.objects.create(username=f"buyer{i}")) for i in range(self.THREADS)]
+        errors, placed = [], []
+        start = threading.Barrier(self.THREADS)
+
+        def retry(func, *args):
+            # Общий кэш SQLite в памяти блокирует таблицу без ожидания — повторяем.
+            # Повтор безопасен: оформление — одна транзакция, упавшая попытка откатилась
+            while True:
+                try:
+                    return func(*args)
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.001)
+
+        def buyer(cart, quantity):
+            try:
+                start.wait()
+                while True:
+                    # Товары в корзине в разном порядке — резерв всё равно идёт по id
+                    for product in (products if quantity % 2 else products[::-1]):
+                        retry(CartItem.objects.add_quantity, cart.id, product.id, quantity)
+                    try:
+                        placed.append(retry(place_order, cart, "Покупатель"))
+                    except OutOfStock:
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer, args=(cart, 1 + i % 3)) for i, cart in enumerate(carts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for product in products:
+            product.refresh_from_db()
+            reserved = sum(StockReservation.objects.filter(product=product).values_list('quantity', flat=True))
+            self.assertEqual(product.stock + reserved, self.STOCK)
+        # Покупатели остановились, когда какой-то товар закончился
+        self.assertLess(min(product.stock for product in products), 3)
+        # Заказ берёт не больше 3 штук товара — до остатка меньше 3 нужно столько заказов
+        self.assertGreaterEqual(len(placed), (self.STOCK - 2) // 3)
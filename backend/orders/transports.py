@@ -0,0 +1,187 @@
+"""
+Долгоживущие транспорты уведомлений для run_outbox.
+
+Раньше каждое сообщение создавало новый telegram.Bot, новый event loop (asyncio.run)
+и новое SMTP-соединение — то есть новое TCP/TLS-рукопожатие на каждый заказ.
+Транспорты создаются один раз на процесс воркера:
+
+- TelegramTransport держит event loop в фоновом потоке и один httpx.AsyncClient с пулом
+  keep-alive соединений. Всплеск сообщений склеивается в меньшее число sendMessage
+  (до лимита Telegram в 4096 символов), одновременных запросов не больше concurrency.
+- EmailTransport держит одно SMTP-соединение открытым между пачками и переоткрывает
+  его, если сервер его закрыл.
+
+У каждого канала свой таймаут. Транспорт отправляет пачку: send_many(payloads)
+возвращает для каждого сообщения None (доставлено) или исключение.
+"""
+import asyncio
+import smtplib
+import threading
+
+import httpx
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+TELEGRAM_MESSAGE_LIMIT = 4096
+COALESCE_SEPARATOR = '\n\n* * *\n\n'
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_TELEGRAM_CONCURRENCY = 4
+
+
+class TelegramError(Exception):
+    pass
+
+
+def coalesce(texts, limit=TELEGRAM_MESSAGE_LIMIT, separator=COALESCE_SEPARATOR):
+    """
+    Склеивает подряд идущие тексты в сообщения не длиннее limit.
+    Возвращает [(текст, [номера исходных текстов])]; слишком длинный текст обрезается.
+    """
+    groups = []
+    for index, text in enumerate(texts):
+        if len(text) > limit:
+            text = text[:limit - 1] + '…'
+        if groups and len(groups[-1][0]) + len(separator) + len(text) <= limit:
+            joined, indexes = groups[-1]
+            groups[-1] = (joined + separator + text, indexes + [index])
+        else:
+            groups.append((text, [index]))
+    return groups
+
+
+class TelegramTransport:
+    def __init__(self, token, chat_id, base_url=TELEGRAM_API_URL, timeout=DEFAULT_TIMEOUT,
+                 concurrency=DEFAULT_TELEGRAM_CONCURRENCY, coalesce=True):
+        self.token = token
+        self.chat_id = chat_id
+        self.base_url = base_url
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.coalesce = coalesce
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='telegram-transport', daemon=True)
+            thread.start()
+            self._loop, self._thread = loop, thread
+
+    def _run(self, coroutine):
+        self._start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _get_client(self):
+        # Клиент и семафор создаются внутри loop транспорта и живут вместе с ним
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def _send(self, text):
+        client = self._get_client()
+        async with self._semaphore:
+            response = await client.post(
+                f'/bot{self.token}/sendMessage', json={'chat_id': self.chat_id, 'text': text}
+            )
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code != 200 or not data.get('ok'):
+            raise TelegramError(data.get('description') or f'HTTP {response.status_code}')
+
+    async def _send_many(self, texts):
+        groups = coalesce(texts) if self.coalesce else [(text, [i]) for i, text in enumerate(texts)]
+        results = await asyncio.gather(*(self._send(text) for text, _ in groups), return_exceptions=True)
+        errors = [None] * len(texts)
+        for (_, indexes), result in zip(groups, results):
+            if isinstance(result, Exception):
+                for index in indexes:
+                    errors[index] = result
+        return errors
+
+    def send_many(self, payloads):
+        return self._run(self._send_many([payload['text'] for payload in payloads]))
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+class EmailTransport:
+    """
+    Письма через одно SMTP-соединение. recipient — функция, возвращающая адрес
+    (читается один раз на пачку); connection_options передаются в get_connection.
+    """
+
+    def __init__(self, recipient, from_email=None, timeout=DEFAULT_TIMEOUT, **connection_options):
+        self.recipient = recipient
+        self.from_email = from_email
+        self.timeout = timeout
+        self.connection_options = connection_options
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        if self._connection is None:
+            connection = get_connection(fail_silently=False, timeout=self.timeout, **self.connection_options)
+            connection.open()
+            self._connection = connection
+        return self._connection
+
+    def _send(self, message):
+        # Соединение могло быть закрыто сервером за время простоя — одна повторная попытка
+        for attempt in (1, 2):
+            try:
+                self._get_connection().send_messages([message])
+                return None
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                self._drop_connection()
+                if attempt == 2:
+                    return e
+            except Exception as e:
+                return e
+
+    def send_many(self, payloads):
+        with self._lock:
+            try:
+                recipient = self.recipient()
+            except Exception as e:
+                return [e] * len(payloads)
+            from_email = self.from_email or settings.DEFAULT_FROM_EMAIL
+            return [
+                self._send(EmailMessage(payload['subject'], payload['text'], from_email, [recipient]))
+                for payload in payloads
+            ]
+
+    def _drop_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._drop_connection()
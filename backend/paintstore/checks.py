@@ -0,0 +1,47 @@
+"""
+Проверки конфигурации (manage.py check --deploy, выполняется на release в Procfile).
+
+Версии ресурсов (paintstore/versions.py), снимки каталога, фасеты и гостевые корзины
+лежат в кэше, а поднимают версии и веб-воркеры, и команды manage.py (импорт каталога,
+rebuild_ratings, build_recommendations). С кэшем в памяти процесса воркеры этих
+изменений не видят и бессрочно отдают устаревшие данные и 304.
+
+DatabaseCache общий, но держит кэш в основной БД: каждое действие с гостевой корзиной
+и каждое чтение версии — запрос к ней. Для продакшена нужен Redis.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+DATABASE_CACHES = (
+    'django.core.cache.backends.db.DatabaseCache',
+)
+
+
+def cache_is_process_local():
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not cache_is_process_local():
+        return []
+    return [Error(
+        "Кэш по умолчанию локален для процесса: версии каталога и гостевые корзины не видны другим процессам",
+        hint="Настройте CACHES['default'] на Redis (REDIS_URL), см. settings.py.example",
+        id='paintstore.E001',
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_cache_outside_database(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in DATABASE_CACHES:
+        return []
+    return [Warning(
+        "Кэш по умолчанию лежит в основной БД: гостевые корзины и версии каталога нагружают её на каждом запросе",
+        hint="Задайте REDIS_URL (Redis для CACHES['default']), см. settings.py.example",
+        id='paintstore.W001',
+    )]
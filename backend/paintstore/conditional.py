@@ -0,0 +1,75 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) по версиям ресурсов (paintstore/versions.py).
+
+Валидатор строится только из версии ресурса в кэше и адреса запроса, поэтому
+ответ 304 Not Modified отдаётся без запросов к основным таблицам и без сериализаторов.
+"""
+import functools
+import hashlib
+
+from django.http import HttpRequest, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework.request import Request
+
+from .versions import get_version
+
+
+def _find_request(args):
+    # Подходит и для функций (request, ...), и для методов (self, request, ...)
+    for arg in args[:2]:
+        if isinstance(arg, (HttpRequest, Request)):
+            return arg
+    raise TypeError("conditional_get: не найден аргумент request")
+
+
+def resource_etag(request, *resources):
+    versions = ':'.join(f'{resource}={get_version(resource)}' for resource in resources)
+    digest = hashlib.md5(f'{versions}|{request.get_full_path()}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def last_modified(*resources):
+    # Версия — метка времени в наносекундах
+    return max(get_version(resource) for resource in resources) // 10**9
+
+
+def is_not_modified(request, etag, modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # If-None-Match главнее If-Modified-Since (RFC 9110)
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or f'W/{etag}' in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and modified <= if_modified_since
+
+
+def conditional_get(*resources):
+    """
+    Декоратор для GET-обработчиков, данные которых зависят только от указанных ресурсов:
+
+        @conditional_get(CATALOG)
+        def list(self, request, *args, **kwargs): ...
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = _find_request(args)
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            etag = resource_etag(request, *resources)
+            modified = last_modified(*resources)
+            if is_not_modified(request, etag, modified):
+                response = HttpResponseNotModified()
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            # Браузер может хранить ответ, но обязан перепроверять его при каждом запросе
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
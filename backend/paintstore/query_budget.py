@@ -0,0 +1,31 @@
+"""
+Бюджет запросов к БД в тестах: число запросов эндпоинта не должно расти с числом строк.
+
+QueryBudgetTestMixin дважды наполняет базу через seed() (SEED_COUNTS строк) и каждый раз
+проверяет, что GET к эндпоинту укладывается ровно в budget запросов. N+1 (запрос на каждый
+товар, отзыв или позицию корзины) даёт разное число запросов и ломает такие тесты.
+"""
+
+
+class QueryBudgetTestMixin:
+    """Примесь к TestCase: seed(count, **kwargs) в тесте и assertBudget(budget, url)."""
+
+    SEED_COUNTS = (1, 10)
+
+    def seed(self, count, **kwargs):
+        raise NotImplementedError
+
+    def before_budget_request(self):
+        """Вызывается перед каждым замером (например, чтобы заново авторизовать клиента)."""
+
+    def assertBudget(self, budget, url, params=None, **seed_kwargs):
+        """Возвращает ответ последнего замера."""
+        for count in self.SEED_COUNTS:
+            # Наполнение — как отдельная закоммиченная транзакция: версии в кэше поднимаются
+            with self.captureOnCommitCallbacks(execute=True):
+                self.seed(count, **seed_kwargs)
+            self.before_budget_request()
+            with self.assertNumQueries(budget):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+        return response
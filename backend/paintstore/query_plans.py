@@ -0,0 +1,77 @@
+"""
+Проверка планов запросов в тестах (EXPLAIN).
+
+QueryPlanTestMixin перехватывает SQL, который выполняет эндпоинт, и прогоняет
+EXPLAIN для запросов к нужной таблице. Тест падает, если таблица читается
+полным просмотром (SQLite: SCAN без индекса, PostgreSQL: Seq Scan) или результат
+сортируется отдельно (SQLite: USE TEMP B-TREE, PostgreSQL: Sort).
+
+На PostgreSQL маленькая тестовая таблица дешевле читается целиком, поэтому
+перед EXPLAIN отключаем enable_seqscan/enable_sort: план покажет, есть ли
+подходящий индекс вообще. На других СУБД планы не разбираются — такие тесты пропускаются.
+"""
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# СУБД, планы которых умеет разбирать plan_problems()
+PLAN_VENDORS = ('sqlite', 'postgresql')
+
+
+def explain(sql):
+    """Строки плана для готового SQL (параметры уже подставлены)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return [' '.join(map(str, row)) for row in cursor.fetchall()]
+
+
+def plan_problems(plan, table):
+    """Что в плане мешает: полный просмотр table и сортировки вне индекса."""
+    problems = []
+    for line in plan:
+        if connection.vendor == 'sqlite':
+            if re.match(rf'SCAN {table}\b', line) and 'INDEX' not in line:
+                problems.append(line)
+            elif 'USE TEMP B-TREE' in line:
+                problems.append(line)
+        elif f'Seq Scan on {table}' in line or re.search(r'(?<!Incremental )\bSort\b', line):
+            problems.append(line.strip())
+    return problems
+
+
+class QueryPlanTestMixin:
+    """Примесь к TestCase: assertIndexedPlan(response_callable, table)."""
+
+    def capture_queries(self, table, func):
+        with CaptureQueriesContext(connection) as queries:
+            response = func()
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in queries
+                      if re.search(rf'\bFROM "?{table}"?', query['sql'])]
+        self.assertTrue(statements, f"Эндпоинт не читает {table}")
+        return statements
+
+    def assertIndexedPlan(self, func, table, search=False):
+        """
+        func — вызов эндпоинта (например, lambda: self.client.get(url)).
+        search=True — таблица должна читаться поиском по индексу (SEARCH), а не
+        проходом по всему индексу (для запросов с фильтром по обычному индексу;
+        проход по частичному индексу и так читает только подходящие строки).
+        """
+        if connection.vendor not in PLAN_VENDORS:
+            self.skipTest(f"Планы запросов {connection.vendor} не разбираются")
+        for sql in self.capture_queries(table, func):
+            plan = explain(sql)
+            problems = plan_problems(plan, table)
+            if search and connection.vendor == 'sqlite':
+                problems += [line for line in plan if re.match(rf'SCAN {table}\b', line)]
+            self.assertFalse(problems, f"Неудачный план для\n{sql}\n" + '\n'.join(plan))
@@ -14,4 +14,14 @@ DATABASES = {
 CORS_ALLOWED_ORIGINS = [
     "https://paint-store-frontend.vercel.app",  # ← будет ваш URL
     "http://localhost:5173",  # для локальной разработки
-]
\ No newline at end of file
+]
+
+# Общий кэш для всех воркеров (см. settings.py): Redis из REDIS_URL или таблица в БД
+# (manage.py createcachetable выполняется на release, см. Procfile)
+if os.environ.get('REDIS_URL'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                          'LOCATION': os.environ['REDIS_URL']}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                          'LOCATION': 'paintstore_cache',
+                          'OPTIONS': {'MAX_ENTRIES': 1_000_000}}}
@@ -38,6 +38,8 @@ router.register(r'background-images', BackgroundImageViewSet, basename='backgrou
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/products/<int:product_id>/reviews/', ReviewViewSet.as_view({'get': 'product_reviews'}),
+         name='product-reviews'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/contacts/', include('contacts.urls')),  # → создадим contacts/urls.py
@@ -0,0 +1,30 @@
+"""
+Версии ресурсов в кэше.
+
+Версия — это метка времени последнего изменения ресурса (в наносекундах). Её поднимают
+сигналы при сохранении/удалении моделей, а читатели подмешивают в ключи кэша:
+после изменения старые записи просто перестают находиться и истекают сами.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _key(resource):
+    return f'version:{resource}'
+
+
+def get_version(resource):
+    """Текущая версия ресурса (создаётся при первом обращении)."""
+    version = cache.get(_key(resource))
+    if version is None:
+        cache.add(_key(resource), time.time_ns(), None)
+        version = cache.get(_key(resource))
+    return version
+
+
+def bump_version(resource):
+    """Отмечает ресурс изменённым — все закэшированные производные становятся неактуальными."""
+    version = time.time_ns()
+    cache.set(_key(resource), version, None)
+    return version
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (инвалидация кэша каталога)
+        from . import signals  # noqa: F401
+        # Проверка общего кэша: от него зависят версии каталога и снимки
+        from paintstore import checks  # noqa: F401
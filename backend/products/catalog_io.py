@@ -0,0 +1,247 @@
+"""
+Потоковый импорт/экспорт каталога (прайс-листы поставщиков на десятки тысяч позиций).
+
+Импорт читает CSV/JSONL построчно, считает хэш каждой строки и пишет в БД только
+новые и изменившиеся товары — пачками bulk_create/bulk_update, каждая пачка в своей
+транзакции (вместе с поисковым индексом). Производители ищутся по названию
+в словаре, загруженном один раз.
+
+Экспорт идёт через .values_list().iterator(), поэтому память не растёт с размером каталога.
+"""
+import csv
+import hashlib
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.db import transaction
+
+from paintstore.versions import bump_version
+from .models import Manufacturer, Product
+from .search import product_index
+from .signals import CATALOG, products_renamed
+
+# Колонки прайс-листа (manufacturer — название производителя)
+CATALOG_COLUMNS = ['sku', 'name', 'description', 'price', 'stock', 'image_url', 'category', 'manufacturer']
+# Поля модели, которые обновляет импорт
+IMPORT_FIELDS = ['name', 'description', 'price', 'stock', 'image_url', 'category', 'manufacturer', 'import_hash']
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 1000
+# Границы, которые примет БД: DecimalField(max_digits=10, decimal_places=2) и integer
+_price_field = Product._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (_price_field.max_digits - _price_field.decimal_places) - Decimal('0.01')
+MAX_STOCK = 2 ** 31 - 1
+
+
+class CatalogRowError(ValueError):
+    pass
+
+
+class CatalogFileError(ValueError):
+    """Файл нельзя читать дальше (например, не UTF-8); импорт прерывается."""
+
+
+def detect_format(filename, default='csv'):
+    """Формат по расширению файла: .jsonl/.ndjson -> jsonl, иначе csv."""
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, file_format):
+    """
+    Построчно читает бинарный поток. Отдаёт пары (номер строки, dict).
+    Бросает CatalogFileError, если файл не в UTF-8.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {file_format}")
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from _parse(text, file_format)
+    except UnicodeDecodeError:
+        raise CatalogFileError("Файл должен быть в кодировке UTF-8")
+
+
+def _parse(text, file_format):
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, CatalogRowError(f"Некорректный JSON: {e.msg}")
+                continue
+            yield line_number, row if isinstance(row, dict) else CatalogRowError("Ожидается объект")
+    elif file_format == 'csv':
+        # Первая строка — заголовок, поэтому данные начинаются со второй
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+
+
+def normalize_row(row):
+    """Приводит строку прайс-листа к значениям полей Product. Бросает CatalogRowError."""
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku:
+        raise CatalogRowError("Не указан артикул (sku)")
+    if not name:
+        raise CatalogRowError("Не указано название (name)")
+    try:
+        price = Decimal(str(row.get('price') or '0').replace(',', '.'))
+        # NaN проходит quantize, а сравнение с ним бросает InvalidOperation
+        if not price.is_finite():
+            raise InvalidOperation
+        price = price.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise CatalogRowError(f"Некорректная цена: {row.get('price')!r}")
+    try:
+        stock = int(row.get('stock') or 0)
+    except (TypeError, ValueError):
+        raise CatalogRowError(f"Некорректный остаток: {row.get('stock')!r}")
+    if price < 0 or stock < 0:
+        raise CatalogRowError("Цена и остаток не могут быть отрицательными")
+    if price > MAX_PRICE or stock > MAX_STOCK:
+        raise CatalogRowError(f"Цена не больше {MAX_PRICE}, остаток не больше {MAX_STOCK}")
+    return {
+        'sku': sku[:64],
+        'name': name[:200],
+        'description': str(row.get('description') or ''),
+        'price': price,
+        'stock': stock,
+        'image_url': str(row.get('image_url') or '').strip(),
+        'category': str(row.get('category') or '').strip()[:100],
+        'manufacturer': str(row.get('manufacturer') or '').strip()[:200],
+    }
+
+
+def row_hash(values):
+    canonical = json.dumps([str(values[column]) for column in CATALOG_COLUMNS], ensure_ascii=False)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class CatalogImporter:
+    """
+    Импорт с diff-upsert по артикулу.
+
+        importer = CatalogImporter()
+        stats = importer.run(read_rows(stream, 'csv'))
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, max_errors=100):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'errors': []}
+        # Все производители одним запросом: название -> id
+        self.manufacturers = dict(Manufacturer.objects.values_list('name', 'id'))
+
+    def run(self, rows):
+        """
+        Импортирует строки и возвращает stats. CatalogFileError пробрасывается, но пачки
+        до ошибки уже записаны — stats остаётся в self.stats.
+        """
+        batch = {}
+        try:
+            for line_number, row in rows:
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    values = normalize_row(row)
+                except CatalogRowError as e:
+                    self._fail(line_number, str(e))
+                    continue
+                values['import_hash'] = row_hash(values)
+                # Повтор артикула внутри пачки — побеждает последняя строка
+                batch[values['sku']] = values
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = {}
+            if batch:
+                self._flush(batch)
+        finally:
+            if self.stats['created'] or self.stats['updated']:
+                # bulk-операции не вызывают сигналы — инвалидируем кэши каталога вручную
+                transaction.on_commit(partial(bump_version, CATALOG))
+        return self.stats
+
+    def _fail(self, line_number, message):
+        self.stats['failed'] += 1
+        if len(self.stats['errors']) < self.max_errors:
+            self.stats['errors'].append({'line': line_number, 'error': message})
+
+    def _resolve_manufacturers(self, batch):
+        missing = {v['manufacturer'] for v in batch.values() if v['manufacturer']} - self.manufacturers.keys()
+        if missing:
+            Manufacturer.objects.bulk_create(
+                [Manufacturer(name=name) for name in missing], ignore_conflicts=True
+            )
+            self.manufacturers.update(
+                Manufacturer.objects.filter(name__in=missing).values_list('name', 'id')
+            )
+
+    @transaction.atomic
+    def _flush(self, batch):
+        self._resolve_manufacturers(batch)
+        existing = {
+            product.sku: product
+            for product in Product.objects.filter(sku__in=batch.keys()).only('id', 'sku', 'name', 'import_hash')
+        }
+        to_create, to_update, renamed = [], [], []
+        for sku, values in batch.items():
+            product = existing.get(sku)
+            if product is not None and product.import_hash == values['import_hash']:
+                self.stats['unchanged'] += 1
+                continue
+            fields = dict(values, manufacturer_id=self.manufacturers.get(values['manufacturer']))
+            del fields['manufacturer']
+            if product is None:
+                to_create.append(Product(**fields))
+            else:
+                if product.name != fields['name']:
+                    renamed.append(product.pk)
+                for name, value in fields.items():
+                    setattr(product, name, value)
+                to_update.append(product)
+        if to_create:
+            Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            Product.objects.bulk_update(to_update, IMPORT_FIELDS, batch_size=self.batch_size)
+        # bulk-операции идут мимо сигналов — обновляем поисковый индекс сами
+        product_index.refresh([product.pk for product in to_create + to_update])
+        if renamed:
+            # Название товара есть и в других индексах (поиск модератора по отзывам)
+            products_renamed.send(sender=Product, product_ids=renamed)
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+    def write(self, value):
+        return value
+
+
+def iter_export(file_format, queryset=None, chunk_size=2000):
+    """Генератор строк выгрузки каталога (для StreamingHttpResponse или файла)."""
+    if file_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {file_format}")
+    queryset = Product.objects.all() if queryset is None else queryset
+    rows = (
+        queryset.order_by('id')
+        .values_list('sku', 'name', 'description', 'price', 'stock', 'image_url', 'category', 'manufacturer__name')
+        .iterator(chunk_size=chunk_size)
+    )
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(CATALOG_COLUMNS)
+        for row in rows:
+            yield writer.writerow(['' if value is None else value for value in row])
+    else:
+        for row in rows:
+            record = dict(zip(CATALOG_COLUMNS, row))
+            record['price'] = str(record['price'])
+            yield json.dumps(record, ensure_ascii=False) + '\n'
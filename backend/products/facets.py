@@ -0,0 +1,91 @@
+"""
+Фасеты каталога: сколько товаров в каждой категории, у каждого производителя,
+в каждом ценовом диапазоне и в наличии/не в наличии.
+
+Считается тремя агрегирующими запросами в БД; результат кэшируется по набору
+фильтров и версии каталога (см. products/signals.py).
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from paintstore.versions import get_version
+from .signals import CATALOG
+
+# Границы ценовых диапазонов, ₽: [0, 500), [500, 1000), ..., [10000, ∞)
+PRICE_BUCKETS = (0, 500, 1000, 3000, 10000)
+# Параметры запроса, которые влияют на выборку (cursor, ordering и т.п. — не влияют)
+FACET_PARAMS = ('q', 'manufacturer_id', 'category', 'price_min', 'price_max', 'in_stock', 'rating_min')
+FACETS_CACHE_TIMEOUT = 60 * 10
+
+
+def _price_ranges():
+    bounds = list(PRICE_BUCKETS) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def build_facets(queryset):
+    """Считает фасеты для уже отфильтрованного queryset."""
+    queryset = queryset.order_by()
+
+    categories = (
+        queryset.exclude(category='')
+        .values('category')
+        .annotate(count=Count('id'))
+        .order_by('category')
+    )
+    manufacturers = (
+        queryset.filter(manufacturer__isnull=False)
+        .values('manufacturer_id', 'manufacturer__name')
+        .annotate(count=Count('id'))
+        .order_by('manufacturer__name')
+    )
+
+    # Цена и наличие — одним запросом через условные агрегаты
+    ranges = _price_ranges()
+    aggregates = {
+        'in_stock': Count('id', filter=Q(stock__gt=0)),
+        'out_of_stock': Count('id', filter=Q(stock=0)),
+    }
+    for index, (low, high) in enumerate(ranges):
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f'price_{index}'] = Count('id', filter=condition)
+    totals = queryset.aggregate(**aggregates)
+
+    return {
+        'categories': [
+            {'category': row['category'], 'count': row['count']} for row in categories
+        ],
+        'manufacturers': [
+            {'id': row['manufacturer_id'], 'name': row['manufacturer__name'], 'count': row['count']}
+            for row in manufacturers
+        ],
+        'price': [
+            {'min': low, 'max': high, 'count': totals[f'price_{index}']}
+            for index, (low, high) in enumerate(ranges)
+        ],
+        'stock': {'in_stock': totals['in_stock'], 'out_of_stock': totals['out_of_stock']},
+    }
+
+
+def facets_cache_key(params):
+    filters = {name: params.get(name) for name in FACET_PARAMS if params.get(name)}
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f'products:facets:{get_version(CATALOG)}:{digest}'
+
+
+def get_facets(params, get_queryset):
+    """
+    Фасеты из кэша, а при промахе — из БД.
+    get_queryset вызывается только при промахе: поиск по ?q= тоже не нужен при попадании.
+    """
+    key = facets_cache_key(params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = build_facets(get_queryset())
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
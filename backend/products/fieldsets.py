@@ -0,0 +1,139 @@
+"""
+Разреженные наборы полей (sparse fieldsets) для списков.
+
+    ?fields=id,name,price      — только перечисленные поля;
+    ?fields=card               — готовый профиль из Meta.profiles сериализатора;
+    ?expand=manufacturer       — вложенный объект целиком вместо краткой формы
+                                 (Meta.brief или Meta.expanded).
+
+Без ?fields= ответ не меняется. Из БД выбираются только колонки, нужные выбранным
+полям (.only() + select_related), поэтому экономится и трафик, и создание объектов ORM.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+Fieldset = namedtuple('Fieldset', ['fields', 'expand'])
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Примесь к ModelSerializer. В Meta можно задать:
+        profiles = {'card': [...]}                  — именованные наборы полей;
+        brief = {'manufacturer': BriefSerializer}   — краткая форма вложенных объектов;
+        expanded = {'product': FullSerializer}      — полная форма по ?expand= для полей,
+                                                      которые по умолчанию краткие.
+    """
+
+    @classmethod
+    def resolve_fieldset(cls, fields_param, expand_param):
+        names = []
+        profiles = getattr(cls.Meta, 'profiles', {})
+        for name in _split(fields_param):
+            names.extend(profiles.get(name, [name]))
+        unknown = [name for name in names if name not in cls.Meta.fields]
+        if unknown:
+            raise ValidationError({'fields': f"Неизвестные поля: {', '.join(unknown)}"})
+        return Fieldset(fields=list(dict.fromkeys(names)), expand=set(_split(expand_param)))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('fieldset')
+        # Набор полей относится только к корневому сериализатору (или к элементу списка)
+        is_root = self.parent is None or isinstance(self.parent, serializers.ListSerializer)
+        if fieldset is None or not is_root:
+            return fields
+
+        selected = {name: field for name, field in fields.items()
+                    if name in fieldset.fields or field.write_only}
+        for name, brief_class in getattr(self.Meta, 'brief', {}).items():
+            if name in selected and name not in fieldset.expand:
+                selected[name] = brief_class(read_only=True)
+        for name, full_class in getattr(self.Meta, 'expanded', {}).items():
+            if name in selected and name in fieldset.expand:
+                selected[name] = full_class(read_only=True)
+        return selected
+
+
+def only_fields(serializer, model, prefix=''):
+    """
+    Колонки и связи, которые прочитает сериализатор: (['name', 'manufacturer__name'], {'manufacturer'}).
+    Поля с вычисляемым source (свойства модели, '*') не учитываются, если колонки
+    для них не перечислены в Meta.computed: {'rating_histogram': ['rating_1', ...]}.
+    """
+    columns, related = [], set()
+    computed = getattr(getattr(serializer, 'Meta', None), 'computed', {})
+    for field_name, field in serializer.fields.items():
+        if field_name in computed and not field.write_only:
+            columns.extend(prefix + column for column in computed[field_name])
+            continue
+        if field.write_only or field.source == '*':
+            continue
+        path, current = [], model
+        for part in field.source.split('.'):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                path = None
+                break
+            path.append(part)
+            if model_field.is_relation and not model_field.many_to_many and not model_field.one_to_many:
+                related.add(prefix + '__'.join(path))
+                current = model_field.related_model
+        if not path:
+            continue
+        name = prefix + '__'.join(path)
+        if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+            nested_columns, nested_related = only_fields(field, current, prefix=name + '__')
+            columns.extend(nested_columns)
+            related |= nested_related
+        elif not getattr(model_field, 'is_relation', False) or model_field.many_to_one:
+            columns.append(name)
+    # Внешние ключи тоже нужны: select_related не работает по отложенному полю
+    columns.extend(sorted(related))
+    return columns, related
+
+
+class SparseFieldsetViewMixin:
+    """Примесь к GenericAPIView: передаёт набор полей сериализатору и сужает SELECT."""
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            request = self.request
+            serializer_class = self.get_serializer_class()
+            self._fieldset = None
+            if (request is not None and request.method == 'GET'
+                    and request.query_params.get(self.fields_query_param)
+                    and issubclass(serializer_class, SparseFieldsetSerializerMixin)):
+                self._fieldset = serializer_class.resolve_fieldset(
+                    request.query_params.get(self.fields_query_param),
+                    request.query_params.get(self.expand_query_param),
+                )
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+    def get_queryset(self):
+        return self.apply_fieldset(super().get_queryset())
+
+    def apply_fieldset(self, queryset):
+        """Оставляет в SELECT только колонки выбранных полей."""
+        if self.get_fieldset() is None:
+            return queryset
+        columns, related = only_fields(self.get_serializer(), queryset.model)
+        # select_related(None): связи, которые не попали в набор полей, не подтягиваем
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from paintstore.checks import cache_is_process_local
+from products.recommendations import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит «часто покупают вместе» по заказам (по умолчанию — только по новым позициям; "
+        "если заказы удалялись — с нуля)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Пересчитать с нуля, а не инкрементально")
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help="Сколько соседей хранить у товара")
+        parser.add_argument('--min-support', type=int, default=1,
+                            help="Минимум заказов, где товары куплены вместе")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Заказов в одной пачке")
+
+    def handle(self, *args, **options):
+        stats = build_recommendations(
+            full=options['full'],
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            min_support=options['min_support'],
+        )
+        if cache_is_process_local():
+            # Версия RECOMMENDATIONS поднялась только в кэше этого процесса
+            self.stderr.write("Кэш локален для процесса: веб-воркеры будут отдавать старые ETag /related/")
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Полный пересчёт' if stats['full'] else 'Прирост'} — позиций заказов: {stats['items']}, "
+            f"заказов: {stats['orders']}, обновлены соседи у товаров: {stats['products']}"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from products.catalog_io import FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка каталога в CSV/JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('-o', '--output', help="Файл для выгрузки (по умолчанию — stdout)")
+
+    def handle(self, *args, **options):
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in iter_export(options['format']):
+                    output.write(chunk)
+        else:
+            for chunk in iter_export(options['format']):
+                self.stdout.write(chunk, ending='')
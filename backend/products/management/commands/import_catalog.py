@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_io import CatalogFileError, CatalogImporter, DEFAULT_BATCH_SIZE, FORMATS, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = "Импорт прайс-листа (CSV/JSONL) в каталог: создаёт новые и обновляет изменившиеся товары по артикулу"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу прайс-листа")
+        parser.add_argument('--format', choices=FORMATS, help="Формат файла (по умолчанию — по расширению)")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f"Не удалось открыть файл: {e}")
+        importer = CatalogImporter(batch_size=options['batch_size'])
+        with stream:
+            try:
+                stats = importer.run(read_rows(stream, file_format))
+            except CatalogFileError as e:
+                raise CommandError(
+                    f"{e}. Уже записано — создано: {importer.stats['created']}, обновлено: {importer.stats['updated']}"
+                )
+
+        for error in stats['errors']:
+            self.stderr.write(f"Строка {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: {stats['created']}, обновлено: {stats['updated']}, "
+            f"без изменений: {stats['unchanged']}, с ошибками: {stats['failed']}"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.search import product_index
+
+
+class Command(BaseCommand):
+    help = "Полностью перестраивает полнотекстовый индекс каталога (после правок БД в обход ORM)"
+
+    def handle(self, *args, **options):
+        product_index.rebuild()
+        self.stdout.write(self.style.SUCCESS("Поисковый индекс каталога перестроен"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from paintstore.checks import cache_is_process_local
+from products.snapshot import warm
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит снимки публичного каталога (JSON + gzip/br) в общем кэше — "
+        "после деплоя или импорта, чтобы первые посетители не ждали рендеринга"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000',
+                            help="Адрес сайта: от него зависят абсолютные ссылки на логотипы")
+
+    def handle(self, *args, **options):
+        # Снимки в кэше этого процесса никто, кроме него, не увидит
+        if cache_is_process_local():
+            raise CommandError("Кэш локален для процесса — прогревать нечего, настройте общий кэш (CACHES)")
+        for query, sizes in warm(options['base_url']).items():
+            variants = ', '.join(f"{encoding}: {size} Б" for encoding, size in sizes.items())
+            self.stdout.write(f"/api/products/?{query} — {variants}")
+        self.stdout.write(self.style.SUCCESS("Снимки каталога готовы"))
@@ -0,0 +1,137 @@
+# Теневой полнотекстовый индекс для поиска по каталогу (?q= в /api/products/)
+
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE products_product_fts USING fts5(
+        name, description, category, manufacturer,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO products_product_fts (rowid, name, description, category, manufacturer)
+    SELECT p.id, p.name, p.description, p.category, COALESCE(m.name, '')
+    FROM products_product p LEFT JOIN products_manufacturer m ON m.id = p.manufacturer_id
+    """,
+    """
+    CREATE TRIGGER products_product_fts_ai AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts (rowid, name, description, category, manufacturer)
+        VALUES (new.id, new.name, new.description, new.category,
+                COALESCE((SELECT name FROM products_manufacturer WHERE id = new.manufacturer_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_au
+    AFTER UPDATE OF name, description, category, manufacturer_id ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+        INSERT INTO products_product_fts (rowid, name, description, category, manufacturer)
+        VALUES (new.id, new.name, new.description, new.category,
+                COALESCE((SELECT name FROM products_manufacturer WHERE id = new.manufacturer_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER products_product_fts_ad AFTER DELETE ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+    END
+    """,
+    # Переименование производителя переиндексирует его товары через триггер выше
+    """
+    CREATE TRIGGER products_manufacturer_fts_au AFTER UPDATE OF name ON products_manufacturer BEGIN
+        UPDATE products_product SET manufacturer_id = manufacturer_id WHERE manufacturer_id = new.id;
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS products_manufacturer_fts_au",
+    "DROP TRIGGER IF EXISTS products_product_fts_ad",
+    "DROP TRIGGER IF EXISTS products_product_fts_au",
+    "DROP TRIGGER IF EXISTS products_product_fts_ai",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE TABLE products_product_fts (
+        object_id bigint PRIMARY KEY,
+        title text NOT NULL,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX products_product_fts_document ON products_product_fts USING gin (document)",
+    "CREATE INDEX products_product_fts_title_trgm ON products_product_fts USING gin (title gin_trgm_ops)",
+    """
+    CREATE FUNCTION products_product_fts_refresh() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM products_product_fts WHERE object_id = OLD.id;
+            RETURN NULL;
+        END IF;
+        INSERT INTO products_product_fts (object_id, title, document)
+        SELECT NEW.id, NEW.name,
+               setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+               setweight(to_tsvector('russian', coalesce(m.name, '')), 'B') ||
+               setweight(to_tsvector('russian', coalesce(NEW.category, '')), 'B') ||
+               setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C')
+        FROM (SELECT 1) AS one
+        LEFT JOIN products_manufacturer m ON m.id = NEW.manufacturer_id
+        ON CONFLICT (object_id) DO UPDATE SET title = EXCLUDED.title, document = EXCLUDED.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_product_fts_sync
+    AFTER INSERT OR DELETE OR UPDATE OF name, description, category, manufacturer_id ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_fts_refresh()
+    """,
+    """
+    CREATE FUNCTION products_manufacturer_fts_refresh() RETURNS trigger AS $$
+    BEGIN
+        UPDATE products_product SET manufacturer_id = manufacturer_id WHERE manufacturer_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_manufacturer_fts_sync AFTER UPDATE OF name ON products_manufacturer
+    FOR EACH ROW EXECUTE FUNCTION products_manufacturer_fts_refresh()
+    """,
+    # Заполняем индекс для уже существующих товаров
+    "UPDATE products_product SET manufacturer_id = manufacturer_id",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP TRIGGER IF EXISTS products_manufacturer_fts_sync ON products_manufacturer",
+    "DROP FUNCTION IF EXISTS products_manufacturer_fts_refresh()",
+    "DROP TRIGGER IF EXISTS products_product_fts_sync ON products_product",
+    "DROP FUNCTION IF EXISTS products_product_fts_refresh()",
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_manufacturer_product_manufacturer'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 08:42
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def fill_empty_created_at(apps, schema_editor):
+    # Keyset-пагинация не умеет сравнивать NULL — ставим старым товарам самую раннюю дату
+    Product = apps.get_model('products', 'Product')
+    earliest = Product.objects.aggregate(value=Min('created_at'))['value']
+    if earliest is not None:
+        Product.objects.filter(created_at__isnull=True).update(created_at=earliest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_empty_created_at, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Товар', 'verbose_name_plural': 'Товары'},
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Поисковый индекс каталога теперь поддерживает products.search.product_index (сигналы
+# и импорт пачками), триггеры из 0004_product_search_index больше не нужны. На SQLite
+# их нужно убрать до 0006_product_sku_import_hash: пересборка products_product при ALTER
+# ломается на триггере производителя, который ссылается на эту таблицу.
+
+from importlib import import_module
+
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "DROP TRIGGER IF EXISTS products_manufacturer_fts_au",
+    "DROP TRIGGER IF EXISTS products_product_fts_ad",
+    "DROP TRIGGER IF EXISTS products_product_fts_au",
+    "DROP TRIGGER IF EXISTS products_product_fts_ai",
+]
+
+POSTGRESQL_FORWARD = [
+    "DROP TRIGGER IF EXISTS products_manufacturer_fts_sync ON products_manufacturer",
+    "DROP FUNCTION IF EXISTS products_manufacturer_fts_refresh()",
+    "DROP TRIGGER IF EXISTS products_product_fts_sync ON products_product",
+    "DROP FUNCTION IF EXISTS products_product_fts_refresh()",
+]
+
+
+def _triggers(statements):
+    # Назад — те же триггеры и функции, что создаёт 0004 (без создания и заполнения таблицы)
+    return [sql for sql in statements if 'CREATE TRIGGER' in sql or 'CREATE FUNCTION' in sql]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_triggers(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+
+
+def create_triggers(apps, schema_editor):
+    initial = import_module('products.migrations.0004_product_search_index')
+    _run(schema_editor, {
+        'sqlite': _triggers(initial.SQLITE_FORWARD),
+        'postgresql': _triggers(initial.POSTGRESQL_FORWARD),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, create_triggers),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_drop_product_search_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='Хэш импорта'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Артикул'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-18 08:50
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    # Заполняем агрегаты по уже одобренным отзывам
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    rows = (
+        Review.objects.filter(is_approved=True)
+        .values('product_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('rating'),
+            **{f'rating_{score}': Count('id', filter=Q(rating=score)) for score in range(1, 6)},
+        )
+    )
+    for row in rows:
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            rating_avg=row['total'] / row['count'],
+            **{f'rating_{score}': row[f'rating_{score}'] for score in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_manufacturer_updated_at_product_updated_at'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='Оценок «1»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='Оценок «2»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='Оценок «3»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='Оценок «4»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='Оценок «5»'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, verbose_name='Средняя оценка'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число оценок'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_avg', 'id'], name='product_rating_id_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
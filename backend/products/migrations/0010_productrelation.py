@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_product_category_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Сила связи')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='products.product', verbose_name='Товар')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='products.product', verbose_name='Рекомендуемый товар')),
+            ],
+            options={
+                'verbose_name': 'Связь товаров',
+                'verbose_name_plural': 'Связи товаров',
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='product_relation_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def fill_empty_created_at(apps, schema_editor):
+    # Строки без даты появлялись и после 0005 (loaddata, ручные INSERT): keyset-пагинация
+    # по created_at их теряла, поэтому заполняем ещё раз и запрещаем NULL на уровне схемы
+    Product = apps.get_model('products', 'Product')
+    earliest = Product.objects.aggregate(value=Min('created_at'))['value']
+    Product.objects.filter(created_at__isnull=True).update(created_at=earliest or timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productrelation'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_empty_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления'),
+        ),
+    ]
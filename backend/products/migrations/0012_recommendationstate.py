@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_created_at_not_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counts', models.BinaryField(verbose_name='Матрица счётчиков (npz)')),
+                ('watermark', models.BigIntegerField(default=0, verbose_name='Последний учтённый OrderItem.id')),
+                ('items', models.BigIntegerField(default=0, verbose_name='Учтено позиций заказов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Состояние рекомендаций',
+                'verbose_name_plural': 'Состояние рекомендаций',
+            },
+        ),
+    ]
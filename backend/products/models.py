@@ -4,6 +4,7 @@ class Manufacturer(models.Model):
     name = models.CharField("Название", max_length=200, unique=True)
     description = models.TextField("Описание", blank=True, null=True)
     logo = models.ImageField("Логотип", upload_to='manufacturer_logos/', blank=True, null=True)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     def __str__(self):
         return self.name
@@ -14,13 +15,18 @@ class Manufacturer(models.Model):
         ordering = ['name']
 
 class Product(models.Model):
+    # Колонки гистограммы оценок (rating_1 ... rating_5)
+    HISTOGRAM_FIELDS = [f'rating_{score}' for score in range(1, 6)]
+
+    sku = models.CharField("Артикул", max_length=64, unique=True, null=True, blank=True)
     name = models.CharField("Название", max_length=200)
     description = models.TextField("Описание")
     price = models.DecimalField("Цена", max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField("Остаток на складе", default=0)
     image_url = models.URLField("Ссылка на изображение", blank=True)
     category = models.CharField("Категория", max_length=100, blank=True)  # например: "Эмаль", "Грунт", "Лак"
-    created_at = models.DateTimeField("Дата добавления", auto_now_add=True, null=True)
+    created_at = models.DateTimeField("Дата добавления", auto_now_add=True)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     manufacturer = models.ForeignKey(
         Manufacturer,
@@ -30,11 +36,75 @@ class Product(models.Model):
         verbose_name="Производитель",
         related_name='products'
     )
+    # Рейтинг по одобренным отзывам — хранится денормализованно и обновляется
+    # инкрементально (reviews/ratings.py), чтобы не агрегировать Review на каждый запрос
+    rating_avg = models.FloatField("Средняя оценка", default=0)
+    rating_count = models.PositiveIntegerField("Число оценок", default=0)
+    rating_sum = models.PositiveIntegerField("Сумма оценок", default=0)
+    rating_1 = models.PositiveIntegerField("Оценок «1»", default=0)
+    rating_2 = models.PositiveIntegerField("Оценок «2»", default=0)
+    rating_3 = models.PositiveIntegerField("Оценок «3»", default=0)
+    rating_4 = models.PositiveIntegerField("Оценок «4»", default=0)
+    rating_5 = models.PositiveIntegerField("Оценок «5»", default=0)
+    # Хэш строки прайс-листа при последнем импорте: неизменившиеся строки не перезаписываем
+    import_hash = models.CharField("Хэш импорта", max_length=32, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Составные индексы под keyset-пагинацию каталога (см. products/pagination.py)
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            # ?category=... с сортировкой по умолчанию (и группировка для фасетов)
+            models.Index(fields=['category', 'created_at', 'id'], name='product_category_created_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['rating_avg', 'id'], name='product_rating_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} — {self.price:.2f} ₽"
+
+    @property
+    def rating_histogram(self):
+        """Число оценок 1..5: {'1': n1, ..., '5': n5}"""
+        return {field.rsplit('_', 1)[1]: getattr(self, field) for field in self.HISTOGRAM_FIELDS}
+
+class ProductRelation(models.Model):
+    """«Часто покупают вместе»: top-K соседей товара (заполняет manage.py build_recommendations)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='relations', verbose_name="Товар")
+    related = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='recommended_for', verbose_name="Рекомендуемый товар"
+    )
+    rank = models.PositiveSmallIntegerField("Место")
+    score = models.FloatField("Сила связи")
+
+    class Meta:
+        verbose_name = "Связь товаров"
+        verbose_name_plural = "Связи товаров"
+        constraints = [
+            # Заодно индекс для выборки соседей товара по порядку
+            models.UniqueConstraint(fields=['product', 'rank'], name='product_relation_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class RecommendationState(models.Model):
+    """
+    Накопленная матрица совместных покупок для manage.py build_recommendations.
+    Одна строка (pk=1); хранится в БД, чтобы запуск с любого узла продолжал с того же места.
+    """
+    counts = models.BinaryField("Матрица счётчиков (npz)")
+    watermark = models.BigIntegerField("Последний учтённый OrderItem.id", default=0)
+    items = models.BigIntegerField("Учтено позиций заказов", default=0)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+
+    class Meta:
+        verbose_name = "Состояние рекомендаций"
+        verbose_name_plural = "Состояние рекомендаций"
 
     def __str__(self):
-        return f"{self.name} — {self.price:.2f} ₽"
\ No newline at end of file
+        return f"Рекомендации до позиции №{self.watermark}"
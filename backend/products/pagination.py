@@ -0,0 +1,189 @@
+"""
+Keyset (cursor) пагинация.
+
+Вместо OFFSET страница строится условием "после последней записи предыдущей страницы":
+WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT n.
+Такой запрос идёт по составному индексу, поэтому 500-я страница стоит столько же, сколько первая.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Допустимые сортировки каталога: значение ?ordering= -> поля ORDER BY (последнее — id для уникальности)
+PRODUCT_ORDERINGS = {
+    '-created_at': ('-created_at', '-id'),
+    'created_at': ('created_at', 'id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    'rating': ('rating_avg', 'id'),
+    '-rating': ('-rating_avg', '-id'),
+}
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по паре (поле сортировки, id).
+
+    Порядок берётся из queryset.order_by(...) — его задаёт view. Включается, только
+    если клиент передал ?page_size= или ?cursor=, чтобы старые клиенты, ожидающие
+    полный список, продолжали работать. У новых эндпоинтов (optional = False) — всегда.
+    """
+    optional = True
+    page_size = 24
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # До скольких строк считаем "приблизительный" count на отфильтрованной выборке
+    approximate_count_cap = 1000
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.optional and self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.count = self.count_approximate = None
+
+        count_mode = params.get(self.count_query_param)
+        if count_mode == 'exact':
+            self.count, self.count_approximate = queryset.count(), False
+        elif count_mode == 'approx':
+            self.count, self.count_approximate = self.get_approximate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by) or tuple(queryset.model._meta.ordering)
+        # Последним ключом всегда должен идти id — иначе позиция неоднозначна
+        if not ordering or ordering[-1].lstrip('-') not in ('id', 'pk'):
+            direction = '-' if ordering and ordering[0].startswith('-') else ''
+            ordering = ordering + (f'{direction}id',)
+        return ordering
+
+    def after(self, position):
+        """
+        Условие "строго после позиции" для лексикографического порядка по self.ordering:
+        created_at <= :v AND (created_at < :v OR (created_at = :v AND id < :id)).
+        Первое слагаемое даёт планировщику диапазон по индексу.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        first, value = self.ordering[0], position[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': value}) & condition
+
+    def get_approximate_count(self, queryset):
+        """
+        Оценка размера выборки без полного COUNT(*):
+        для нефильтрованной таблицы в PostgreSQL — статистика планировщика,
+        иначе — COUNT по первым approximate_count_cap строкам.
+        """
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                estimate = cursor.fetchone()[0]
+            if estimate >= 0:
+                return estimate, True
+        capped = queryset.order_by()[:self.approximate_count_cap].count()
+        return capped, capped >= self.approximate_count_cap
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        # DjangoJSONEncoder обрезает микросекунды, а для позиции нужна точная дата
+        values = [v.isoformat() if isinstance(v, datetime.datetime) else v for v in values]
+        raw = json.dumps(values, cls=DjangoJSONEncoder).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            values = json.loads(raw)
+            # NULL в позиции не сравнить через < / > — такой курсор некорректен
+            if not isinstance(values, list) or len(values) != len(self.ordering) or None in values:
+                raise ValueError
+            return [self.to_python(model, field, value) for field, value in zip(self.ordering, values)]
+        except (binascii.Error, ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def to_python(model, field, value):
+        name = field.lstrip('-')
+        try:
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотация (например, search_rank) — значение уже нужного типа
+            return value
+        return model_field.to_python(value)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_approximate'] = self.count_approximate
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_approximate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class ProductCursorPagination(KeysetPagination):
+    """Пагинация каталога товаров."""
+    page_size = 24
@@ -0,0 +1,205 @@
+"""
+«Часто покупают вместе» по оформленным заказам.
+
+build_recommendations() читает OrderItem потоком, пачками заказов, собирает разреженную
+матрицу заказ × товар и получает совместные появления товаров матричным
+произведением (scipy.sparse), без циклов по ORM. Накопленные счётчики хранятся
+в БД (RecommendationState, одна строка) вместе с отметкой последнего обработанного
+OrderItem.id, поэтому повторный запуск с любого узла читает только новые позиции
+заказов и пересчитывает соседей только у затронутых товаров.
+
+Позиции заказов только добавляются (корзины, наоборот, очищаются при оформлении),
+поэтому прирост по новым id верен. На случай удаления заказов (из админки) в состоянии
+хранится и число учтённых позиций: если позиций с id не больше отметки стало меньше,
+запуск становится полным пересчётом. Количество в позиции на счётчики не влияет —
+считается, в скольких заказах товары куплены вместе.
+
+Сила связи — косинусная мера count(i, j) / sqrt(count(i) * count(j)),
+иначе в соседях у всех оказались бы самые популярные товары.
+Результат — top-K соседей каждого товара в таблице ProductRelation.
+"""
+import io
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max
+from scipy import sparse
+
+from orders.models import OrderItem
+from paintstore.versions import bump_version
+from .models import Product, ProductRelation, RecommendationState
+
+# Ресурс для ETag /api/products/{id}/related/ (см. paintstore/versions.py)
+RECOMMENDATIONS = 'recommendations'
+DEFAULT_TOP_K = 10
+# Сколько заказов обрабатывать одной пачкой
+DEFAULT_CHUNK_SIZE = 5000
+WRITE_BATCH_SIZE = 1000
+
+
+def load_state():
+    """
+    (матрица счётчиков, последний учтённый OrderItem.id, сколько позиций учтено)
+    или (None, 0, 0), если состояния нет.
+    """
+    state = RecommendationState.objects.filter(pk=1).first()
+    if state is None:
+        return None, 0, 0
+    with np.load(io.BytesIO(state.counts)) as matrix:
+        counts = sparse.csr_matrix(
+            (matrix['data'], matrix['indices'], matrix['indptr']), shape=tuple(matrix['shape'])
+        )
+    return counts, state.watermark, state.items
+
+
+def save_state(counts, watermark, items):
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer, data=counts.data, indices=counts.indices, indptr=counts.indptr, shape=np.array(counts.shape),
+    )
+    RecommendationState.objects.update_or_create(
+        pk=1, defaults={'counts': buffer.getvalue(), 'watermark': watermark, 'items': items},
+    )
+
+
+def _resized(matrix, size):
+    matrix = matrix.tocsr()
+    if matrix.shape[0] < size:
+        matrix.resize((size, size))
+    return matrix
+
+
+def _iter_order_chunks(watermark, high, chunk_size):
+    """Пачки id заказов, в которых появились позиции с id в (watermark, high]."""
+    order_ids = (
+        OrderItem.objects.filter(id__gt=watermark, id__lte=high)
+        .values_list('order_id', flat=True).order_by('order_id').distinct()
+        .iterator(chunk_size=chunk_size)
+    )
+    chunk = []
+    for order_id in order_ids:
+        chunk.append(order_id)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def cooccurrence(chunk, watermark, high, size):
+    """
+    Прирост матрицы совместных появлений от новых позиций в пачке заказов.
+
+    A — заказ × товар по всем позициям заказов, N — только по новым (id > watermark).
+    Пара старый-старый уже учтена, новый-старый считается один раз, новый-новый тоже:
+    N^T A + A^T N - N^T N. На диагонали — в скольких заказах куплен товар.
+    """
+    rows = np.array(
+        # Позиции удалённых товаров (product_id = NULL) в счётчики не попадают
+        OrderItem.objects.filter(order_id__gte=chunk[0], order_id__lte=chunk[-1], id__lte=high,
+                                 product_id__isnull=False)
+        .order_by('id').values_list('order_id', 'product_id', 'id'),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    # Диапазон мог захватить заказы без новых позиций — они не нужны
+    rows = rows[np.isin(rows[:, 0], chunk)]
+    # Товар двумя позициями в одном заказе — одна покупка (по первой, с меньшим id)
+    _, first = np.unique(rows[:, :2], axis=0, return_index=True)
+    rows = rows[first]
+    orders, products, item_ids = rows[:, 0], rows[:, 1], rows[:, 2]
+    _, order_index = np.unique(orders, return_inverse=True)
+    shape = (int(order_index.max()) + 1 if len(rows) else 0, size)
+
+    ones = np.ones(len(rows), dtype=np.int64)
+    everything = sparse.csr_matrix((ones, (order_index, products)), shape=shape)
+    new = item_ids > watermark
+    fresh = sparse.csr_matrix((ones[new], (order_index[new], products[new])), shape=shape)
+
+    cross = fresh.T @ everything
+    return (cross + cross.T - fresh.T @ fresh).tocsr()
+
+
+def top_neighbours(counts, product_ids, exists, top_k, min_support):
+    """Для каждого товара — [(сосед, сила связи)] по убыванию силы."""
+    popularity = counts.diagonal().astype(np.float64)
+    for product_id in product_ids:
+        start, end = counts.indptr[product_id], counts.indptr[product_id + 1]
+        columns = counts.indices[start:end]
+        together = counts.data[start:end]
+        keep = (columns != product_id) & (together >= min_support) & exists[columns]
+        columns, together = columns[keep], together[keep]
+        if not len(columns) or not popularity[product_id]:
+            yield product_id, []
+            continue
+        scores = together / np.sqrt(popularity[product_id] * popularity[columns])
+        # По силе связи, затем по числу совместных покупок, затем по id — порядок стабилен
+        order = np.lexsort((columns, -together, -scores))[:top_k]
+        yield product_id, [(int(columns[i]), float(scores[i])) for i in order]
+
+
+def build_recommendations(full=False, top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE,
+                          min_support=1):
+    """
+    Обновляет ProductRelation. full=True — пересчёт с нуля (сохранённое состояние игнорируется);
+    без него пересчёт тоже полный, если состояния нет или с прошлого запуска заказы удалялись.
+    Возвращает статистику: сколько позиций и заказов прочитано, у скольких товаров обновлены
+    соседи и был ли пересчёт полным.
+    """
+    counts, watermark, counted = (None, 0, 0) if full else load_state()
+    # Отметка и число позиций до неё — одним запросом, чтобы они согласовывались
+    totals = OrderItem.objects.aggregate(high=Max('id'), items=Count('id'))
+    high, items = totals['high'] or 0, totals['items']
+    if counts is None or OrderItem.objects.filter(id__lte=watermark).count() < counted:
+        full, counts, watermark = True, None, 0
+    stats = {'items': high - watermark if high > watermark else 0, 'orders': 0, 'products': 0, 'full': full}
+    if high <= watermark and not full:
+        return stats
+
+    size = (Product.objects.aggregate(high=Max('id'))['high'] or 0) + 1
+    if counts is not None:
+        size = max(size, counts.shape[0])
+    delta = sparse.csr_matrix((size, size), dtype=np.int64)
+    for chunk in _iter_order_chunks(watermark, high, chunk_size):
+        delta = delta + cooccurrence(chunk, watermark, high, size)
+        stats['orders'] += len(chunk)
+    counts = delta if counts is None else _resized(counts, size) + delta
+    counts.sort_indices()
+
+    exists = np.zeros(size, dtype=bool)
+    exists[list(Product.objects.values_list('id', flat=True).iterator())] = True
+    if full:
+        touched = np.flatnonzero(np.diff(counts.indptr))
+    else:
+        # Пересчитываем товары с новыми покупками и их соседей: у соседей изменился
+        # знаменатель косинусной меры (матрица симметрична, соседи j — это строка j)
+        changed = np.flatnonzero(delta.diagonal())
+        touched = np.union1d(changed, counts[changed].indices)
+    touched = touched[exists[touched]]
+
+    with transaction.atomic():
+        if full:
+            ProductRelation.objects.all().delete()
+        batch_ids, relations = [], []
+        for product_id, neighbours in top_neighbours(counts, touched, exists, top_k, min_support):
+            batch_ids.append(product_id)
+            relations.extend(
+                ProductRelation(product_id=product_id, related_id=related_id, rank=rank, score=score)
+                for rank, (related_id, score) in enumerate(neighbours, start=1)
+            )
+            if len(batch_ids) >= WRITE_BATCH_SIZE:
+                _write(batch_ids, relations)
+                batch_ids, relations = [], []
+        _write(batch_ids, relations)
+        # Состояние — в той же транзакции, что и соседи: они не расходятся
+        save_state(counts, high, items)
+
+    stats['products'] = len(touched)
+    bump_version(RECOMMENDATIONS)
+    return stats
+
+
+def _write(product_ids, relations):
+    if product_ids:
+        ProductRelation.objects.filter(product_id__in=[int(pk) for pk in product_ids]).delete()
+    if relations:
+        ProductRelation.objects.bulk_create(relations, batch_size=WRITE_BATCH_SIZE)
@@ -0,0 +1,191 @@
+"""
+Полнотекстовый поиск по каталогу.
+
+Индекс хранится в теневой таблице рядом с основной:
+- SQLite (dev/тесты) — виртуальная таблица FTS5;
+- PostgreSQL (settings_prod) — tsvector с конфигурацией 'russian' + триграммы по названию.
+
+Таблицы создаёт миграция products/0004_product_search_index, содержимое обновляют
+сигналы (products/signals.py) и bulk-импорт через FullTextIndex.refresh().
+Полная перестройка — manage.py rebuild_search_index.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+# Защита от слишком длинных запросов
+MAX_QUERY_TERMS = 8
+# Сколько id обновлять одним запросом
+REFRESH_CHUNK_SIZE = 500
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'[а-я]')
+
+# Окончания для облегчённого стемминга (длинные — первыми)
+_RU_ENDINGS = sorted({
+    'иями', 'ями', 'ами', 'иях', 'ях', 'ах',
+    'ого', 'его', 'ому', 'ему', 'ими', 'ыми',
+    'ов', 'ев', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ую', 'юю', 'ом', 'ем', 'ам', 'ям', 'ию', 'ия', 'ье', 'ья',
+    'ь', 'а', 'я', 'о', 'е', 'и', 'ы', 'у', 'ю', 'й',
+}, key=len, reverse=True)
+
+
+def stem(word):
+    """Отрезает падежное окончание у русского слова: 'красками' -> 'краск'."""
+    word = word.lower().replace('ё', 'е')
+    if not _CYRILLIC_RE.search(word):
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(query):
+    """Разбивает поисковую строку на слова (не больше MAX_QUERY_TERMS)."""
+    return _WORD_RE.findall(query.lower())[:MAX_QUERY_TERMS]
+
+
+class FullTextIndex:
+    """
+    Обёртка над теневой таблицей полнотекстового индекса.
+
+    columns — колонки индекса: (имя, вес bm25 для SQLite, вес setweight для PostgreSQL);
+    первая колонка идёт ещё и в триграммный индекс (title) в PostgreSQL.
+    source — SELECT id, <колонки> FROM ... без WHERE; основная таблица под алиасом obj.
+
+    filter() добавляет к queryset условие «есть в индексе по запросу» и ранг релевантности
+    подзапросами к теневой таблице — остальные фильтры view и пагинация работают в том же
+    SQL, выдача не обрезается до фильтрации. refresh()/remove() поддерживают индекс
+    в актуальном состоянии. На других СУБД (не SQLite и не PostgreSQL) поиск идёт
+    через icontains по fallback_fields, а индекс не ведётся.
+    """
+
+    def __init__(self, table, columns, source, fallback_fields=()):
+        self.table = table
+        self.columns = columns
+        self.source = source
+        # Поля для icontains, если БД не поддерживает ни FTS5, ни tsvector
+        self.fallback_fields = fallback_fields
+
+    @property
+    def supported(self):
+        return connection.vendor in ('sqlite', 'postgresql')
+
+    # --- Поиск ---
+
+    def _search_sql(self, terms, outer_pk):
+        """(SQL id совпадений, SQL ранга строки outer_pk, параметры каждого из них)."""
+        if connection.vendor == 'sqlite':
+            # Каждое слово — префиксный запрос по основе: "краск"* найдёт и "краска", и "красками"
+            expression = ' '.join('"%s"*' % stem(term).replace('"', '') for term in terms)
+            weights = ''.join(f', {weight}' for _, weight, _ in self.columns)
+            return (
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+                f'SELECT -bm25({self.table}{weights}) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s AND rowid = {outer_pk}',
+                [expression],
+            )
+        # tsvector ловит словоформы, триграммы по названию — опечатки
+        query = ' '.join(terms)
+        return (
+            f"SELECT object_id FROM {self.table} "
+            f"WHERE document @@ websearch_to_tsquery('russian', %s) OR title %% %s",
+            f"SELECT GREATEST(ts_rank(document, websearch_to_tsquery('russian', %s)), similarity(title, %s)) "
+            f"FROM {self.table} WHERE object_id = {outer_pk}",
+            [query, query],
+        )
+
+    def filter(self, queryset, query):
+        """Сужает queryset до найденных объектов и сортирует по убыванию релевантности."""
+        if not self.supported:
+            condition = Q()
+            for field in self.fallback_fields:
+                condition |= Q(**{f'{field}__icontains': query})
+            return queryset.filter(condition)
+
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        meta = queryset.model._meta
+        outer_pk = f'{connection.ops.quote_name(meta.db_table)}.{connection.ops.quote_name(meta.pk.column)}'
+        ids_sql, rank_sql, params = self._search_sql(terms, outer_pk)
+        return (
+            queryset.filter(pk__in=RawSQL(ids_sql, params))
+            .annotate(search_rank=RawSQL(rank_sql, params, output_field=FloatField()))
+            .order_by('-search_rank', '-id')
+        )
+
+    # --- Обновление индекса ---
+
+    def _insert_sql(self, where):
+        names = [name for name, _, _ in self.columns]
+        if connection.vendor == 'sqlite':
+            return (
+                f"INSERT INTO {self.table} (rowid, {', '.join(names)}) "
+                f"SELECT * FROM ({self.source} {where})"
+            )
+        document = ' || '.join(
+            f"setweight(to_tsvector('russian', coalesce(src.{name}, '')), '{weight}')"
+            for name, _, weight in self.columns
+        )
+        return (
+            f"INSERT INTO {self.table} (object_id, title, document) "
+            f"SELECT src.id, coalesce(src.{names[0]}, ''), {document} "
+            f"FROM ({self.source} {where}) AS src (id, {', '.join(names)}) "
+            f"ON CONFLICT (object_id) DO UPDATE SET title = EXCLUDED.title, document = EXCLUDED.document"
+        )
+
+    def _delete_sql(self, count):
+        key = 'rowid' if connection.vendor == 'sqlite' else 'object_id'
+        return f"DELETE FROM {self.table} WHERE {key} IN ({', '.join(['%s'] * count)})"
+
+    def refresh(self, ids):
+        """Переиндексирует объекты с указанными id (удалённые — просто убирает из индекса)."""
+        if not self.supported:
+            return
+        ids = list(ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), REFRESH_CHUNK_SIZE):
+                chunk = ids[start:start + REFRESH_CHUNK_SIZE]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                # У FTS5 нет upsert, поэтому удаляем и вставляем заново (заодно уходят удалённые объекты)
+                cursor.execute(self._delete_sql(len(chunk)), chunk)
+                cursor.execute(self._insert_sql(f'WHERE obj.id IN ({placeholders})'), chunk)
+
+    def remove(self, ids):
+        if not self.supported:
+            return
+        ids = list(ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), REFRESH_CHUNK_SIZE):
+                chunk = ids[start:start + REFRESH_CHUNK_SIZE]
+                cursor.execute(self._delete_sql(len(chunk)), chunk)
+
+    def rebuild(self):
+        """Полная перестройка индекса по основной таблице."""
+        if not self.supported:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(self._insert_sql(''))
+
+
+# Индекс товаров: название, описание, категория и название производителя
+product_index = FullTextIndex(
+    'products_product_fts',
+    columns=[
+        ('name', 10.0, 'A'),
+        ('description', 1.0, 'C'),
+        ('category', 4.0, 'B'),
+        ('manufacturer', 4.0, 'B'),
+    ],
+    source=(
+        "SELECT obj.id, obj.name, obj.description, obj.category, COALESCE(m.name, '') "
+        "FROM products_product obj LEFT JOIN products_manufacturer m ON m.id = obj.manufacturer_id"
+    ),
+    fallback_fields=('name', 'description', 'category', 'manufacturer__name'),
+)
@@ -1,14 +1,27 @@
 from rest_framework import serializers
 from .models import Product, Manufacturer
+from .fieldsets import SparseFieldsetSerializerMixin
+
+# Краткая форма производителя (для карточек товаров)
+class ManufacturerBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Manufacturer
+        fields = ['id', 'name']
 
 # Сериализатор для Производителя
-class ManufacturerSerializer(serializers.ModelSerializer):
+class ManufacturerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Manufacturer
         fields = ['id', 'name', 'description', 'logo']
 
+# Краткая форма товара (для вложения в отзывы и т.п.)
+class ProductBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'image_url']
+
 # Сериализатор для Товара
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # Поле для чтения данных производителя
     manufacturer = ManufacturerSerializer(read_only=True)
     # Поле для записи ID производителя
@@ -20,8 +33,23 @@ class ProductSerializer(serializers.ModelSerializer):
         allow_null=True,
         help_text="ID Производителя (может быть null)"
     )
+    # Распределение оценок: {"1": 0, ..., "5": 12} (хранится в Product.rating_1..rating_5)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'stock', 'image_url', 'category', 'created_at', 'manufacturer', 'manufacturer_id']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'sku', 'name', 'description', 'price', 'stock', 'image_url', 'category', 'created_at',
+                  'rating_avg', 'rating_count', 'rating_histogram', 'manufacturer', 'manufacturer_id']
+        read_only_fields = ['id', 'created_at', 'rating_avg', 'rating_count']
+        # ?fields=card — компактная карточка для списков
+        profiles = {
+            'card': ['id', 'name', 'price', 'image_url', 'category', 'rating_avg', 'rating_count', 'manufacturer'],
+        }
+        # Колонки для вычисляемых полей (нужны для .only() при ?fields=)
+        computed = {'rating_histogram': Product.HISTOGRAM_FIELDS}
+        # При ?fields=... производитель отдаётся кратко (id + name), ?expand=manufacturer — целиком
+        brief = {'manufacturer': ManufacturerBriefSerializer}
+
+    def validate_sku(self, value):
+        # Пустой артикул храним как NULL, иначе сработает unique
+        return value or None
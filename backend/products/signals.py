@@ -0,0 +1,59 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from paintstore.versions import bump_version
+from .models import Manufacturer, Product
+from .search import product_index
+
+# Версия каталога: от неё зависят кэш фасетов и другие производные данные
+CATALOG = 'catalog'
+
+# Товары переименованы в обход save() (импорт прайс-листа, products/catalog_io.py);
+# аргумент product_ids. Отправляется внутри транзакции изменения
+products_renamed = Signal()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_delete, sender=Manufacturer)
+def catalog_changed(sender, **kwargs):
+    # После коммита: иначе параллельный запрос закэширует данные под новой версией до коммита
+    transaction.on_commit(partial(bump_version, CATALOG))
+
+
+# --- Поисковый индекс (products/search.py) ---
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Сохранение только остатка/служебных полей индекс не затрагивает
+    indexed = {'name', 'description', 'category', 'manufacturer'}
+    if raw or (update_fields is not None and not indexed & set(update_fields)):
+        return
+    product_index.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    product_index.remove([instance.pk])
+
+
+@receiver(post_save, sender=Manufacturer)
+def index_manufacturer_products(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    product_index.refresh(instance.products.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Manufacturer)
+def remember_manufacturer_products(sender, instance, **kwargs):
+    # После удаления связь уже обнулена (SET_NULL) — запоминаем товары заранее
+    instance._indexed_product_ids = list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Manufacturer)
+def index_orphaned_products(sender, instance, **kwargs):
+    product_index.refresh(getattr(instance, '_indexed_product_ids', []))
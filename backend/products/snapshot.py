@@ -0,0 +1,156 @@
+"""
+Готовый снимок публичного каталога (/api/products/ без фильтров).
+
+Список товаров меняется несколько раз в день, а запрашивается на каждой странице
+магазина. Снимок — уже отрендеренный JSON и его сжатые варианты (gzip и, если
+установлен пакет brotli, br), посчитанные один раз. Пока версия каталога
+(products/signals.py) не изменилась, ответ отдаётся из памяти процесса без
+запросов к БД и без сериализаторов.
+
+После изменения каталога сигналы поднимают версию, снимок считается устаревшим,
+и запрос идёт обычным путём; его результат становится новым снимком. Снимок
+заменяется одним присваиванием — читатели видят либо старый, либо новый целиком.
+Снимки кладутся ещё и в общий кэш, чтобы не рендерить каталог в каждом процессе;
+manage.py warm_catalog строит их заранее (после деплоя или импорта).
+"""
+import gzip
+import hashlib
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from paintstore.versions import get_version
+from .signals import CATALOG
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаём gzip
+    brotli = None
+
+# Какие запросы к списку отдаются из снимка (строка запроса целиком)
+SNAPSHOT_QUERIES = ('', 'fields=card')
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 24
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# variants: {'identity': bytes, 'gzip': bytes, 'br': bytes}
+Snapshot = namedtuple('Snapshot', ['version', 'content_type', 'variants'])
+
+# Снимки этого процесса: адрес запроса -> Snapshot
+_snapshots = {}
+
+
+def snapshot_key(request):
+    # Адрес с хостом: в ответе есть абсолютные ссылки на логотипы производителей
+    return f'{request.scheme}://{request.get_host()}{request.path}?{request.GET.urlencode()}'
+
+
+def _cache_key(key, version):
+    return f'products:snapshot:{version}:{hashlib.md5(key.encode()).hexdigest()}'
+
+
+def is_snapshot_request(request):
+    """Подходит ли запрос DRF под снимок: GET без фильтров, ответ в JSON."""
+    return (
+        request.method in ('GET', 'HEAD')
+        and request.GET.urlencode() in SNAPSHOT_QUERIES
+        and getattr(request, 'accepted_renderer', None) is not None
+        and request.accepted_renderer.format == 'json'
+    )
+
+
+def build_snapshot(body, content_type, version):
+    variants = {'identity': body, 'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return Snapshot(version, content_type, variants)
+
+
+def get_snapshot(key, version):
+    snapshot = _snapshots.get(key)
+    if snapshot is None or snapshot.version != version:
+        snapshot = cache.get(_cache_key(key, version))
+        if snapshot is None:
+            return None
+        _snapshots[key] = snapshot
+    return snapshot
+
+
+def store_snapshot(key, snapshot):
+    _snapshots[key] = snapshot
+    cache.set(_cache_key(key, snapshot.version), snapshot, SNAPSHOT_CACHE_TIMEOUT)
+
+
+def clear_snapshots():
+    _snapshots.clear()
+
+
+def accepted_encoding(request, variants):
+    """Лучшее сжатие, которое принимает клиент: br, затем gzip, иначе без сжатия."""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        # "gzip;q=0" — клиент явно отказывается от gzip
+        weight = params.strip().removeprefix('q=')
+        try:
+            refused = bool(params.strip()) and float(weight) == 0
+        except ValueError:
+            refused = False
+        if not refused:
+            accepted.add(coding.strip().lower())
+    for encoding in ('br', 'gzip'):
+        if encoding in variants and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+def snapshot_response(request, snapshot):
+    encoding = accepted_encoding(request, snapshot.variants)
+    response = HttpResponse(snapshot.variants[encoding], content_type=snapshot.content_type)
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = len(snapshot.variants[encoding])
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def serve_snapshot(request, render, renderer_context):
+    """
+    Ответ из снимка; если снимка нет или он устарел — render() (обычный путь DRF),
+    а отрендеренный результат сохраняется как новый снимок.
+    """
+    version = get_version(CATALOG)
+    key = snapshot_key(request)
+    snapshot = get_snapshot(key, version)
+    if snapshot is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+        renderer = request.accepted_renderer
+        body = renderer.render(response.data, request.accepted_media_type, renderer_context)
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        snapshot = build_snapshot(body, content_type, version)
+        store_snapshot(key, snapshot)
+    return snapshot_response(request, snapshot)
+
+
+def warm(base_url):
+    """Строит снимки для всех SNAPSHOT_QUERIES (для manage.py warm_catalog)."""
+    from urllib.parse import urlsplit
+    from django.test import RequestFactory
+    from .views import ProductViewSet
+
+    url = urlsplit(base_url)
+    factory = RequestFactory(HTTP_HOST=url.netloc)
+    view = ProductViewSet.as_view({'get': 'list'})
+    sizes = {}
+    for query in SNAPSHOT_QUERIES:
+        request = factory.get(f'/api/products/?{query}', secure=url.scheme == 'https')
+        view(request)
+        snapshot = _snapshots[snapshot_key(request)]
+        sizes[query] = {encoding: len(body) for encoding, body in snapshot.variants.items()}
+    return sizes
@@ -1,7 +1,33 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from .models import Product
+from .models import Product, Manufacturer
+from .search import product_index, stem
+from .signals import CATALOG
+from .views import ProductViewSet
+from rest_framework.request import Request
+from rest_framework.test import APIClient
 from reviews.models import Review
+from paintstore.checks import check_cache_outside_database, check_shared_cache
+from paintstore.query_budget import QueryBudgetTestMixin
+from paintstore.query_plans import QueryPlanTestMixin
+from paintstore.versions import get_version
+from cart.models import Cart, CartItem
+from .models import ProductRelation, RecommendationState
+from orders.models import Order, OrderItem
+from .recommendations import build_recommendations
+from .snapshot import clear_snapshots
 
 class ProductModelTest(TestCase):
     def setUp(self):
@@ -21,6 +47,12 @@ class ProductModelTest(TestCase):
         self.assertEqual(self.product.price, 450.00)
         self.assertEqual(self.product.stock, 100)
 
+    def test_initial_data_fixture_loads(self):
+        # loaddata сохраняет в режиме raw: auto_now не срабатывает, значения берутся из фикстуры
+        call_command('loaddata', 'initial_data', verbosity=0)
+        self.assertTrue(Product.objects.filter(pk=1, name="Эмаль ПФ-115 белая").exists())
+        self.assertFalse(Product.objects.filter(updated_at__isnull=True).exists())
+
 class ReviewModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testuser", password="123")
@@ -43,4 +75,567 @@ class ReviewModelTest(TestCase):
     def test_review_str_approved(self):
         self.review.is_approved = True
         self.review.save()
-        self.assertIn("OK", str(self.review))
\ No newline at end of file
+        self.assertIn("OK", str(self.review))
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.tikkurila = Manufacturer.objects.create(name="Тиккурила")
+        self.enamel = Product.objects.create(
+            name="Эмаль ПФ-115 белая", description="Для наружных работ",
+            price=450, category="Эмаль", manufacturer=self.tikkurila
+        )
+        self.paint = Product.objects.create(
+            name="Краска фасадная", description="Подходит под эмаль и грунт",
+            price=900, category="Краска"
+        )
+        self.primer = Product.objects.create(
+            name="Грунт ГФ-021", description="Антикоррозийный", price=300, category="Грунт"
+        )
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()]
+
+    def test_stem(self):
+        self.assertEqual(stem("красками"), "краск")
+        self.assertEqual(stem("краска"), "краск")
+        self.assertEqual(stem("грунт"), "грунт")
+
+    def test_matches_word_forms(self):
+        self.assertEqual(self.search("краски"), [self.paint.id])
+        self.assertEqual(self.search("грунтом"), [self.primer.id, self.paint.id])
+
+    def test_name_ranks_above_description(self):
+        self.assertEqual(self.search("эмали"), [self.enamel.id, self.paint.id])
+
+    def test_matches_manufacturer_name_and_follows_rename(self):
+        self.assertEqual(self.search("тиккурила"), [self.enamel.id])
+        self.tikkurila.name = "Текс"
+        self.tikkurila.save()
+        self.assertEqual(self.search("тиккурила"), [])
+        self.assertEqual(self.search("текс"), [self.enamel.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.primer.name = "Грунт-эмаль"
+        self.primer.save()
+        self.assertIn(self.primer.id, self.search("эмаль"))
+        self.primer.delete()
+        self.assertNotIn(self.primer.id, self.search("эмаль"))
+
+    def test_combines_with_manufacturer_filter(self):
+        self.assertEqual(self.search("эмаль", manufacturer_id=self.tikkurila.id), [self.enamel.id])
+
+    def test_filters_apply_before_ranking(self):
+        # Совпадений больше, чем помещается в одну выдачу, а нужное — ниже по релевантности:
+        # фильтры должны сужать поиск, а не его обрезанный результат
+        others = Product.objects.bulk_create([
+            Product(name=f"Краска фасадная {i}", description="краска краска", price=100) for i in range(600)
+        ])
+        product_index.refresh([product.pk for product in others])
+        found = self.search("краска", manufacturer_id=self.tikkurila.id)
+        self.assertEqual(found, [])
+        self.enamel.description = "Можно поверх старой краски"
+        self.enamel.save()
+        self.assertEqual(self.search("краска", manufacturer_id=self.tikkurila.id), [self.enamel.id])
+        self.assertEqual(len(self.search("краска")), 602)
+
+    def test_no_match(self):
+        self.assertEqual(self.search("лак"), [])
+
+
+class ProductPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Одинаковые цены — проверяем, что id разрешает "ничьи" между страницами
+        self.products = [
+            Product.objects.create(name=f"Товар {i:02d}", description="", price=100 + i // 3, stock=1)
+            for i in range(10)
+        ]
+
+    def collect(self, **params):
+        ids, url, pages = [], '/api/products/', 0
+        params = {'page_size': 4, **params}
+        while url:
+            response = self.client.get(url, params if pages == 0 else None)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.json()['results']]
+            url, pages = response.json()['next'], pages + 1
+        return ids, pages
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(len(response.json()), 10)
+
+    def test_walks_all_pages_newest_first(self):
+        ids, pages = self.collect()
+        self.assertEqual(ids, [p.id for p in reversed(self.products)])
+        self.assertEqual(pages, 3)
+
+    def test_price_ordering_breaks_ties_by_id(self):
+        ids, _ = self.collect(ordering='price')
+        expected = sorted(self.products, key=lambda p: (p.price, p.id))
+        self.assertEqual(ids, [p.id for p in expected])
+        ids, _ = self.collect(ordering='-price')
+        self.assertEqual(ids, [p.id for p in reversed(expected)])
+
+    def test_name_ordering(self):
+        ids, _ = self.collect(ordering='-name', page_size=3)
+        self.assertEqual(ids, [p.id for p in sorted(self.products, key=lambda p: p.name, reverse=True)])
+
+    def test_page_query_is_independent_of_position(self):
+        first = self.client.get('/api/products/', {'page_size': 2}).json()
+        with self.assertNumQueries(1):
+            self.client.get(first['next'])
+
+    def test_counts(self):
+        data = self.client.get('/api/products/', {'page_size': 2, 'count': 'exact'}).json()
+        self.assertEqual((data['count'], data['count_approximate']), (10, False))
+        data = self.client.get('/api/products/', {'page_size': 2, 'count': 'approx'}).json()
+        self.assertEqual(data['count'], 10)
+        self.assertNotIn('count', self.client.get('/api/products/', {'page_size': 2}).json())
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/products/', {'cursor': 'не-курсор'})
+        self.assertEqual(response.status_code, 404)
+        null_position = base64.urlsafe_b64encode(json.dumps([None, 1]).encode()).decode()
+        response = self.client.get('/api/products/', {'cursor': null_position, 'ordering': 'created_at'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_fixture_rows_reach_every_page(self):
+        # Товары из фикстуры (loaddata не выставляет auto_now_add) — в обоих направлениях по дате
+        call_command('loaddata', 'initial_data', verbosity=0)
+        everything = set(Product.objects.values_list('id', flat=True))
+        for ordering in ('-created_at', 'created_at'):
+            ids, _ = self.collect(ordering=ordering)
+            self.assertEqual(len(ids), len(everything))
+            self.assertEqual(set(ids), everything)
+
+
+class ProductFacetsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tikkurila = Manufacturer.objects.create(name="Тиккурила")
+        Product.objects.create(name="Эмаль белая", description="", price=450, stock=5,
+                               category="Эмаль", manufacturer=self.tikkurila)
+        Product.objects.create(name="Эмаль чёрная", description="", price=1200, stock=0,
+                               category="Эмаль", manufacturer=self.tikkurila)
+        Product.objects.create(name="Грунт", description="", price=300, stock=2, category="Грунт")
+
+    def facets(self, **params):
+        response = self.client.get('/api/products/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts(self):
+        data = self.facets()
+        self.assertEqual(data['categories'], [
+            {'category': 'Грунт', 'count': 1}, {'category': 'Эмаль', 'count': 2},
+        ])
+        self.assertEqual(data['manufacturers'], [{'id': self.tikkurila.id, 'name': 'Тиккурила', 'count': 2}])
+        self.assertEqual([bucket['count'] for bucket in data['price']], [2, 0, 1, 0, 0])
+        self.assertEqual(data['stock'], {'in_stock': 2, 'out_of_stock': 1})
+
+    def test_narrowed_by_filters_and_search(self):
+        self.assertEqual(self.facets(category='Эмаль')['stock'], {'in_stock': 1, 'out_of_stock': 1})
+        self.assertEqual(self.facets(q='грунт')['categories'], [{'category': 'Грунт', 'count': 1}])
+
+    def test_search_counts_every_hit(self):
+        paints = Product.objects.bulk_create([
+            Product(name=f"Краска {i}", description="", price=100, stock=1, category="Краска") for i in range(601)
+        ])
+        product_index.refresh([product.pk for product in paints])
+        self.assertEqual(self.facets(q='краска')['categories'], [{'category': 'Краска', 'count': 601}])
+
+    def test_cached_until_catalog_changes(self):
+        self.facets()
+        with self.assertNumQueries(0):
+            self.facets()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Лак", description="", price=700, stock=1, category="Лак")
+        self.assertIn({'category': 'Лак', 'count': 1}, self.facets()['categories'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tikkurila.delete()
+        self.assertEqual(self.facets()['manufacturers'], [])
+
+
+class ProductFieldsetTest(TestCase):
+    def setUp(self):
+        self.manufacturer = Manufacturer.objects.create(name="Тиккурила", description="Длинное описание")
+        self.product = Product.objects.create(
+            name="Эмаль", description="Очень длинное описание", price=450, stock=3,
+            image_url="https://example.com/1.jpg", category="Эмаль", manufacturer=self.manufacturer
+        )
+
+    def test_full_payload_by_default(self):
+        item = self.client.get('/api/products/').json()[0]
+        self.assertEqual(item['description'], "Очень длинное описание")
+        self.assertEqual(item['manufacturer']['description'], "Длинное описание")
+
+    def test_card_profile(self):
+        with self.assertNumQueries(1):
+            item = self.client.get('/api/products/', {'fields': 'card'}).json()[0]
+        self.assertEqual(set(item), {'id', 'name', 'price', 'image_url', 'category', 'rating_avg', 'rating_count', 'manufacturer'})
+        self.assertEqual(item['manufacturer'], {'id': self.manufacturer.id, 'name': "Тиккурила"})
+
+    def test_expand_manufacturer(self):
+        item = self.client.get('/api/products/', {'fields': 'card', 'expand': 'manufacturer'}).json()[0]
+        self.assertEqual(item['manufacturer']['description'], "Длинное описание")
+
+    def test_explicit_fields_defer_other_columns(self):
+        response = self.client.get(f'/api/products/{self.product.id}/', {'fields': 'id,name'})
+        self.assertEqual(response.json(), {'id': self.product.id, 'name': "Эмаль"})
+        view = ProductViewSet(action='list', format_kwarg=None)
+        view.request = Request(RequestFactory().get('/', {'fields': 'id,name'}))
+        self.assertEqual(view.get_queryset().query.deferred_loading, ({'id', 'name'}, False))
+
+    def test_manufacturer_fields(self):
+        item = self.client.get('/api/manufacturers/', {'fields': 'id,name'}).json()[0]
+        self.assertEqual(item, {'id': self.manufacturer.id, 'name': "Тиккурила"})
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/products/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    def seed(self, count):
+        for i in range(count):
+            manufacturer = Manufacturer.objects.create(name=f"Производитель {Manufacturer.objects.count()}")
+            Product.objects.create(name=f"Товар {i}", description="", price=100, manufacturer=manufacturer)
+
+    def test_product_list(self):
+        self.assertBudget(1, '/api/products/')
+
+    def test_product_list_paginated(self):
+        self.assertBudget(1, '/api/products/', {'page_size': 50})
+
+    def test_product_retrieve(self):
+        self.seed(1)
+        product = Product.objects.get()
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/products/{product.id}/')
+
+    def test_manufacturer_list(self):
+        self.assertBudget(1, '/api/manufacturers/')
+
+
+class CatalogImportExportTest(TestCase):
+    CSV = (
+        "sku,name,description,price,stock,image_url,category,manufacturer\n"
+        "A-1,Эмаль белая,,450.00,10,,Эмаль,Тиккурила\n"
+        "A-2,Грунт,,\"300,5\",5,,Грунт,\n"
+        "A-3,Без цены,,abc,1,,,\n"
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        moderator = User.objects.create(username="moder")
+        moderator.profile.is_moderator = True
+        moderator.profile.save()
+        self.client.force_authenticate(moderator)
+
+    def upload(self, content, name='price.csv'):
+        return self.client.post('/api/products/import/', {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_import_creates_and_reports_errors(self):
+        stats = self.upload(self.CSV).json()
+        self.assertEqual((stats['created'], stats['updated'], stats['failed']), (2, 0, 1))
+        self.assertEqual(stats['errors'][0]['line'], 4)
+        enamel = Product.objects.get(sku='A-1')
+        self.assertEqual(enamel.manufacturer.name, "Тиккурила")
+        self.assertEqual(Product.objects.get(sku='A-2').price, Decimal('300.50'))
+
+    def test_reimport_writes_only_changed_rows(self):
+        self.upload(self.CSV)
+        changed = self.CSV.replace("450.00,10", "470.00,8")
+        stats = self.upload(changed).json()
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (0, 1, 1))
+        self.assertEqual(Product.objects.get(sku='A-1').stock, 8)
+
+    def test_jsonl_import_and_search_index(self):
+        line = '{"sku": "J-1", "name": "Лак яхтный", "price": "990", "stock": 3}\n'
+        stats = self.upload(line + "not json\n", name='price.jsonl').json()
+        self.assertEqual((stats['created'], stats['failed']), (1, 1))
+        self.assertEqual(len(self.client.get('/api/products/', {'q': 'лаки'}).json()), 1)
+
+    def test_import_rejects_prices_the_db_cannot_store(self):
+        rows = "".join(f"B-{i},Краска,,{price},1,,,\n" for i, price in enumerate(['NaN', 'Infinity', '1e12', '-1']))
+        stats = self.upload(self.CSV.splitlines(keepends=True)[0] + rows).json()
+        self.assertEqual((stats['created'], stats['failed']), (0, 4))
+
+    def test_import_not_utf8(self):
+        response = self.client.post('/api/products/import/', {
+            'file': SimpleUploadedFile('price.csv', self.CSV.encode('cp1251')),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.json()['error'])
+
+    def test_export_roundtrip(self):
+        self.upload(self.CSV)
+        response = self.client.get('/api/products/export/', {'file_format': 'csv'})
+        exported = b''.join(response.streaming_content).decode()
+        self.assertIn("A-1,Эмаль белая,,450.00,10,,Эмаль,Тиккурила", exported)
+        stats = self.upload(exported).json()
+        self.assertEqual(stats['unchanged'], 2)
+
+    def test_import_requires_moderator(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.upload(self.CSV).status_code, 401)
+
+    def test_management_commands(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as f:
+            f.write(self.CSV)
+        out = StringIO()
+        call_command('import_catalog', f.name, stdout=out, stderr=StringIO())
+        os.unlink(f.name)
+        self.assertIn("Создано: 2", out.getvalue())
+        out = StringIO()
+        call_command('export_catalog', '--format', 'jsonl', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_rebuild_search_index(self):
+        self.upload(self.CSV)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM products_product_fts')
+        self.assertEqual(self.client.get('/api/products/', {'q': 'эмаль'}).json(), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.client.get('/api/products/', {'q': 'эмаль'}).json()), 1)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manufacturer = Manufacturer.objects.create(name="Тиккурила")
+        self.product = Product.objects.create(name="Эмаль", description="", price=450)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_product_list(self):
+        self.assertRevalidates('/api/products/', lambda: Product.objects.create(name="Лак", description="", price=1))
+
+    def test_product_retrieve_follows_manufacturer_changes(self):
+        def rename():
+            self.manufacturer.name = "Текс"
+            self.manufacturer.save()
+        self.assertRevalidates(f'/api/products/{self.product.id}/', rename)
+
+    def test_manufacturer_list(self):
+        self.assertRevalidates('/api/manufacturers/', self.manufacturer.delete)
+
+    def test_catalog_version_bumped_after_commit(self):
+        before = get_version(CATALOG)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.product.price = 500
+            self.product.save()
+            self.manufacturer.delete()
+            # До коммита другие запросы не должны закэшировать старые данные под новой версией
+            self.assertEqual(get_version(CATALOG), before)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(get_version(CATALOG), before)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get('/api/products/')['ETag']
+        response = self.client.get('/api/products/', {'fields': 'card'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """Основные запросы каталога идут по индексам и без отдельной сортировки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        manufacturers = Manufacturer.objects.bulk_create(
+            [Manufacturer(name=f"Производитель {i}") for i in range(20)]
+        )
+        Product.objects.bulk_create([
+            Product(name=f"Товар {i}", description="", price=i % 5000, stock=i % 3,
+                    category=f"Категория {i % 40}", manufacturer=manufacturers[i % 20])
+            for i in range(4000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_default_list(self):
+        self.assertIndexedPlan(lambda: self.client.get('/api/products/', {'page_size': 20}), 'products_product')
+
+    def test_category(self):
+        self.assertIndexedPlan(
+            lambda: self.client.get('/api/products/', {'category': "Категория 7", 'page_size': 20}),
+            'products_product', search=True,
+        )
+
+    def test_price_range_ordered_by_price(self):
+        self.assertIndexedPlan(
+            lambda: self.client.get('/api/products/', {'price_min': 100, 'price_max': 200, 'ordering': 'price'}),
+            'products_product', search=True,
+        )
+
+    def test_rating_ordering(self):
+        self.assertIndexedPlan(
+            lambda: self.client.get('/api/products/', {'ordering': '-rating', 'page_size': 20}), 'products_product',
+        )
+
+
+class RecommendationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.paint, self.primer, self.brush, self.roller, self.tape = [
+            Product.objects.create(name=name, description="", price=100)
+            for name in ("Краска", "Грунт", "Кисть", "Валик", "Скотч")
+        ]
+
+    def order(self, *products):
+        order = Order.objects.create(name="Покупатель", total=0)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, product_name=product.name, price=product.price, quantity=1)
+            for product in products
+        ])
+        return order
+
+    def related(self, product):
+        return [item['name'] for item in self.client.get(f'/api/products/{product.id}/related/').json()]
+
+    def test_build_and_incremental_refresh(self):
+        self.order(self.paint, self.primer, self.brush)
+        self.order(self.paint, self.primer)
+        self.order(self.paint, self.roller)
+        self.order(self.roller, self.brush)
+        stats = build_recommendations()
+        self.assertEqual(stats['items'], 9)
+        # Грунт с краской в двух заказах из двух — связь сильнее валика (один из трёх)
+        self.assertEqual(self.related(self.paint), ["Грунт", "Кисть", "Валик"])
+        self.assertEqual(self.related(self.tape), [])
+
+        # Новый заказ: обрабатываются только его позиции, соседи скотча и его пары появляются
+        self.order(self.tape, self.roller)
+        stats = build_recommendations()
+        self.assertEqual((stats['items'], stats['orders'], stats['full']), (2, 1, False))
+        self.assertEqual(self.related(self.tape), ["Валик"])
+        self.assertIn("Скотч", self.related(self.roller))
+        self.assertEqual(RecommendationState.objects.get().watermark, OrderItem.objects.latest('id').id)
+
+        # Инкрементальный результат совпадает с полным пересчётом
+        incremental = list(ProductRelation.objects.order_by('product_id', 'rank').values_list('product_id', 'related_id'))
+        build_recommendations(full=True)
+        full = list(ProductRelation.objects.order_by('product_id', 'rank').values_list('product_id', 'related_id'))
+        self.assertEqual(incremental, full)
+
+    def test_checkout_keeps_refresh_incremental(self):
+        # Оформление заказа очищает корзину, но счётчики строятся по позициям заказов
+        user = User.objects.create(username="buyer")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.paint)
+        self.order(self.paint, self.primer)
+        self.assertTrue(build_recommendations()['full'])
+        CartItem.objects.filter(cart=cart).delete()
+        self.order(self.paint, self.primer)
+        self.assertFalse(build_recommendations()['full'])
+        self.assertEqual(self.related(self.paint), ["Грунт"])
+
+    def test_deleted_orders_trigger_full_rebuild(self):
+        self.order(self.paint, self.primer)
+        self.order(self.paint, self.primer)
+        self.order(self.paint, self.roller)
+        self.assertTrue(build_recommendations()['full'])
+        self.assertFalse(build_recommendations()['full'])
+
+        # Заказ удалили из админки: связь краска-валик пропадает
+        Order.objects.filter(items__product=self.roller).delete()
+        self.assertTrue(build_recommendations()['full'])
+        self.assertEqual(self.related(self.paint), ["Грунт"])
+        relation = ProductRelation.objects.get(product=self.paint)
+        self.assertAlmostEqual(relation.score, 1.0)
+
+    def test_repeated_product_in_order_counted_once(self):
+        self.order(self.paint, self.paint, self.primer)
+        build_recommendations(min_support=2)
+        self.assertEqual(self.related(self.paint), [])
+
+    def test_related_single_query(self):
+        self.order(self.paint, self.primer, self.brush)
+        call_command('build_recommendations', top_k=1, stdout=StringIO(), stderr=StringIO())
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/{self.paint.id}/related/', {'fields': 'card'})
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(self.client.get('/api/products/abc/related/').status_code, 404)
+
+
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_snapshots()
+        self.product = Product.objects.create(name="Краска", description="", price=100)
+
+    def test_served_without_queries(self):
+        first = self.client.get('/api/products/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/products/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.json()[0]['name'], "Краска")
+        self.assertIn('Accept-Encoding', second['Vary'])
+
+    def test_compressed_variant(self):
+        plain = self.client.get('/api/products/').content
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain)
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_stale_snapshot_replaced(self):
+        self.client.get('/api/products/')
+        self.product.name = "Эмаль"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get('/api/products/').json()[0]['name'], "Эмаль")
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/')
+
+    def test_filtered_list_is_live(self):
+        self.client.get('/api/products/', {'category': 'Краски'})
+        with self.assertNumQueries(1):
+            self.client.get('/api/products/', {'category': 'Краски'})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'test_cache'}})
+    def test_warm_catalog(self):
+        call_command('createcachetable', stdout=StringIO())
+        call_command('warm_catalog', base_url='http://testserver', stdout=StringIO())
+        clear_snapshots()  # снимок должен найтись в общем кэше, а не в памяти процесса
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/', {'fields': 'card'})
+        self.assertFalse(any('products_product' in query['sql'] for query in queries))
+        self.assertEqual(set(response.json()[0]), {
+            'id', 'name', 'price', 'image_url', 'category', 'rating_avg', 'rating_count', 'manufacturer',
+        })
+
+    def test_warm_catalog_needs_shared_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_catalog', base_url='http://testserver', stdout=StringIO())
+        errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['paintstore.E001'])
+
+    def test_database_cache_warned_on_deploy(self):
+        self.assertEqual(check_cache_outside_database(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                                   'LOCATION': 'test_cache'}}):
+            warnings = check_cache_outside_database(None)
+            self.assertEqual(check_shared_cache(None), [])
+        self.assertEqual([warning.id for warning in warnings], ['paintstore.W001'])
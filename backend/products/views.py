@@ -1,33 +1,144 @@
+import functools
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import ValidationError
+from decimal import Decimal, InvalidOperation
 from .models import Product, Manufacturer
 from .serializers import ProductSerializer, ManufacturerSerializer
+from .search import product_index
+from .pagination import ProductCursorPagination, PRODUCT_ORDERINGS
+from .facets import get_facets
+from .fieldsets import SparseFieldsetViewMixin
+from .catalog_io import CatalogFileError, CatalogImporter, FORMATS, detect_format, iter_export, read_rows
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import MultiPartParser
+from paintstore.conditional import conditional_get
+from .signals import CATALOG
+from .recommendations import RECOMMENDATIONS
+from .snapshot import is_snapshot_request, serve_snapshot
 from rest_framework.permissions import IsAuthenticated
 from accounts.permissions import IsModerator
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Публичный список товаров"""
-    queryset = Product.objects.all()
+    # select_related: производитель приходит тем же запросом, без N+1 на каждую карточку
+    queryset = Product.objects.select_related('manufacturer')
     serializer_class = ProductSerializer
+    # Курсорная пагинация: включается параметром ?page_size= (или ?cursor=)
+    pagination_class = ProductCursorPagination
+    # id товара — число (чтобы /api/products/<id>/related/ не путался с другими адресами)
+    lookup_value_regex = r'\d+'
 
     def get_permissions(self):
         # Публично: только чтение
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'facets', 'related']:
             return [AllowAny()]  
         # Редактирование: только модераторы
         return [IsModerator()]
-    
+
+    # Каталог меняется редко: повторные запросы получают 304 без обращения к БД
+    @conditional_get(CATALOG)
+    def list(self, request, *args, **kwargs):
+        # Список без фильтров отдаём из готового снимка (products/snapshot.py)
+        if is_snapshot_request(request):
+            render = functools.partial(super().list, request, *args, **kwargs)
+            return serve_snapshot(request, render, self.get_renderer_context())
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(CATALOG)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         queryset = super().get_queryset()
         # Получаем ID производителя из параметров запроса
         manufacturer_id = self.request.query_params.get('manufacturer_id', None)
         if manufacturer_id is not None:
             queryset = queryset.filter(manufacturer_id=manufacturer_id)
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+        price_min = self._decimal_param('price_min')
+        if price_min is not None:
+            queryset = queryset.filter(price__gte=price_min)
+        price_max = self._decimal_param('price_max')
+        if price_max is not None:
+            queryset = queryset.filter(price__lte=price_max)
+        if self.request.query_params.get('in_stock') in ('1', 'true'):
+            queryset = queryset.filter(stock__gt=0)
+        # ?rating_min=4 — по денормализованному среднему, без обращения к отзывам
+        rating_min = self._decimal_param('rating_min')
+        if rating_min is not None:
+            queryset = queryset.filter(rating_avg__gte=rating_min)
+        # Полнотекстовый поиск: ?q=краска белая (результаты отсортированы по релевантности)
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = product_index.filter(queryset, query)
+        # Сортировка: ?ordering=price | -price | name | -created_at | -rating ...
+        ordering = PRODUCT_ORDERINGS.get(self.request.query_params.get('ordering'))
+        if ordering:
+            queryset = queryset.order_by(*ordering)
         return queryset
+
+    def _decimal_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return Decimal(value)
+        except InvalidOperation:
+            raise ValidationError({name: 'Ожидается число'})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """GET /api/products/facets/ — счётчики по категориям, производителям, ценам и наличию"""
+        return Response(get_facets(request.query_params, self.get_queryset))
+
+    @action(detail=True, methods=['get'])
+    @conditional_get(CATALOG, RECOMMENDATIONS)
+    def related(self, request, pk=None):
+        """GET /api/products/{id}/related/ — «часто покупают вместе» (manage.py build_recommendations)"""
+        # Один запрос: связи по индексу (product, rank) + сами товары с производителем
+        queryset = self.apply_fieldset(
+            Product.objects.select_related('manufacturer')
+            .filter(recommended_for__product_id=pk)
+            .order_by('recommended_for__rank')
+        )
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_catalog(self, request):
+        """POST /api/products/import/ — загрузка прайс-листа (CSV/JSONL, поле file), только модераторы"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Файл не передан (поле file)'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in FORMATS:
+            return Response({'error': f'Формат должен быть одним из: {", ".join(FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        importer = CatalogImporter()
+        try:
+            importer.run(read_rows(upload, file_format))
+        except CatalogFileError as e:
+            # Пачки до ошибки уже записаны — отдаём их статистику вместе с ошибкой
+            return Response({'error': str(e), **importer.stats}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(importer.stats)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_catalog(self, request):
+        """GET /api/products/export/?file_format=csv|jsonl — потоковая выгрузка каталога, только модераторы"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in FORMATS:
+            return Response({'error': f'Формат должен быть одним из: {", ".join(FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(iter_export(file_format), content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="catalog.{file_format}"'
+        return response
     
-class ManufacturerViewSet(viewsets.ModelViewSet):
+class ManufacturerViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """ViewSet для управления Производителями (требует прав модератора)"""
     queryset = Manufacturer.objects.all()
     serializer_class = ManufacturerSerializer
@@ -45,8 +156,21 @@ class ManufacturerViewSet(viewsets.ModelViewSet):
 
         # Возвращаем экземпляр класса разрешения
         return [permission() for permission in permission_classes]
-    
+
+    @conditional_get(CATALOG)
+    def list(self, request, *args, **kwargs):
+        # Список без фильтров отдаём из готового снимка (products/snapshot.py)
+        if is_snapshot_request(request):
+            render = functools.partial(super().list, request, *args, **kwargs)
+            return serve_snapshot(request, render, self.get_renderer_context())
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(CATALOG)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'], permission_classes=[AllowAny]) 
+    @conditional_get(CATALOG)
     def info(self, request, pk=None):
         """Возвращает информацию о производителе по его ID (pk)."""
         try:
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (пересчёт рейтинга товара)
+        from . import signals  # noqa: F401
@@ -0,0 +1,156 @@
+"""
+Поиск почти одинаковых отзывов (волны спама из слегка изменённых копий) — MinHash + LSH.
+
+Текст нормализуется (нижний регистр, только буквы и цифры) и режется на символьные
+шинглы длины SHINGLE_SIZE. MinHash-подпись — NUM_PERM минимумов хэшей шинглов по разным
+хэш-функциям, считается векторно в NumPy; доля совпавших позиций двух подписей — оценка
+сходства Жаккара их наборов шинглов. Подпись хранится в ReviewSignature (NUM_PERM * 4 байта).
+
+Подпись делится на BANDS полос по ROWS чисел; ключ полосы лежит в ReviewBucket с индексом
+по key. Кандидаты в дубли — отзывы, совпавшие с новым хотя бы в одной полосе: один
+запрос key IN (...) по индексу, не больше MAX_CANDIDATES строк. Кандидаты проверяются по
+подписям, и при сходстве от DUPLICATE_THRESHOLD отзыв попадает в кластер самого похожего.
+Стоимость поиска не зависит от числа отзывов в базе.
+
+Почти точные копии (сходство от NEAR_COPY_THRESHOLD) полосы не записывают: их и так находят
+по полосам отзыва, который они повторяют. Так волна из тысяч копий не раздувает корзины.
+
+Подписи считаются при создании и изменении текста отзыва (ReviewViewSet), для старых
+отзывов — manage.py index_reviews. Изменение констант подписи требует index_reviews --rebuild.
+"""
+import re
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from .models import Review, ReviewBucket, ReviewSignature
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Полосы по 4 числа находят пары со сходством примерно от (1 / 32) ** (1 / 4) ≈ 0.42;
+# дубликатом считаем от DUPLICATE_THRESHOLD по полной подписи
+DUPLICATE_THRESHOLD = 0.6
+NEAR_COPY_THRESHOLD = 0.9
+MAX_CANDIDATES = 50
+# Сколько строк (шинглы × хэш-функции) считать за раз в signatures()
+MAX_BLOCK_SHINGLES = 20000
+
+_WORD_RE = re.compile(r'\w+')
+# Хэш-функции h(x) = (a * x + b) mod 2**64 >> 32 (multiply-shift), a — нечётные.
+# Параметры фиксированы: сохранённые подписи должны совпадать между процессами
+_rng = np.random.default_rng(20260118)
+_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_SHINGLE_POWERS = np.array([pow(1000003, i, 1 << 64) for i in range(SHINGLE_SIZE - 1, -1, -1)], dtype=np.uint64)
+_ROW_POWERS = np.array([pow(2654435761, i, 1 << 64) for i in range(ROWS - 1, -1, -1)], dtype=np.uint64)
+_BAND_SALTS = _rng.integers(0, 2 ** 63, size=BANDS, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def shingle_hashes(text):
+    """Уникальные 32-битные хэши символьных шинглов текста (uint64)."""
+    codes = np.frombuffer(normalize(text).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) >= SHINGLE_SIZE:
+        windows = np.lib.stride_tricks.sliding_window_view(codes, SHINGLE_SIZE)
+        hashes = (windows * _SHINGLE_POWERS).sum(axis=1)
+    else:
+        # Короткий текст — один шингл из всего текста
+        hashes = np.array([(codes * _SHINGLE_POWERS[SHINGLE_SIZE - len(codes):]).sum()], dtype=np.uint64)
+    return np.unique((hashes * _MIX) >> np.uint64(32))
+
+
+def signatures(texts):
+    """MinHash-подписи текстов: массив (len(texts), NUM_PERM) uint32."""
+    result = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    shingles = [shingle_hashes(text) for text in texts]
+    start = 0
+    while start < len(texts):
+        # Блок текстов: хэши всех шинглов блока одной матрицей, минимумы по текстам — reduceat
+        end, rows = start, 0
+        while end < len(texts) and (end == start or rows + len(shingles[end]) <= MAX_BLOCK_SHINGLES):
+            rows += len(shingles[end])
+            end += 1
+        block = np.concatenate(shingles[start:end])
+        offsets = np.cumsum([0] + [len(s) for s in shingles[start:end - 1]])
+        hashed = (block[:, None] * _A + _B) >> np.uint64(32)
+        result[start:end] = np.minimum.reduceat(hashed, offsets, axis=0)
+        start = end
+    return result
+
+
+def band_keys(signature):
+    """BANDS ключей полос подписи (int64 — под BigIntegerField)."""
+    bands = signature.reshape(BANDS, ROWS).astype(np.uint64)
+    keys = ((bands * _ROW_POWERS).sum(axis=1) ^ _BAND_SALTS) * _MIX
+    return keys.view(np.int64)
+
+
+def similarity(signature, others):
+    """Оценка сходства Жаккара подписи с каждой строкой others."""
+    return (others == signature).mean(axis=1)
+
+
+def _unpack(minhash):
+    return np.frombuffer(bytes(minhash), dtype=np.uint32)
+
+
+@transaction.atomic
+def index_review(review_id, signature=None, text=None):
+    """
+    Записывает подпись отзыва и относит его к кластеру. Возвращает id кластера.
+    Вызывается для нового отзыва или после изменения текста; подпись можно передать
+    готовой (manage.py index_reviews считает их пачками).
+    """
+    if signature is None:
+        signature = signatures([text])[0]
+    keys = band_keys(signature)
+
+    ReviewBucket.objects.filter(review_id=review_id).delete()
+    candidates = list(
+        ReviewBucket.objects.filter(key__in=keys.tolist()).exclude(review_id=review_id)
+        .values_list('review_id', flat=True).distinct()[:MAX_CANDIDATES]
+    )
+    cluster, best = review_id, 0.0
+    if candidates:
+        rows = list(ReviewSignature.objects.filter(review_id__in=candidates).values_list('cluster', 'minhash'))
+        if rows:
+            scores = similarity(signature, np.stack([_unpack(minhash) for _, minhash in rows]))
+            match = int(scores.argmax())
+            if scores[match] >= DUPLICATE_THRESHOLD:
+                cluster, best = rows[match][0], float(scores[match])
+
+    ReviewSignature.objects.update_or_create(
+        review_id=review_id, defaults={'minhash': signature.tobytes(), 'cluster': cluster},
+    )
+    if best < NEAR_COPY_THRESHOLD:
+        ReviewBucket.objects.bulk_create([ReviewBucket(key=key, review_id=review_id) for key in keys.tolist()])
+    return cluster
+
+
+def pending_clusters(limit=50):
+    """
+    Кластеры из двух и более ожидающих модерации отзывов, крупные сверху:
+    [{'cluster', 'size', 'last_created_at', 'sample': {'id', 'text'}}, ...]. Два запроса.
+    """
+    clusters = list(
+        ReviewSignature.objects.filter(review__is_approved=False).values('cluster')
+        .annotate(size=Count('review_id'), first_id=Min('review_id'), last_created_at=Max('review__created_at'))
+        .filter(size__gte=2).order_by('-size', 'cluster')[:limit]
+    )
+    texts = dict(Review.objects.filter(id__in=[c['first_id'] for c in clusters]).values_list('id', 'text'))
+    return [
+        {
+            'cluster': c['cluster'],
+            'size': c['size'],
+            'last_created_at': c['last_created_at'],
+            'sample': {'id': c['first_id'], 'text': texts.get(c['first_id'], '')},
+        }
+        for c in clusters
+    ]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from reviews.dedup import index_review, signatures
+from reviews.models import Review, ReviewBucket, ReviewSignature
+
+
+class Command(BaseCommand):
+    help = "Считает MinHash-подписи отзывов без подписи и раскладывает их по кластерам дублей"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Удалить все подписи и посчитать заново")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            ReviewBucket.objects.all().delete()
+            ReviewSignature.objects.all().delete()
+        reviews = Review.objects.filter(signature__isnull=True).order_by('id').values_list('id', 'text')
+        indexed = 0
+        while True:
+            # Без подписи остаются только ещё не обработанные — всегда берём первую пачку
+            chunk = list(reviews[:options['chunk_size']])
+            if not chunk:
+                break
+            for (review_id, _), signature in zip(chunk, signatures([text for _, text in chunk])):
+                index_review(review_id, signature=signature)
+            indexed += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Подписи посчитаны для {indexed} отзывов"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reviews.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает рейтинги товаров по одобренным отзывам"
+
+    def handle(self, *args, **options):
+        rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS("Рейтинги товаров пересчитаны"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reviews.search import review_index
+
+
+class Command(BaseCommand):
+    help = "Полностью перестраивает полнотекстовый индекс отзывов (после правок БД в обход ORM)"
+
+    def handle(self, *args, **options):
+        review_index.rebuild()
+        self.stdout.write(self.style.SUCCESS("Поисковый индекс отзывов перестроен"))
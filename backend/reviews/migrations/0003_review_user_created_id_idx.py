@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 09:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productrelation'),
+        ('reviews', '0002_review_review_approved_created_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='review',
+            name='review_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='review_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 09:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productrelation'),
+        ('reviews', '0003_review_user_created_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['product', 'rating', 'created_at', 'id'], name='review_product_rating_idx'),
+        ),
+    ]
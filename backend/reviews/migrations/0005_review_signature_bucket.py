@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 09:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_review_product_rating_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSignature',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='reviews.review', verbose_name='Отзыв')),
+                ('minhash', models.BinaryField(verbose_name='MinHash-подпись')),
+                ('cluster', models.PositiveIntegerField(db_index=True, verbose_name='Кластер')),
+            ],
+            options={
+                'verbose_name': 'Подпись отзыва',
+                'verbose_name_plural': 'Подписи отзывов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True, verbose_name='Ключ полосы')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='reviews.review', verbose_name='Отзыв')),
+            ],
+            options={
+                'verbose_name': 'LSH-корзина отзыва',
+                'verbose_name_plural': 'LSH-корзины отзывов',
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Индекс всех отзывов по дате для модераторской выдачи и теневой полнотекстовый индекс
+# для поиска модератора (?q=). Содержимое индекса поддерживает reviews.search.review_index
+# (через сигналы и пакетную модерацию), здесь только создаём таблицу и заполняем её.
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+SOURCE = (
+    "SELECT r.id, u.username || ' ' || u.first_name || ' ' || u.last_name, p.name, r.text "
+    "FROM reviews_review r "
+    "JOIN auth_user u ON u.id = r.user_id "
+    "JOIN products_product p ON p.id = r.product_id"
+)
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE reviews_review_fts USING fts5(
+        author, product, text,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"INSERT INTO reviews_review_fts (rowid, author, product, text) {SOURCE}",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS reviews_review_fts",
+]
+
+# pg_trgm подключён миграцией products/0004_product_search_index
+POSTGRESQL_FORWARD = [
+    """
+    CREATE TABLE reviews_review_fts (
+        object_id bigint PRIMARY KEY,
+        title text NOT NULL,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX reviews_review_fts_document ON reviews_review_fts USING gin (document)",
+    "CREATE INDEX reviews_review_fts_title_trgm ON reviews_review_fts USING gin (title gin_trgm_ops)",
+    f"""
+    INSERT INTO reviews_review_fts (object_id, title, document)
+    SELECT src.id, src.author,
+           setweight(to_tsvector('russian', coalesce(src.author, '')), 'B') ||
+           setweight(to_tsvector('russian', coalesce(src.product, '')), 'B') ||
+           setweight(to_tsvector('russian', coalesce(src.text, '')), 'A')
+    FROM ({SOURCE}) AS src (id, author, product, text)
+    """,
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP TABLE IF EXISTS reviews_review_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productrelation'),
+        ('reviews', '0005_review_signature_bucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
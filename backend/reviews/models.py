@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from products.models import Product
 
@@ -19,11 +19,59 @@ class Review(models.Model):
         verbose_name="Модератор"
     )
 
+    def save(self, *args, **kwargs):
+        # Сигналы рейтинга (reviews/signals.py) блокируют строку в pre_save и пересчитывают
+        # рейтинг в post_save — обе части должны попасть в одну транзакцию
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
         ordering = ['-created_at']
+        indexes = [
+            # Публичная лента и очередь модерации. Частичные индексы: Django пишет фильтр
+            # по булеву полю как WHERE "is_approved" (без "= 1"), и обычный индексный
+            # префикс (is_approved, ...) SQLite для него не использует
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_approved=True),
+                         name='review_approved_created_idx'),
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_approved=False),
+                         name='review_pending_created_idx'),
+            # Одобренные отзывы конкретного товара
+            models.Index(fields=['product', 'created_at', 'id'], condition=models.Q(is_approved=True),
+                         name='review_product_approved_idx'),
+            # Они же с фильтром ?rating= (/api/products/{id}/reviews/?rating=1)
+            models.Index(fields=['product', 'rating', 'created_at', 'id'], condition=models.Q(is_approved=True),
+                         name='review_product_rating_idx'),
+            # Все отзывы для модератора (/api/reviews/moderation/) и фильтр по датам
+            models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+            # «Мои отзывы»
+            models.Index(fields=['user', 'created_at', 'id'], name='review_user_created_idx'),
+        ]
 
     def __str__(self):
         status = "OK" if self.is_approved else "WAIT"
-        return f"{status} {self.user.username} — {self.product.name} ({self.rating}★)"
\ No newline at end of file
+        return f"{status} {self.user.username} — {self.product.name} ({self.rating}★)"
+
+class ReviewSignature(models.Model):
+    """MinHash-подпись текста отзыва и кластер почти одинаковых отзывов (reviews/dedup.py)"""
+    review = models.OneToOneField(Review, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='signature', verbose_name="Отзыв")
+    # dedup.NUM_PERM чисел uint32 подряд
+    minhash = models.BinaryField("MinHash-подпись")
+    # id первого отзыва кластера; у уникального отзыва — его собственный id
+    cluster = models.PositiveIntegerField("Кластер", db_index=True)
+
+    class Meta:
+        verbose_name = "Подпись отзыва"
+        verbose_name_plural = "Подписи отзывов"
+
+
+class ReviewBucket(models.Model):
+    """LSH-корзина: ключ полосы MinHash-подписи → отзыв. Поиск кандидатов в дубли — по индексу key"""
+    key = models.BigIntegerField("Ключ полосы", db_index=True)
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='buckets', verbose_name="Отзыв")
+
+    class Meta:
+        verbose_name = "LSH-корзина отзыва"
+        verbose_name_plural = "LSH-корзины отзывов"
@@ -0,0 +1,83 @@
+"""
+Модерация отзывов пачкой (POST /api/reviews/moderate/).
+
+Одобрение — один UPDATE (is_approved, moderator, moderated_at) на все отзывы, отклонение —
+обычный queryset.delete(): отзывы вместе с подписями и LSH-корзинами (каскад) удаляются
+несколькими запросами на пачку. Рейтинги товаров поправляются одним RatingChanges.apply()
+на всю пачку, поисковый индекс — одним review_index.remove(). Сигналы отзывов
+(reviews/signals.py) отключены через bulk_changes(), иначе на каждый отзыв был бы свой запрос.
+
+Перед изменением строки отзывов блокируются (SELECT ... FOR UPDATE на PostgreSQL):
+два модератора, одобряющие одно и то же, не учтут оценку в рейтинге дважды.
+
+Кластеры почти одинаковых отзывов (reviews/dedup.py) раскрываются одним запросом
+в id ожидающих модерации отзывов; уже одобренные отзывы кластера не трогаются.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Review, ReviewSignature
+from .ratings import RatingChanges
+from .search import review_index
+from .signals import bulk_changes
+
+
+def _locked(ids, **filters):
+    return list(
+        Review.objects.select_for_update().filter(id__in=ids, **filters)
+        .order_by('id').values_list('id', 'product_id', 'rating', 'is_approved')
+    )
+
+
+def _pending_in_clusters(clusters):
+    """{кластер: [id ожидающих отзывов]} для списка кластеров."""
+    members = {}
+    if clusters:
+        rows = ReviewSignature.objects.filter(cluster__in=clusters, review__is_approved=False) \
+            .values_list('cluster', 'review_id')
+        for cluster, review_id in rows:
+            members.setdefault(cluster, []).append(review_id)
+    return members
+
+
+@transaction.atomic
+def moderate(moderator, approve=(), reject=(), approve_clusters=(), reject_clusters=()):
+    """
+    Одобряет отзывы approve и удаляет отзывы reject; *_clusters — то же для всех
+    ожидающих отзывов кластеров, кроме явно перечисленных в другом списке.
+    Возвращает {'approved': n, 'rejected': n, 'skipped': [id, ...]}; в skipped — id,
+    которых нет, и уже одобренные отзывы из approve.
+    """
+    changes = RatingChanges()
+    approve, reject = set(approve), set(reject)
+    requested = approve | reject
+    if approve_clusters or reject_clusters:
+        members = _pending_in_clusters([*approve_clusters, *reject_clusters])
+        approve |= {i for c in approve_clusters for i in members.get(c, ())} - requested
+        reject |= {i for c in reject_clusters for i in members.get(c, ())} - requested
+
+    approved = _locked(approve, is_approved=False)
+    if approved:
+        Review.objects.filter(id__in=[row[0] for row in approved]).update(
+            is_approved=True, moderator=moderator, moderated_at=timezone.now(),
+        )
+        for _, product_id, rating, _ in approved:
+            changes.add(product_id, rating)
+
+    rejected = _locked(reject)
+    if rejected:
+        rejected_ids = [row[0] for row in rejected]
+        review_index.remove(rejected_ids)
+        with bulk_changes():
+            Review.objects.filter(id__in=rejected_ids).delete()
+        for _, product_id, rating, was_approved in rejected:
+            if was_approved:
+                changes.remove(product_id, rating)
+
+    changes.apply()
+    done = {row[0] for row in approved} | {row[0] for row in rejected}
+    return {
+        'approved': len(approved),
+        'rejected': len(rejected),
+        'skipped': sorted(requested - done),
+    }
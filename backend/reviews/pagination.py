@@ -0,0 +1,10 @@
+from products.pagination import KeysetPagination
+
+
+class ReviewCursorPagination(KeysetPagination):
+    """
+    Ленты отзывов (публичная, на модерации, «мои», отзывы товара): новые сверху,
+    по (created_at, id). Постранично всегда — без ?page_size= отдаётся page_size отзывов.
+    """
+    optional = False
+    page_size = 20
@@ -0,0 +1,124 @@
+"""
+Денормализованный рейтинг товара (Product.rating_*).
+
+Учитываются только одобренные отзывы. Изменения применяются инкрементально —
+UPDATE с F()-выражениями, без чтения таблицы отзывов: один запрос на пачку
+до APPLY_BATCH_SIZE товаров (прибавка для каждого товара выбирается через CASE);
+rebuild_ratings() пересчитывает всё с нуля (manage.py rebuild_ratings).
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+
+from paintstore.versions import bump_version
+from products.models import Product
+from products.signals import CATALOG
+
+SCORES = range(1, 6)
+HISTOGRAM_FIELDS = Product.HISTOGRAM_FIELDS
+# Сколько товаров обновлять одним UPDATE
+APPLY_BATCH_SIZE = 500
+
+
+def _per_product(values, product_ids):
+    """
+    {product_id: прибавка} -> выражение: прибавка для текущей строки UPDATE по product_ids
+    (0 для товаров, которых нет в values).
+    """
+    if len(product_ids) == 1:
+        return Value(values.get(product_ids[0], 0))
+    return Case(
+        *(When(pk=product_id, then=Value(value)) for product_id, value in values.items() if value),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+class RatingChanges:
+    """
+    Накопитель изменений: для каждого товара — сколько оценок каждого балла
+    добавилось (+1) или ушло (-1). Применяется одним UPDATE на пачку товаров.
+    """
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: defaultdict(int))
+
+    def add(self, product_id, rating, sign=1):
+        self.deltas[product_id][rating] += sign
+
+    def remove(self, product_id, rating):
+        self.add(product_id, rating, -1)
+
+    def apply(self):
+        deltas = {product_id: delta for product_id, delta in self.deltas.items() if any(delta.values())}
+        self.deltas.clear()
+        product_ids = sorted(deltas)
+        for start in range(0, len(product_ids), APPLY_BATCH_SIZE):
+            self._update({product_id: deltas[product_id] for product_id in product_ids[start:start + APPLY_BATCH_SIZE]})
+        if deltas:
+            # Рейтинг входит в выдачу каталога — сбрасываем кэши и ETag после коммита,
+            # иначе другой процесс успеет закэшировать старые данные под новой версией
+            transaction.on_commit(partial(bump_version, CATALOG))
+
+    @staticmethod
+    def _update(deltas):
+        product_ids = list(deltas)
+        count = _per_product({pk: sum(delta.values()) for pk, delta in deltas.items()}, product_ids)
+        total = _per_product({pk: sum(score * n for score, n in delta.items()) for pk, delta in deltas.items()},
+                             product_ids)
+        new_count = F('rating_count') + count
+        new_sum = F('rating_sum') + total
+        values = {
+            'rating_count': new_count,
+            'rating_sum': new_sum,
+            # В UPDATE правая часть видит старые значения строки — считаем среднее по новым
+            'rating_avg': Case(
+                When(GreaterThan(new_count, 0), then=Cast(new_sum, FloatField()) / new_count),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+        }
+        for score in SCORES:
+            changed = {pk: delta[score] for pk, delta in deltas.items() if delta.get(score)}
+            if changed:
+                values[f'rating_{score}'] = F(f'rating_{score}') + _per_product(changed, product_ids)
+        Product.objects.filter(pk__in=product_ids).update(**values)
+
+
+def rebuild_ratings(batch_size=1000):
+    """Полный пересчёт рейтингов по одобренным отзывам (группировка в БД)."""
+    from .models import Review
+
+    aggregates = {
+        'count': Count('id'),
+        'total': Sum('rating'),
+        **{f'rating_{score}': Count('id', filter=Q(rating=score)) for score in SCORES},
+    }
+    rows = (
+        Review.objects.filter(is_approved=True)
+        .values('product_id')
+        .annotate(**aggregates)
+        .order_by('product_id')
+    )
+    with transaction.atomic():
+        Product.objects.update(rating_avg=0, rating_count=0, rating_sum=0, **{f: 0 for f in HISTOGRAM_FIELDS})
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            product = Product(
+                pk=row['product_id'],
+                rating_count=row['count'],
+                rating_sum=row['total'],
+                rating_avg=row['total'] / row['count'],
+                **{f: row[f] for f in HISTOGRAM_FIELDS},
+            )
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, ['rating_avg', 'rating_count', 'rating_sum', *HISTOGRAM_FIELDS])
+                batch = []
+        if batch:
+            Product.objects.bulk_update(batch, ['rating_avg', 'rating_count', 'rating_sum', *HISTOGRAM_FIELDS])
+        transaction.on_commit(partial(bump_version, CATALOG))
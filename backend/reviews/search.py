@@ -0,0 +1,26 @@
+"""
+Полнотекстовый поиск модератора по отзывам (?q= в /api/reviews/moderation/ и /pending/).
+
+Теневая таблица reviews_review_fts устроена так же, как индекс каталога (products/search.py):
+FTS5 в SQLite, tsvector + триграммы в PostgreSQL. Первая колонка — автор, поэтому
+опечатки в имени пользователя находятся по триграммам. Таблицу создаёт миграция
+reviews/0006_review_search_index, содержимое обновляют сигналы (reviews/signals.py)
+и пакетная модерация. Полная перестройка — manage.py rebuild_review_search_index.
+"""
+from products.search import FullTextIndex
+
+review_index = FullTextIndex(
+    'reviews_review_fts',
+    columns=[
+        ('author', 2.0, 'B'),
+        ('product', 2.0, 'B'),
+        ('text', 1.0, 'A'),
+    ],
+    source=(
+        "SELECT obj.id, u.username || ' ' || u.first_name || ' ' || u.last_name, p.name, obj.text "
+        "FROM reviews_review obj "
+        "JOIN auth_user u ON u.id = obj.user_id "
+        "JOIN products_product p ON p.id = obj.product_id"
+    ),
+    fallback_fields=('text', 'user__username', 'product__name'),
+)
@@ -1,17 +1,25 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Review
-from products.serializers import ProductSerializer
+from products.serializers import ProductSerializer, ProductBriefSerializer
+from products.fieldsets import SparseFieldsetSerializerMixin
 from products.models import Product
 
 class UserSerializer(serializers.ModelSerializer):
+    """Автор отзыва: только то, что показывается рядом с отзывом"""
+    display_name = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'first_name', 'last_name']
+        fields = ['id', 'username', 'display_name']
+        computed = {'display_name': ['first_name', 'last_name', 'username']}
+
+    def get_display_name(self, user):
+        return f"{user.first_name} {user.last_name}".strip() or user.username
 
-class ReviewSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)  # при чтении — данные автора
-    product = ProductSerializer(read_only=True)  # при чтении — данные товара
+class ReviewSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)  # при чтении — автор
+    product = ProductBriefSerializer(read_only=True)  # при чтении — id, название и картинка товара
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), write_only=True, source='product'
     )
@@ -24,8 +32,40 @@ class ReviewSerializer(serializers.ModelSerializer):
             'created_at', 'is_approved'
         ]
         read_only_fields = ['user', 'created_at', 'is_approved']
+        # Товар отдаётся кратко; ?fields=...,product&expand=product — целиком
+        expanded = {'product': ProductSerializer}
 
     def create(self, validated_data):
         # Привязываем отзыв к текущему пользователю
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class ReviewModerationSerializer(serializers.Serializer):
+    """
+    POST /api/reviews/moderate/: {"approve": [id, ...], "reject": [id, ...],
+    "approve_clusters": [...], "reject_clusters": [...]}. Кластер — все ожидающие отзывы
+    с этим id кластера (GET /api/reviews/pending/clusters/); отзывы, перечисленные явно
+    в другом списке, из действия над кластером исключаются.
+    """
+    MAX_IDS = 10000
+
+    approve = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                    default=list, max_length=MAX_IDS)
+    reject = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                   default=list, max_length=MAX_IDS)
+    approve_clusters = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                             default=list, max_length=MAX_IDS)
+    reject_clusters = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                            default=list, max_length=MAX_IDS)
+
+    def validate(self, attrs):
+        for approve, reject in (('approve', 'reject'), ('approve_clusters', 'reject_clusters')):
+            both = set(attrs[approve]) & set(attrs[reject])
+            if both:
+                raise serializers.ValidationError(
+                    {reject: f"Нельзя одновременно одобрить и отклонить: {sorted(both)}"}
+                )
+        if not any(attrs.values()):
+            raise serializers.ValidationError("Укажите approve, reject, approve_clusters или reject_clusters")
+        return attrs
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from products.models import Product
+from products.signals import products_renamed
+from .models import Review
+from .ratings import RatingChanges
+from .search import review_index
+
+
+_bulk = ContextVar('reviews_bulk', default=False)
+
+
+@contextmanager
+def bulk_changes():
+    """
+    Внутри блока сигналы отзывов ничего не делают: рейтинг и поисковый индекс
+    обновляет вызывающий код одним запросом на пачку (reviews/moderation.py).
+    """
+    token = _bulk.set(True)
+    try:
+        yield
+    finally:
+        _bulk.reset(token)
+
+
+def _rated_state(review):
+    # Строка блокируется до конца транзакции (Review.save и delete() идут в transaction.atomic):
+    # два одновременных одобрения не учтут одну оценку дважды
+    return (
+        Review.objects.select_for_update().filter(pk=review.pk, is_approved=True)
+        .values_list('product_id', 'rating')
+        .first()
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_rated_state(sender, instance, raw=False, **kwargs):
+    # Запоминаем, как отзыв учитывался в рейтинге до сохранения
+    instance._rated_before = None
+    if instance.pk and not raw and not _bulk.get():
+        instance._rated_before = _rated_state(instance)
+
+
+@receiver(pre_delete, sender=Review)
+def remember_rated_state_on_delete(sender, instance, **kwargs):
+    instance._rated_before = None if _bulk.get() else _rated_state(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, raw=False, **kwargs):
+    if raw or _bulk.get():
+        return
+    before = getattr(instance, '_rated_before', None)
+    after = (instance.product_id, instance.rating) if instance.is_approved else None
+    if before == after:
+        return
+    changes = RatingChanges()
+    if before:
+        changes.remove(*before)
+    if after:
+        changes.add(*after)
+    changes.apply()
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    # Учитываем состояние в БД, а не загруженного объекта: его могли одобрить после загрузки
+    before = getattr(instance, '_rated_before', None)
+    if before:
+        changes = RatingChanges()
+        changes.remove(*before)
+        changes.apply()
+
+
+# --- Поисковый индекс отзывов (reviews/search.py) ---
+
+@receiver(post_save, sender=Review)
+def index_review_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    indexed = {'text', 'user', 'product'}
+    if raw or _bulk.get() or (update_fields is not None and not indexed & set(update_fields)):
+        return
+    review_index.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Review)
+def unindex_review(sender, instance, **kwargs):
+    if not _bulk.get():
+        review_index.remove([instance.pk])
+
+
+def _reindex_reviews(reviews, update_fields, indexed):
+    if update_fields is None or indexed & set(update_fields):
+        review_index.refresh(reviews.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def index_author_reviews(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Вход в систему сохраняет только last_login — индекс не трогаем
+    if not (created or raw):
+        _reindex_reviews(Review.objects.filter(user=instance), update_fields, {'username', 'first_name', 'last_name'})
+
+
+@receiver(post_save, sender=Product)
+def index_product_reviews(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not (created or raw):
+        _reindex_reviews(instance.reviews.all(), update_fields, {'name'})
+
+
+@receiver(products_renamed)
+def index_renamed_product_reviews(sender, product_ids, **kwargs):
+    review_index.refresh(Review.objects.filter(product_id__in=product_ids).values_list('id', flat=True))
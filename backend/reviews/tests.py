@@ -1,3 +1,546 @@
+import io
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from products.catalog_io import CatalogImporter, read_rows
+from products.models import Product, Manufacturer
+from paintstore.query_budget import QueryBudgetTestMixin
+from paintstore.query_plans import QueryPlanTestMixin
+from paintstore.versions import get_version
+from products.signals import CATALOG
+from . import dedup
+from .models import Review, ReviewBucket, ReviewSignature
+from .search import review_index
+
+
+class ReviewFieldsetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="ivan", password="123")
+        self.product = Product.objects.create(
+            name="Грунт ГФ-021", description="Длинное описание", price=300, image_url="https://example.com/g.jpg"
+        )
+        Review.objects.create(user=self.user, product=self.product, text="Хороший", rating=5, is_approved=True)
+
+    def test_brief_product(self):
+        with self.assertNumQueries(1):
+            item = self.client.get('/api/reviews/', {'fields': 'id,text,product'}).json()['results'][0]
+        self.assertEqual(item['product'], {
+            'id': self.product.id, 'name': "Грунт ГФ-021", 'image_url': "https://example.com/g.jpg",
+        })
+        self.assertEqual(set(item), {'id', 'text', 'product'})
+
+    def test_expand_product(self):
+        item = self.client.get('/api/reviews/', {'fields': 'id,product', 'expand': 'product'}).json()['results'][0]
+        self.assertEqual(item['product']['description'], "Длинное описание")
+
+    def test_compact_by_default(self):
+        self.user.first_name, self.user.last_name = "Иван", "Петров"
+        self.user.save()
+        item = self.client.get('/api/reviews/').json()['results'][0]
+        self.assertEqual(item['product'], {
+            'id': self.product.id, 'name': "Грунт ГФ-021", 'image_url': "https://example.com/g.jpg",
+        })
+        self.assertEqual(item['user'], {'id': self.user.id, 'username': "ivan", 'display_name': "Иван Петров"})
+
+
+class ReviewFeedPaginationTest(TestCase):
+    """Ленты отзывов по курсору: страницы не пересекаются, запросов на страницу — постоянное число"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="ivan")
+        cls.user.profile.is_moderator = True
+        cls.user.profile.save()
+        product = Product.objects.create(name="Эмаль", description="", price=100)
+        # Одинаковое время у всех отзывов — порядок держится на id
+        Review.objects.bulk_create([
+            Review(user=cls.user, product=product, text=f"Отзыв {i}", is_approved=i % 3 != 0) for i in range(45)
+        ])
+        Review.objects.update(created_at=Review.objects.first().created_at)
+
+    def walk(self, url, budget):
+        client = APIClient()
+        ids, next_url = [], f'{url}?page_size=10'
+        while next_url:
+            # свежий объект пользователя, чтобы профиль не оставался в кэше между страницами
+            client.force_authenticate(User.objects.get(pk=self.user.pk))
+            with self.assertNumQueries(budget):
+                page = client.get(next_url).json()
+            self.assertLessEqual(len(page['results']), 10)
+            ids.extend(review['id'] for review in page['results'])
+            next_url = page['next']
+        return ids
+
+    def test_public(self):
+        ids = self.walk('/api/reviews/', 1)
+        self.assertEqual(ids, list(Review.objects.filter(is_approved=True).order_by('-id').values_list('id', flat=True)))
+
+    def test_pending(self):
+        # профиль модератора + страница
+        self.assertEqual(len(self.walk('/api/reviews/pending/', 2)), 15)
+
+    def test_my(self):
+        self.assertEqual(len(self.walk('/api/reviews/my/', 1)), 45)
+
+    def test_paginated_without_params(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # Без ?page_size= — первые 20 (одобренных 30, на модерации 15, своих 45)
+        for url, size, more in (('/api/reviews/', 20, True), ('/api/reviews/pending/', 15, False),
+                                ('/api/reviews/my/', 20, True)):
+            page = client.get(url).json()
+            self.assertEqual(len(page['results']), size)
+            self.assertEqual(page['next'] is not None, more)
+
+
+class ReviewQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.moderator = User.objects.create(username="moder")
+        self.moderator.profile.is_moderator = True
+        self.moderator.profile.save()
+
+    def seed(self, count, **kwargs):
+        for i in range(count):
+            user = User.objects.create(username=f"user{User.objects.count()}")
+            manufacturer = Manufacturer.objects.create(name=f"Производитель {Manufacturer.objects.count()}")
+            product = Product.objects.create(name=f"Товар {i}", description="", price=100, manufacturer=manufacturer)
+            Review.objects.create(user=kwargs.get('user', user), product=product, text="Текст",
+                                  is_approved=kwargs.get('is_approved', True))
+
+    def before_budget_request(self):
+        # свежий объект пользователя, чтобы профиль не оставался в кэше между прогонами
+        self.client.force_authenticate(User.objects.get(pk=self.moderator.pk))
+
+    def test_public_list(self):
+        self.assertBudget(1, '/api/reviews/')
+
+    def test_pending(self):
+        # профиль модератора + отзывы
+        self.assertBudget(2, '/api/reviews/pending/', is_approved=False)
+
+    def test_my(self):
+        self.assertBudget(1, '/api/reviews/my/', user=self.moderator)
+
+
+class ProductRatingTest(TestCase):
+    """Денормализованный рейтинг товара обновляется вместе с отзывами"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.moderator = User.objects.create(username="moder")
+        self.moderator.profile.is_moderator = True
+        self.moderator.profile.save()
+        self.product = Product.objects.create(name="Эмаль ПФ-115", description="", price=250)
+
+    def review(self, rating, **kwargs):
+        user = User.objects.create(username=f"user{User.objects.count()}")
+        return Review.objects.create(user=user, product=self.product, text="Текст", rating=rating, **kwargs)
+
+    def assertRating(self, avg, count, histogram):
+        self.product.refresh_from_db()
+        self.assertAlmostEqual(self.product.rating_avg, avg)
+        self.assertEqual(self.product.rating_count, count)
+        self.assertEqual(list(self.product.rating_histogram.values()), histogram)
+
+    def test_pending_review_not_counted_until_approved(self):
+        review = self.review(4)
+        self.assertRating(0, 0, [0, 0, 0, 0, 0])
+        self.client.force_authenticate(self.moderator)
+        response = self.client.patch(f'/api/reviews/{review.id}/approve/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRating(4, 1, [0, 0, 0, 1, 0])
+
+    def test_repeated_approve_counted_once(self):
+        review = self.review(4)
+        self.client.force_authenticate(self.moderator)
+        for _ in range(2):
+            self.assertEqual(self.client.patch(f'/api/reviews/{review.id}/approve/').status_code, 200)
+        self.assertRating(4, 1, [0, 0, 0, 1, 0])
+
+    def test_stale_object_delete_uses_stored_state(self):
+        # Объект загружен до одобрения, которое прошло мимо него
+        review = self.review(4)
+        self.client.force_authenticate(self.moderator)
+        self.client.patch(f'/api/reviews/{review.id}/approve/')
+        review.delete()
+        self.assertRating(0, 0, [0, 0, 0, 0, 0])
+
+    def test_catalog_version_bumped_after_commit(self):
+        before = get_version(CATALOG)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.review(5, is_approved=True)
+            self.assertEqual(get_version(CATALOG), before)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(get_version(CATALOG), before)
+
+    def test_create_change_and_delete(self):
+        self.review(5, is_approved=True)
+        review = self.review(2, is_approved=True)
+        self.assertRating(3.5, 2, [0, 1, 0, 0, 1])
+        review.rating = 4
+        review.save()
+        self.assertRating(4.5, 2, [0, 0, 0, 1, 1])
+        review.delete()
+        self.assertRating(5, 1, [0, 0, 0, 0, 1])
+        Review.objects.get().delete()
+        self.assertRating(0, 0, [0, 0, 0, 0, 0])
+
+    def test_rebuild_ratings(self):
+        self.review(3, is_approved=True)
+        self.review(1, is_approved=True)
+        self.review(5)
+        Product.objects.update(rating_avg=0, rating_count=0, rating_sum=0, rating_3=0)
+        call_command('rebuild_ratings', stdout=io.StringIO())
+        self.assertRating(2, 2, [1, 0, 1, 0, 0])
+
+    def test_sort_and_filter_by_rating(self):
+        self.review(5, is_approved=True)
+        other = Product.objects.create(name="Грунт", description="", price=100)
+        Review.objects.create(user=self.moderator, product=other, text="Так себе", rating=3, is_approved=True)
+        Product.objects.create(name="Лак", description="", price=100)
+
+        names = [item['name'] for item in self.client.get('/api/products/', {'ordering': '-rating'}).json()]
+        self.assertEqual(names, ["Эмаль ПФ-115", "Грунт", "Лак"])
+        # фильтр не обращается к таблице отзывов
+        with CaptureQueriesContext(connection) as queries:
+            items = self.client.get('/api/products/', {'rating_min': 4, 'fields': 'card'}).json()
+        self.assertEqual([item['name'] for item in items], ["Эмаль ПФ-115"])
+        self.assertEqual(items[0]['rating_count'], 1)
+        self.assertFalse(any('reviews_review' in query['sql'] for query in queries))
+
+
+class BulkModerationTest(TestCase):
+    """POST /api/reviews/moderate/: одобрение и отклонение пачкой"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.moderator = User.objects.create(username="moder")
+        self.moderator.profile.is_moderator = True
+        self.moderator.profile.save()
+        self.products = [Product.objects.create(name=f"Товар {i}", description="", price=100) for i in range(3)]
+        self.client.force_authenticate(self.moderator)
+
+    def seed(self, count, is_approved=False):
+        user = User.objects.create(username=f"user{User.objects.count()}")
+        return [
+            Review.objects.create(user=user, product=self.products[i % 3], text="Текст",
+                                  rating=i % 5 + 1, is_approved=is_approved).id
+            for i in range(count)
+        ]
+
+    def ratings(self):
+        return list(Product.objects.order_by('id').values_list(
+            'rating_avg', 'rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'))
+
+    def test_approve_and_reject(self):
+        pending = self.seed(6)
+        approved = self.seed(4, is_approved=True)
+        response = self.client.post('/api/reviews/moderate/', {
+            'approve': pending[:4] + [approved[0], 999999],
+            'reject': pending[4:] + approved[1:3],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'approved': 4, 'rejected': 4, 'skipped': sorted([approved[0], 999999])})
+
+        self.assertFalse(Review.objects.filter(id__in=pending[4:] + approved[1:3]).exists())
+        for review in Review.objects.filter(id__in=pending[:4]):
+            self.assertTrue(review.is_approved)
+            self.assertEqual(review.moderator, self.moderator)
+            self.assertIsNotNone(review.moderated_at)
+        # Рейтинги совпадают с пересчитанными с нуля
+        ratings = self.ratings()
+        call_command('rebuild_ratings', stdout=io.StringIO())
+        self.assertEqual(self.ratings(), ratings)
+
+    def test_queries_do_not_depend_on_batch_size(self):
+        counts = []
+        for size in (1, 50):
+            approve, reject = self.seed(size), self.seed(size, is_approved=True)
+            self.client.force_authenticate(User.objects.get(pk=self.moderator.pk))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/reviews/moderate/', {'approve': approve, 'reject': reject},
+                                            format='json')
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_validation_and_permissions(self):
+        review_id = self.seed(1)[0]
+        response = self.client.post('/api/reviews/moderate/', {'approve': [review_id], 'reject': [review_id]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/reviews/moderate/', {}, format='json').status_code, 400)
+
+        self.client.force_authenticate(User.objects.create(username="buyer"))
+        response = self.client.post('/api/reviews/moderate/', {'approve': [review_id]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Review.objects.get(id=review_id).is_approved)
+
+    def test_single_approve_sets_moderation_time(self):
+        review_id = self.seed(1)[0]
+        before = timezone.now()
+        self.client.patch(f'/api/reviews/{review_id}/approve/')
+        review = Review.objects.get(id=review_id)
+        self.assertGreaterEqual(review.moderated_at, before)
+        self.assertEqual(review.moderator, self.moderator)
+
+
+class ProductReviewsTest(TestCase):
+    """GET /api/products/{id}/reviews/: отзывы одного товара и его рейтинг"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(name="Эмаль ПФ-115", description="", price=250)
+        self.other = Product.objects.create(name="Грунт", description="", price=100)
+
+    def seed(self, count, product=None, **kwargs):
+        user = User.objects.create(username=f"user{User.objects.count()}")
+        for i in range(count):
+            Review.objects.create(user=user, product=product or self.product, text=f"Отзыв {i}",
+                                  rating=kwargs.get('rating', i % 5 + 1), is_approved=kwargs.get('is_approved', True))
+
+    def test_pages_and_rating(self):
+        self.seed(25)
+        self.seed(3, is_approved=False)
+        self.seed(4, product=self.other)
+        url = f'/api/products/{self.product.id}/reviews/'
+        first = self.client.get(url).json()
+        self.assertEqual(first['rating'], {
+            'avg': 3.0, 'count': 25, 'histogram': {'1': 5, '2': 5, '3': 5, '4': 5, '5': 5},
+        })
+        self.assertEqual(len(first['results']), 20)
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        ids = [review['id'] for review in first['results'] + second['results']]
+        expected = Review.objects.filter(product=self.product, is_approved=True).order_by('-created_at', '-id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+        only_fives = self.client.get(url, {'rating': 5}).json()['results']
+        self.assertEqual({review['rating'] for review in only_fives}, {5})
+        self.assertEqual(len(only_fives), 5)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/products/999999/reviews/').status_code, 404)
+        response = self.client.get(f'/api/products/{self.product.id}/reviews/', {'rating': 6})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_budget(self):
+        for count in (1, 30):
+            self.seed(count)
+            # товар с рейтингом + страница отзывов с авторами
+            with self.assertNumQueries(2):
+                response = self.client.get(f'/api/products/{self.product.id}/reviews/', {'rating': 1})
+            self.assertEqual(response.status_code, 200)
+
+
+class DuplicateReviewTest(TestCase):
+    """Почти одинаковые отзывы собираются в кластер и модерируются одним запросом"""
+    SPAM = "Лучший магазин красок в городе! Заходите на наш сайт, скидка {} процентов на всё, доставка бесплатно"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.moderator = User.objects.create(username="moder")
+        self.moderator.profile.is_moderator = True
+        self.moderator.profile.save()
+        self.product = Product.objects.create(name="Эмаль ПФ-115", description="", price=250)
+
+    def post(self, text):
+        self.client.force_authenticate(User.objects.create(username=f"user{User.objects.count()}"))
+        response = self.client.post('/api/reviews/', {'product_id': self.product.id, 'text': text, 'rating': 5})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_signature_similarity(self):
+        spam = dedup.signatures([self.SPAM.format(10), self.SPAM.format(15), "Краска легла ровно, но сохнет долго"])
+        scores = dedup.similarity(spam[0], spam)
+        self.assertGreater(scores[1], dedup.DUPLICATE_THRESHOLD)
+        self.assertLess(scores[2], 0.2)
+
+    def test_spam_wave_rejected_by_cluster(self):
+        spam = [self.post(self.SPAM.format(discount)) for discount in range(10, 16)]
+        honest = self.post("Краска легла ровно в два слоя, но сохнет дольше, чем написано на банке")
+
+        self.client.force_authenticate(self.moderator)
+        clusters = self.client.get('/api/reviews/pending/clusters/').json()
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual((clusters[0]['size'], clusters[0]['sample']['id']), (6, spam[0]))
+        members = self.client.get('/api/reviews/pending/', {'cluster': clusters[0]['cluster']}).json()['results']
+        self.assertEqual(sorted(review['id'] for review in members), spam)
+
+        # Один отзыв из кластера модератор оставляет
+        response = self.client.post('/api/reviews/moderate/', {
+            'reject_clusters': [clusters[0]['cluster']], 'approve': [spam[-1], honest],
+        }, format='json')
+        self.assertEqual(response.json(), {'approved': 2, 'rejected': 5, 'skipped': []})
+        self.assertEqual(sorted(Review.objects.values_list('id', flat=True)), [spam[-1], honest])
+        self.assertFalse(ReviewBucket.objects.exclude(review_id__in=[spam[-1], honest]).exists())
+        self.assertEqual(self.client.get('/api/reviews/pending/clusters/').json(), [])
+
+    def test_lookup_does_not_depend_on_wave_size(self):
+        counts = []
+        for size in (1, 100):
+            product = Product.objects.create(name=f"Товар {size}", description="", price=100)
+            texts = [self.SPAM.format(size) + f" {i}" for i in range(size + 1)]
+            reviews = Review.objects.bulk_create(
+                [Review(user=self.moderator, product=product, text=text) for text in texts]
+            )
+            call_command('index_reviews', stdout=io.StringIO())
+            clusters = ReviewSignature.objects.filter(review__product=product).values_list('cluster', flat=True)
+            self.assertEqual(len(set(clusters)), 1)
+            with CaptureQueriesContext(connection) as queries:
+                dedup.index_review(reviews[-1].id, text=texts[-1])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ReviewSearchTest(TestCase):
+    """GET /api/reviews/moderation/: поиск модератора по отзывам и фильтры"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.moderator = User.objects.create(username="moder")
+        self.moderator.profile.is_moderator = True
+        self.moderator.profile.save()
+        self.client.force_authenticate(self.moderator)
+        self.enamel = Product.objects.create(name="Эмаль ПФ-115", description="", price=250)
+        self.primer = Product.objects.create(name="Грунт ГФ-021", description="", price=100)
+        self.ivanov = User.objects.create(username="ivanov", first_name="Пётр")
+        self.sidorov = User.objects.create(username="sidorov")
+        self.old = Review.objects.create(user=self.ivanov, product=self.enamel, rating=5, is_approved=True,
+                                         text="Покрасил забор этой краской, держится третий год")
+        self.pending = Review.objects.create(user=self.sidorov, product=self.enamel, rating=2,
+                                             text="Краска легла пятнами, пришлось перекрашивать")
+        self.primer_review = Review.objects.create(user=self.sidorov, product=self.primer, rating=4,
+                                                   text="Хорошо впитывается, расход небольшой")
+        Review.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+    def search(self, **params):
+        response = self.client.get('/api/reviews/moderation/', params)
+        self.assertEqual(response.status_code, 200)
+        return [review['id'] for review in response.json()['results']]
+
+    def test_search_and_filters(self):
+        self.assertEqual(self.search(), [self.primer_review.id, self.pending.id, self.old.id])
+        self.assertEqual(sorted(self.search(q="краски")), sorted([self.old.id, self.pending.id]))
+        self.assertEqual(self.search(q="ivanov"), [self.old.id])
+        self.assertEqual(self.search(q="грунт"), [self.primer_review.id])
+        self.assertEqual(self.search(q="краска", status="pending"), [self.pending.id])
+        self.assertEqual(self.search(q="краска", rating=5), [self.old.id])
+        week_ago = (timezone.now() - timedelta(days=7)).date().isoformat()
+        self.assertEqual(self.search(q="краска", created_after=week_ago), [self.pending.id])
+        self.assertEqual(self.search(created_before=week_ago), [self.old.id])
+        self.assertEqual(self.search(q="забор", status="pending"), [])
+        # Те же фильтры работают в очереди модерации
+        response = self.client.get('/api/reviews/pending/', {'q': 'расход'})
+        self.assertEqual([review['id'] for review in response.json()['results']], [self.primer_review.id])
+
+    def test_paged_search(self):
+        first = self.client.get('/api/reviews/moderation/', {'q': 'краска', 'page_size': 1}).json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        ids = [review['id'] for review in first['results'] + second['results']]
+        self.assertEqual(sorted(ids), sorted([self.old.id, self.pending.id]))
+
+    def test_index_follows_changes(self):
+        self.pending.text = "Обычная эмаль, ничего особенного"
+        self.pending.save()
+        self.assertEqual(self.search(q="пятнами"), [])
+        self.primer.name = "Грунтовка универсальная"
+        self.primer.save()
+        self.assertEqual(self.search(q="универсальная"), [self.primer_review.id])
+        self.sidorov.username = "sidorov_pavel"
+        self.sidorov.save(update_fields=['username'])
+        self.assertEqual(len(self.search(q="sidorov_pavel")), 2)
+
+        self.client.post('/api/reviews/moderate/', {'reject': [self.pending.id, self.primer_review.id]},
+                         format='json')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid FROM reviews_review_fts')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [self.old.id])
+
+    def test_filters_apply_before_ranking(self):
+        # Одобренных совпадений больше 500, и все они релевантнее ожидающего отзыва
+        spam = Review.objects.bulk_create([
+            Review(user=self.ivanov, product=self.enamel, rating=5, is_approved=True, text="краска краска краска")
+            for _ in range(600)
+        ])
+        review_index.refresh([review.pk for review in spam])
+        self.assertEqual(self.search(q="краска", status="pending"), [self.pending.id])
+        self.assertEqual(self.search(q="краска", rating=2), [self.pending.id])
+
+    def test_index_follows_catalog_import_rename(self):
+        Product.objects.filter(pk=self.primer.pk).update(sku='G-21')
+        csv_file = io.BytesIO("sku,name,price\nG-21,Грунтовка универсальная,100\n".encode())
+        CatalogImporter().run(read_rows(csv_file, 'csv'))
+        self.assertEqual(self.search(q="универсальная"), [self.primer_review.id])
+
+    def test_errors_and_permissions(self):
+        for params in ({'status': 'spam'}, {'created_after': 'вчера'}, {'rating': 0}):
+            self.assertEqual(self.client.get('/api/reviews/moderation/', params).status_code, 400)
+        self.client.force_authenticate(self.sidorov)
+        self.assertEqual(self.client.get('/api/reviews/moderation/', {'q': 'краска'}).status_code, 403)
+
+
+class ReviewQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """Ленты отзывов читаются по составным индексам, без сортировки во временном B-дереве"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.moderator = User.objects.create(username="moder")
+        cls.moderator.profile.is_moderator = True
+        cls.moderator.profile.save()
+        users = User.objects.bulk_create([User(username=f"user{i}") for i in range(50)])
+        products = Product.objects.bulk_create(
+            [Product(name=f"Товар {i}", description="", price=100) for i in range(200)]
+        )
+        Review.objects.bulk_create([
+            Review(user=users[i % 50], product=products[i % 200], text="Текст",
+                   rating=i % 5 + 1, is_approved=i % 10 != 0)
+            for i in range(5000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.moderator)
+
+    def test_public_list(self):
+        self.assertIndexedPlan(lambda: self.client.get('/api/reviews/'), 'reviews_review')
+
+    def test_pending(self):
+        self.assertIndexedPlan(lambda: self.client.get('/api/reviews/pending/'), 'reviews_review')
+
+    def test_my(self):
+        self.client.force_authenticate(User.objects.get(username="user3"))
+        self.assertIndexedPlan(lambda: self.client.get('/api/reviews/my/'), 'reviews_review', search=True)
+
+    def test_next_page(self):
+        for url in ('/api/reviews/', '/api/reviews/pending/'):
+            next_url = self.client.get(url, {'page_size': 20}).json()['next']
+            self.assertIndexedPlan(lambda: self.client.get(next_url), 'reviews_review', search=True)
+
+    def test_product_reviews(self):
+        product = Product.objects.order_by('id')[3]
+        url = f'/api/products/{product.id}/reviews/'
+        self.assertIndexedPlan(lambda: self.client.get(url), 'reviews_review', search=True)
+        self.assertIndexedPlan(lambda: self.client.get(url, {'rating': 4}), 'reviews_review', search=True)
+        next_url = self.client.get(url, {'page_size': 5}).json()['next']
+        self.assertIndexedPlan(lambda: self.client.get(next_url), 'reviews_review', search=True)
 
-# Create your tests here.
+    def test_moderation(self):
+        url = '/api/reviews/moderation/'
+        week_ago = (timezone.now() - timedelta(days=7)).isoformat()
+        self.assertIndexedPlan(lambda: self.client.get(url), 'reviews_review')
+        self.assertIndexedPlan(lambda: self.client.get(url, {'status': 'pending'}), 'reviews_review')
+        self.assertIndexedPlan(lambda: self.client.get(url, {'created_after': week_ago}), 'reviews_review')
+        next_url = self.client.get(url, {'page_size': 20}).json()['next']
+        self.assertIndexedPlan(lambda: self.client.get(next_url), 'reviews_review', search=True)
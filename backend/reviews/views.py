@@ -1,44 +1,140 @@
+import datetime
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
 from .models import Review
-from .serializers import ReviewSerializer
+from .serializers import ReviewModerationSerializer, ReviewSerializer
+from .moderation import moderate
+from . import dedup
+from .search import review_index
 from accounts.permissions import IsModerator
 from django_filters.rest_framework import DjangoFilterBackend
+from products.fieldsets import SparseFieldsetViewMixin, only_fields
+from products.models import Product
+from .pagination import ReviewCursorPagination
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = ReviewCursorPagination
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'product_reviews']:
             return [AllowAny()] # ← публично: все видят одобренные отзывы
         if self.action in ['create', 'my']:
             return [IsAuthenticated()]  # ← писать — только авторизованным
         # approve, pending — только модераторы (проверка в экшенах)
-        if self.action in ['approve', 'pending_reviews']:
+        if self.action in ['approve', 'pending_reviews', 'pending_clusters', 'moderation_reviews', 'moderate']:
             return [IsModerator()]
         return [IsAuthenticated()]
 
     def get_queryset(self):
         # По умолчанию — только одобренные
-        if self.action in ['list', 'retrieve']:
-            return Review.objects.filter(is_approved=True).select_related('user', 'product')
-        return Review.objects.all().select_related('user', 'product', 'moderator')
+        if self.action == 'list':
+            return self.feed(Review.objects.filter(is_approved=True))
+        if self.action == 'retrieve':
+            queryset = Review.objects.filter(is_approved=True).select_related('user', 'product')
+        else:
+            queryset = Review.objects.all().select_related('user', 'product', 'moderator')
+        return self.apply_fieldset(queryset)
+
+    def feed(self, queryset):
+        """Лента отзывов: новые сверху, из БД — только колонки, которые попадут в ответ"""
+        queryset = queryset.order_by('-created_at', '-id')
+        if self.get_fieldset() is not None:
+            return self.apply_fieldset(queryset)
+        columns, related = only_fields(self.get_serializer(), Review)
+        return queryset.select_related(*related).only(*columns)
+
+    def feed_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        review = serializer.save(user=self.request.user)
+        # Подпись для поиска почти одинаковых отзывов (reviews/dedup.py)
+        dedup.index_review(review.id, text=review.text)
+
+    def perform_update(self, serializer):
+        text_before = serializer.instance.text
+        review = serializer.save()
+        if review.text != text_before:
+            dedup.index_review(review.id, text=review.text)
 
-    # GET /api/reviews/pending/ - только модераторам
+    # GET /api/reviews/pending/ - только модераторам; ?cluster=<id> — один кластер дублей
     @action(detail=False, methods=['get'], url_path='pending')
     def pending_reviews(self, request):
         if not request.user.profile.is_moderator:
             return Response({'detail': 'Недостаточно прав'}, status=status.HTTP_403_FORBIDDEN)
-        reviews = Review.objects.filter(is_approved=False).select_related('user', 'product')
-        serializer = self.get_serializer(reviews, many=True)
-        return Response(serializer.data)
+        queryset = Review.objects.filter(is_approved=False)
+        cluster = request.query_params.get('cluster')
+        if cluster:
+            if not cluster.isdigit():
+                raise ValidationError({'cluster': 'Ожидается id кластера'})
+            queryset = queryset.filter(signature__cluster=cluster)
+        return self.feed_response(self.moderation_search(self.feed(queryset)))
+
+    # GET /api/reviews/moderation/ — все отзывы для модератора, с поиском и фильтрами
+    @action(detail=False, methods=['get'], url_path='moderation')
+    def moderation_reviews(self, request):
+        """
+        ?status=pending|approved, ?rating=1..5, ?created_after= / ?created_before= (дата или
+        дата-время ISO 8601), ?q= — поиск по тексту, автору и названию товара (reviews/search.py).
+        Без ?q= — новые сверху, по индексу (created_at, id); с ?q= — по релевантности.
+        """
+        queryset = Review.objects.all()
+        status_param = request.query_params.get('status')
+        if status_param:
+            if status_param not in ('pending', 'approved'):
+                raise ValidationError({'status': 'pending или approved'})
+            queryset = queryset.filter(is_approved=status_param == 'approved')
+        return self.feed_response(self.moderation_search(self.feed(queryset)))
+
+    def moderation_search(self, queryset):
+        """Фильтры модераторских лент: оценка, даты и полнотекстовый ?q="""
+        rating = self._rating_param()
+        if rating is not None:
+            queryset = queryset.filter(rating=rating)
+        for name, lookup in (('created_after', 'gte'), ('created_before', 'lt')):
+            value = self.request.query_params.get(name)
+            if value:
+                queryset = queryset.filter(**{f'created_at__{lookup}': self._moment_param(name, value)})
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = review_index.filter(queryset, query)
+        return queryset
+
+    @staticmethod
+    def _moment_param(name, value):
+        # Дата без времени — начало дня в текущем часовом поясе
+        try:
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                moment = day and timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({name: 'Ожидается дата ГГГГ-ММ-ДД или дата-время ISO 8601'})
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    # GET /api/reviews/pending/clusters/ — очередь модерации, сгруппированная по почти одинаковым текстам
+    @action(detail=False, methods=['get'], url_path='pending/clusters')
+    def pending_clusters(self, request):
+        """
+        Кластеры из двух и более ожидающих отзывов с примером текста. Кластер целиком
+        одобряется или отклоняется одним POST /api/reviews/moderate/ (approve_clusters / reject_clusters).
+        """
+        return Response(dedup.pending_clusters())
 
     # PATCH /api/reviews/{id}/approve/
     @action(detail=True, methods=['patch'])
@@ -46,16 +142,63 @@ class ReviewViewSet(viewsets.ModelViewSet):
         if not request.user.profile.is_moderator:
             return Response({'detail': 'Недостаточно прав'}, status=status.HTTP_403_FORBIDDEN)
         review = self.get_object()
-        review.is_approved = True
-        review.moderator = request.user
-        review.moderated_at = request.user.date_joined  # или timezone.now()
-        review.save()
+        # Как и пакетная модерация: строка блокируется, рейтинг учитывается один раз
+        moderate(request.user, approve=[review.pk])
+        review.refresh_from_db()
         serializer = self.get_serializer(review)
         return Response(serializer.data)
 
+    # POST /api/reviews/moderate/ — очередь модерации пачкой
+    @action(detail=False, methods=['post'], url_path='moderate')
+    def moderate(self, request):
+        """
+        {"approve": [id, ...], "reject": [id, ...]} — одобряет и отклоняет (удаляет) отзывы
+        несколькими запросами к БД на всю пачку. В ответе — сколько отзывов обработано
+        и id, которых не нашлось (или уже одобренных, для approve).
+        """
+        serializer = ReviewModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = moderate(request.user, **serializer.validated_data)
+        return Response(result)
+
     @action(detail=False, methods=['get'])
     def my(self, request):
         """GET /api/reviews/my/ — только отзывы текущего пользователя"""
-        reviews = Review.objects.filter(user=request.user)
-        serializer = self.get_serializer(reviews, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.feed_response(self.feed(Review.objects.filter(user=request.user)))
+
+    def product_reviews(self, request, product_id=None):
+        """
+        GET /api/products/{id}/reviews/?rating=5&page_size=20&cursor=...
+        Одобренные отзывы товара (новые сверху, постранично) и сводка его рейтинга.
+        Два запроса: товар с денормализованным рейтингом и страница отзывов
+        по индексу (product, created_at, id) или, с ?rating=, (product, rating, created_at, id).
+        """
+        product = get_object_or_404(
+            Product.objects.only('id', 'rating_avg', 'rating_count', *Product.HISTOGRAM_FIELDS), pk=product_id
+        )
+        queryset = Review.objects.filter(product_id=product.id, is_approved=True)
+        rating = self._rating_param()
+        if rating is not None:
+            queryset = queryset.filter(rating=rating)
+
+        paginator = ReviewCursorPagination()
+        page = paginator.paginate_queryset(self.feed(queryset), request, view=self)
+        response = paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data = {
+            'rating': {
+                'avg': product.rating_avg,
+                'count': product.rating_count,
+                'histogram': product.rating_histogram,
+            },
+            **response.data,
+        }
+        return response
+
+    def _rating_param(self):
+        # Одна оценка: с IN (4, 5) порядок по индексу теряется и страницу пришлось бы сортировать
+        value = self.request.query_params.get('rating')
+        if not value:
+            return None
+        if value not in ('1', '2', '3', '4', '5'):
+            raise ValidationError({'rating': 'Оценка от 1 до 5'})
+        return int(value)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SiteSettingsConfig(AppConfig):
     name = 'site_settings'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (версии для условных GET)
+        from . import signals  # noqa: F401
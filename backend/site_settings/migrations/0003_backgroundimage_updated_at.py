@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_settings', '0002_backgroundimage_blur_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
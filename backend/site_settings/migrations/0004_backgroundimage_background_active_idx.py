@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_settings', '0003_backgroundimage_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='backgroundimage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='background_active_idx'),
+        ),
+    ]
@@ -5,6 +5,7 @@ class BackgroundImage(models.Model):
     #поле, чтобы отмечать, активно ли это изображение
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     blur_amount = models.FloatField(default=0.0, help_text="Степень размытия в пикселях (например, 0.0 - 20.0)")
     scale_factor = models.FloatField(default=1.0, help_text="Множитель масштаба (например, 0.5 - 2.0)")
 
@@ -14,6 +15,10 @@ class BackgroundImage(models.Model):
     class Meta:
         verbose_name = "Фоновое изображение"
         verbose_name_plural = "Фоновые изображения"
+        indexes = [
+            # Активный фон один, частичный индекс из одной-двух строк вместо просмотра всей таблицы
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='background_active_idx'),
+        ]
 
     @classmethod
     def get_active_image(cls):
@@ -0,0 +1,18 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from paintstore.versions import bump_version
+from .models import BackgroundImage
+
+# Версия фоновых изображений: по ней отвечаем 304 на /api/background-images/active/
+BACKGROUND = 'background'
+
+
+@receiver(post_save, sender=BackgroundImage)
+@receiver(post_delete, sender=BackgroundImage)
+def background_changed(sender, **kwargs):
+    # После коммита: иначе параллельный запрос закэширует данные под новой версией до коммита
+    transaction.on_commit(partial(bump_version, BACKGROUND))
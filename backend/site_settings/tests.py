@@ -1,3 +1,55 @@
+from django.core.cache import cache
 from django.test import TestCase
+from paintstore.query_budget import QueryBudgetTestMixin
+from paintstore.query_plans import QueryPlanTestMixin
+from .models import BackgroundImage
 
-# Create your tests here.
+
+class BackgroundImageQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    def seed(self, count):
+        for i in range(count):
+            BackgroundImage.objects.create(image=f'backgrounds/{i}.jpg', is_active=False)
+
+    def test_list(self):
+        self.assertBudget(1, '/api/background-images/')
+
+    def test_active(self):
+        self.seed(10)
+        BackgroundImage.objects.create(image='backgrounds/active.jpg', is_active=True)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/background-images/active/')
+        self.assertTrue(response.json()['image'].endswith('active.jpg'))
+
+
+class ActiveBackgroundConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.image = BackgroundImage.objects.create(image='backgrounds/1.jpg', is_active=True)
+
+    def test_not_modified_until_changed(self):
+        etag = self.client.get('/api/background-images/active/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/background-images/active/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.image.blur_amount = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.save()
+            response = self.client.get('/api/background-images/active/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/background-images/active/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['blur_amount'], 5)
+
+
+class ActiveBackgroundQueryPlanTest(QueryPlanTestMixin, TestCase):
+    def test_active_uses_partial_index(self):
+        BackgroundImage.objects.bulk_create(
+            [BackgroundImage(image=f'backgrounds/{i}.jpg', is_active=False) for i in range(2000)]
+        )
+        BackgroundImage.objects.create(image='backgrounds/active.jpg', is_active=True)
+        cache.clear()
+        # Проход по частичному индексу — это только активные строки
+        self.assertIndexedPlan(
+            lambda: self.client.get('/api/background-images/active/'), 'site_settings_backgroundimage',
+        )
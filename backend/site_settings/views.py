@@ -6,6 +6,8 @@ from .models import BackgroundImage
 from .serializers import BackgroundImageSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from accounts.permissions import IsModerator 
+from paintstore.conditional import conditional_get
+from .signals import BACKGROUND
 
 
 class BackgroundImageViewSet(viewsets.ModelViewSet):
@@ -57,6 +59,7 @@ class BackgroundImageViewSet(viewsets.ModelViewSet):
         return super().partial_update(request, *args, **kwargs)
 
     @action(detail=False, methods=['get'], url_path='active')
+    @conditional_get(BACKGROUND)
     def active_background(self, request):
         """Получить данные активного фонового изображения (включая параметры)."""
         bg_image = BackgroundImage.get_active_image()
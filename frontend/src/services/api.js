@@ -111,7 +111,8 @@ export const api = {
     return fetch(`${BASE_URL}/reviews/`)
       .then(res => {
         if (!res.ok) throw new Error('Не удалось загрузить отзывы');
-        return res.json();
+        // Ленты отзывов постраничные: { next, results } — берём первую страницу
+        return res.json().then(data => data.results);
       });
   },
 
@@ -198,7 +199,7 @@ export const api = {
       headers: { 'Authorization': `Bearer ${token}` }
     }).then(res => {
       if (!res.ok) throw new Error('Не удалось загрузить отзывы на модерации');
-      return res.json();
+      return res.json().then(data => data.results);
     });
   },
 
@@ -291,7 +292,7 @@ export const api = {
       headers: { 'Authorization': `Bearer ${token}` }
     }).then(res => {
       if (!res.ok) throw new Error('Не удалось загрузить отзывы');
-      return res.json()
+      return res.json().then(data => data.results);
     });
   },
 